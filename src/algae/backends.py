@@ -0,0 +1,521 @@
+import importlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from algae.capacity import prescale_cluster, settle_cluster
+from algae.cleanup import cleanup_on_overrun
+from algae.deadlines import current_deadlines, phase, wait
+from algae.gate import cutover_gate, load_thresholds
+from algae.parameters import delete_parameter_groups, migrate_parameter_groups
+from algae.rds import (
+    EngineType,
+    clone_cluster,
+    create_blue_green_deployment,
+    create_cluster_db_instances,
+    create_db_cluster_snapshot,
+    delete_blue_green_deployment,
+    delete_cluster,
+    delete_db_cluster_snapshot,
+    describe_blue_green_deployment,
+    describe_cluster,
+    get_cluster_endpoint,
+    is_cluster_deleted,
+    restore_cluster_from_snapshot,
+    switchover_blue_green_deployment,
+    upgrade_clone_cluster,
+    upgrade_clone_cluster_identifier,
+    wait_blue_green_deployment_available,
+)
+from algae.state import record_rollout
+from algae.targets import submit
+from algae.verify import DRIVER_DIALECTS, Side, load_tables, verify_tables
+from algae.warmup import load_queries, run_warmup
+
+_logger = logging.getLogger(__name__)
+
+
+def connector(driver, cluster_identifier: str, database: str):
+    """
+    DB-API connection factory of the cluster endpoint, the credentials are
+    read from ALGAE_DB_USER and ALGAE_DB_PASSWORD
+    :param driver: the DB-API driver module
+    :param cluster_identifier: the cluster identifier
+    :param database: the database name
+    """
+    endpoint = get_cluster_endpoint(cluster_identifier)
+
+    def connect():
+        return driver.connect(
+            host=endpoint,
+            user=os.environ.get("ALGAE_DB_USER"),
+            password=os.environ.get("ALGAE_DB_PASSWORD"),
+            database=database,
+        )
+
+    return connect
+
+
+def warmup_cluster(args, cluster_identifier: str):
+    """
+    Run the warm-up query set against the green cluster endpoint
+    :param args:
+    :param cluster_identifier: the green cluster identifier
+    :return:
+    """
+    driver = importlib.import_module(args.warmup_driver)
+
+    run_warmup(
+        connector(driver, cluster_identifier, args.warmup_database),
+        load_queries(args.warmup_queries),
+        concurrency=args.warmup_concurrency,
+        duration=args.warmup_duration,
+    )
+
+
+def verify_cluster(args, cluster_identifier: str):
+    """
+    Compare the data of the green cluster with the source cluster, the
+    cutover is aborted when they diverge
+    :param args:
+    :param cluster_identifier: the green cluster identifier
+    """
+    driver = importlib.import_module(args.warmup_driver)
+    database = args.verify_database or args.warmup_database
+    dialect = DRIVER_DIALECTS.get(args.warmup_driver)
+
+    report = verify_tables(
+        Side(
+            args.source_cluster_identifier,
+            connector(driver, args.source_cluster_identifier, database),
+            dialect,
+        ),
+        Side(
+            cluster_identifier, connector(driver, cluster_identifier, database), dialect
+        ),
+        load_tables(args.verify_tables),
+        chunk_size=args.verify_chunk_size,
+        concurrency=args.verify_concurrency,
+    )
+
+    divergent = {
+        table: result["divergent_keys"]
+        for table, result in report.items()
+        if result["divergent_keys"]
+    }
+    if divergent:
+        raise Exception(
+            f'aborting cutover, "{cluster_identifier}" diverges from '
+            f'"{args.source_cluster_identifier}" in tables {", ".join(divergent)}'
+        )
+
+
+def prepare_cutover(args, cluster_identifier: str) -> dict:
+    """
+    Get the green cluster ready to take the production traffic
+    :param args:
+    :param cluster_identifier: the green cluster identifier
+    :return: the steady state settings to apply after the soak period
+    """
+    settle = None
+    if args.prescale:
+        settle = prescale_cluster(
+            cluster_identifier,
+            args.source_cluster_identifier,
+            db_instance_class=args.prescale_instance_class,
+            min_capacity=args.prescale_min_capacity,
+        )
+
+    if args.warmup_queries is not None:
+        warmup_cluster(args, cluster_identifier)
+
+    if args.gate:
+        cutover_gate(
+            args.source_cluster_identifier,
+            cluster_identifier,
+            thresholds=load_thresholds(args.gate_thresholds),
+            step=args.gate_interval,
+            required_passes=args.gate_passes,
+            max_ticks=args.gate_max_checks,
+        )
+
+    if args.verify_tables is not None:
+        verify_cluster(args, cluster_identifier)
+
+    return settle
+
+
+def complete_cutover(args, settle: dict):
+    # keep the raised capacity while production traffic settles in
+    if settle and (settle["instance_class"] or settle["scaling"]):
+        time.sleep(args.soak_period)
+        settle_cluster(args.source_cluster_identifier, settle)
+
+
+# errors of RDS refusing to restore a snapshot at the requested engine version
+RESTORE_VERSION_ERRORS = ("InvalidParameterCombination", "InvalidParameterValue")
+
+
+def restore_at_version(args, source: dict, parameter_groups=None):
+    """
+    Create the green cluster at the target engine version from a snapshot of
+    the source cluster, skipping the in-place upgrade
+    :param args:
+    :param source: the source cluster description
+    :param parameter_groups: the future of the migrated parameter groups
+    """
+    snapshot_identifier = f"{args.cluster_identifier}-provision"
+
+    try:
+        create_db_cluster_snapshot(
+            cluster_identifier=args.source_cluster_identifier,
+            snapshot_identifier=snapshot_identifier,
+        )
+        restore_cluster_from_snapshot(
+            snapshot_identifier,
+            args.cluster_identifier,
+            source["Engine"],
+            engine_version=args.engine_version,
+            subnet_group_name=args.subnet_group_name,
+            cluster_parameter_group_name=(
+                parameter_groups.result()["cluster"] if parameter_groups else None
+            ),
+        )
+    finally:
+        # a failed delete must not hide the restore error nor an overrun
+        try:
+            delete_db_cluster_snapshot(snapshot_identifier)
+        except Exception:
+            _logger.exception(f'failed to delete snapshot "{snapshot_identifier}"')
+
+
+def needs_upgrade(args) -> bool:
+    return (
+        args.engine_version is not None
+        and args.engine_version
+        != describe_cluster(args.source_cluster_identifier)["EngineVersion"]
+    )
+
+
+def provision_cluster(args, parameter_groups=None) -> str:
+    """
+    Create the green cluster, at the target engine version in one step when
+    RDS allows it
+    :param args:
+    :param parameter_groups: the future of the migrated parameter groups
+    :return: the provisioning path taken, "clone" when no upgrade is needed,
+    "restore" when restored at the target version, "clone-upgrade" when the
+    clone requires the in-place upgrade
+    """
+    source = describe_cluster(args.source_cluster_identifier)
+
+    if args.engine_version is None or args.engine_version == source["EngineVersion"]:
+        clone_cluster(
+            cluster_identifier=args.cluster_identifier,
+            source_cluster_identifier=args.source_cluster_identifier,
+            subnet_group_name=args.subnet_group_name,
+        )
+        return "clone"
+
+    if args.provision in ("auto", "restore"):
+        ts = time.time()
+        try:
+            restore_at_version(args, source, parameter_groups)
+        except ClientError as e:
+            if (
+                args.provision == "restore"
+                or e.response["Error"]["Code"] not in RESTORE_VERSION_ERRORS
+            ):
+                raise
+            _logger.warning(
+                f"cannot restore at engine version {args.engine_version}, "
+                f'falling back to clone and upgrade: {e.response["Error"]["Message"]}'
+            )
+        else:
+            report_time_saved(time.time() - ts)
+            return "restore"
+
+    clone_cluster(
+        cluster_identifier=args.cluster_identifier,
+        source_cluster_identifier=args.source_cluster_identifier,
+        subnet_group_name=args.subnet_group_name,
+    )
+    return "clone-upgrade"
+
+
+def report_time_saved(elapsed: float):
+    deadlines = current_deadlines()
+    clone, upgrade = deadlines.typical("clone"), deadlines.typical("upgrade")
+
+    if clone is None or upgrade is None:
+        _logger.info(f"provisioned at the target engine version in {elapsed:.0f}s")
+        return
+
+    _logger.info(
+        f"provisioned at the target engine version in {elapsed:.0f}s, clone and "
+        f"upgrade typically take {clone + upgrade:.0f}s, saved "
+        f"{clone + upgrade - elapsed:.0f}s"
+    )
+
+
+class ClassicBackend:
+    """
+    Clones the source cluster, upgrades the clone and swaps the identifiers
+
+    The clone is a point in time copy, it does not follow the writes made to
+    the source cluster after it is created.
+    """
+
+    name = "classic"
+
+    def phases(self, args) -> tuple:
+        """
+        Phases of a rollout, for the duration predictions, the restore at the
+        target version is expected to succeed unless only cloning is allowed
+        """
+        if args.provision == "clone":
+            return ("clone", "create-instance", "upgrade", "rename", "rename")
+        return ("snapshot", "restore", "create-instance", "rename", "rename")
+
+    def prepare(self, args) -> dict:
+        parameter_groups = None
+
+        def cleanup(cluster_identifier: str):
+            # the groups can only be deleted once no cluster uses them
+            try:
+                delete_cluster(cluster_identifier)
+            finally:
+                if parameter_groups is not None:
+                    delete_parameter_groups(parameter_groups.result())
+
+        with cleanup_on_overrun(
+            args.cluster_identifier, keep=args.keep_on_overrun, cleanup=cleanup
+        ):
+            # the parameter groups are migrated while the cluster is provisioned
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                if args.migrate_parameter_groups and needs_upgrade(args):
+                    parameter_groups = submit(
+                        executor,
+                        migrate_parameter_groups,
+                        args.source_cluster_identifier,
+                        args.engine_version,
+                        args.cluster_identifier,
+                    )
+
+                provision_path = provision_cluster(args, parameter_groups)
+                groups = parameter_groups.result() if parameter_groups else {}
+
+            _logger.info(
+                f'provisioned cluster "{args.cluster_identifier}" with the '
+                f"{provision_path} path"
+            )
+
+            # a DB parameter group of a newer major version family can only be
+            # attached by the upgrade itself
+            upgrade_db_parameter_group = (
+                groups.get("db")
+                if provision_path == "clone-upgrade" and groups.get("major")
+                else None
+            )
+
+            if args.engine_version is not None:
+                db_instance_class = "db.t3.small"
+                create_cluster_db_instances(
+                    args.cluster_identifier,
+                    engine_version=args.engine_version,
+                    db_instance_class=db_instance_class,
+                    db_parameter_group_name=(
+                        None if upgrade_db_parameter_group else groups.get("db")
+                    ),
+                )
+
+                if provision_path == "clone-upgrade":
+                    upgrade_clone_cluster(
+                        args.cluster_identifier,
+                        args.engine_version,
+                        cluster_parameter_group_name=groups.get("cluster"),
+                        db_parameter_group_name=upgrade_db_parameter_group,
+                    )
+
+        return {
+            "green_cluster_identifier": args.cluster_identifier,
+            "provision_path": provision_path,
+            "parameter_groups": groups,
+        }
+
+    def is_fresh(self, args, prepared: dict) -> bool:
+        return (
+            args.max_staleness is None
+            or time.time() - prepared["prepared_at"] <= args.max_staleness
+        )
+
+    def discard(self, args, prepared: dict):
+        delete_cluster(prepared["green_cluster_identifier"])
+        delete_parameter_groups(prepared.get("parameter_groups") or {})
+
+    def cutover(self, args, prepared: dict):
+        green_cluster_identifier = prepared["green_cluster_identifier"]
+
+        with cleanup_on_overrun(green_cluster_identifier, keep=args.keep_on_overrun):
+            settle = prepare_cutover(args, green_cluster_identifier)
+
+        upgrade_clone_cluster_identifier(
+            cluster_identifier=args.source_cluster_identifier,
+        )
+        upgrade_clone_cluster_identifier(
+            cluster_identifier=green_cluster_identifier,
+            new_cluster_identifier=args.source_cluster_identifier,
+        )
+
+        record_rollout(
+            args.source_cluster_identifier,
+            green_cluster_identifier=green_cluster_identifier,
+            command=args.command,
+            state_dir=args.state_dir,
+            engine_version=args.engine_version,
+            backend=self.name,
+            provision_path=prepared.get("provision_path"),
+        )
+
+        complete_cutover(args, settle)
+
+
+def get_target_cluster_identifier(deployment: dict) -> str:
+    # arn:aws:rds:<region>:<account>:cluster:<identifier>
+    return deployment["Target"].split(":")[-1]
+
+
+def delete_blue_green_target(deployment_identifier: str, parameter_groups: dict = None):
+    green_cluster_identifier = get_target_cluster_identifier(
+        describe_blue_green_deployment(deployment_identifier)
+    )
+    delete_blue_green_deployment(deployment_identifier, delete_target=True)
+
+    if parameter_groups:
+        # the groups can only be deleted once the green cluster is gone
+        with phase("delete", green_cluster_identifier) as p:
+            wait(p, lambda: is_cluster_deleted(green_cluster_identifier))
+        delete_parameter_groups(parameter_groups)
+
+
+class BlueGreenBackend:
+    """
+    Upgrades the source cluster with a managed RDS blue/green deployment, the
+    cluster identifier names the deployment
+
+    The green cluster is kept in sync with the source cluster by replication
+    until the switchover.
+    """
+
+    name = "blue-green"
+
+    def phases(self, args) -> tuple:
+        return ("blue-green", "switchover")
+
+    def prepare(self, args) -> dict:
+        groups = {}
+        if args.migrate_parameter_groups:
+            groups = migrate_parameter_groups(
+                args.source_cluster_identifier,
+                args.engine_version,
+                args.cluster_identifier,
+            )
+
+        deployment_identifier = create_blue_green_deployment(
+            args.cluster_identifier,
+            args.source_cluster_identifier,
+            engine_version=args.engine_version,
+            parameter_group_name=groups.get("cluster"),
+            db_parameter_group_name=groups.get("db"),
+        )
+
+        with cleanup_on_overrun(
+            deployment_identifier,
+            keep=args.keep_on_overrun,
+            cleanup=lambda _: delete_blue_green_target(deployment_identifier, groups),
+        ):
+            wait_blue_green_deployment_available(deployment_identifier)
+
+        green_cluster_identifier = get_target_cluster_identifier(
+            describe_blue_green_deployment(deployment_identifier)
+        )
+
+        return {
+            "green_cluster_identifier": green_cluster_identifier,
+            "deployment_identifier": deployment_identifier,
+            "parameter_groups": groups,
+        }
+
+    def is_fresh(self, args, prepared: dict) -> bool:
+        deployment = describe_blue_green_deployment(prepared["deployment_identifier"])
+        return deployment["Status"] == "AVAILABLE"
+
+    def discard(self, args, prepared: dict):
+        # the deployment name can't be reused until the deletion completes
+        raise Exception(
+            f'blue/green deployment "{prepared["deployment_identifier"]}" is not '
+            f"available, delete it and prepare the cluster again"
+        )
+
+    def cutover(self, args, prepared: dict):
+        deployment_identifier = prepared["deployment_identifier"]
+        green_cluster_identifier = prepared["green_cluster_identifier"]
+
+        with cleanup_on_overrun(
+            deployment_identifier,
+            keep=args.keep_on_overrun,
+            cleanup=lambda _: delete_blue_green_target(
+                deployment_identifier, prepared.get("parameter_groups")
+            ),
+        ):
+            settle = prepare_cutover(args, green_cluster_identifier)
+
+        switchover_blue_green_deployment(
+            deployment_identifier, timeout=args.switchover_timeout
+        )
+
+        # the deployment is no longer needed, the blue cluster is kept with the
+        # "-old1" suffix
+        delete_blue_green_deployment(deployment_identifier)
+
+        record_rollout(
+            args.source_cluster_identifier,
+            green_cluster_identifier=green_cluster_identifier,
+            command=args.command,
+            state_dir=args.state_dir,
+            suffix="old1",
+            engine_version=args.engine_version,
+            backend=self.name,
+        )
+
+        complete_cutover(args, settle)
+
+
+# rollout backends of upgrade-cluster-version, prepare and cutover
+BACKENDS = {
+    ClassicBackend.name: ClassicBackend(),
+    BlueGreenBackend.name: BlueGreenBackend(),
+}
+
+# engines supported by RDS Blue/Green Deployments
+BLUE_GREEN_ENGINES = (
+    EngineType.AURORA_MYSQL.value,
+    EngineType.AURORA_POSTGRESQL.value,
+)
+
+
+def select_backend(args):
+    if args.backend != "auto":
+        return BACKENDS[args.backend]
+
+    if (
+        args.engine_version is not None
+        and describe_cluster(args.source_cluster_identifier)["Engine"]
+        in BLUE_GREEN_ENGINES
+    ):
+        return BACKENDS[BlueGreenBackend.name]
+
+    return BACKENDS[ClassicBackend.name]
@@ -0,0 +1,113 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from algae.rds import (
+    describe_cluster,
+    describe_instance,
+    get_cluster_instance_identifiers,
+    get_cluster_writer_identifier,
+    modify_cluster_scaling,
+    modify_instance_class,
+)
+from algae.targets import submit
+
+_logger = logging.getLogger(__name__)
+
+
+def _modify_instances_class(instances: dict, step: int):
+    if not instances:
+        return
+
+    with ThreadPoolExecutor(max_workers=len(instances)) as executor:
+        futures = [
+            submit(executor, modify_instance_class, instance, db_instance_class, step)
+            for instance, db_instance_class in instances.items()
+        ]
+        for future in futures:
+            future.result()
+
+
+def prescale_cluster(
+    cluster_identifier: str,
+    source_cluster_identifier: str,
+    db_instance_class: str = None,
+    min_capacity: float = None,
+    step: int = 60,
+) -> dict:
+    """
+    Raise the green cluster capacity to match or exceed the blue cluster
+
+    The instances get the blue writer instance class (or the given one) and
+    the Aurora Serverless v2 floor is raised to the blue one (or the given
+    one), the capacity settings are not copied over when cloning.
+    :param cluster_identifier: the green cluster identifier
+    :param source_cluster_identifier: the blue cluster identifier
+    :param db_instance_class: instance class to use instead of the blue one
+    :param min_capacity: ACU floor to use when higher than the blue one
+    :param step: the polling interval in seconds
+    :return: the steady state settings to apply with `settle_cluster`
+    """
+    source = describe_cluster(source_cluster_identifier)
+    source_instance_class = describe_instance(
+        get_cluster_writer_identifier(source_cluster_identifier)
+    )["DBInstanceClass"]
+    target_instance_class = db_instance_class or source_instance_class
+
+    instances = {
+        instance: target_instance_class
+        for instance in get_cluster_instance_identifiers(cluster_identifier)
+        if describe_instance(instance)["DBInstanceClass"] != target_instance_class
+    }
+
+    _logger.info(
+        f'pre-scaling cluster "{cluster_identifier}" instances to '
+        f'"{target_instance_class}"'
+    )
+    _modify_instances_class(instances, step)
+
+    settle = {"instance_class": None, "scaling": None}
+    if target_instance_class != source_instance_class:
+        settle["instance_class"] = source_instance_class
+
+    source_scaling = source.get("ServerlessV2ScalingConfiguration")
+    if source_scaling or min_capacity is not None:
+        source_scaling = source_scaling or {}
+        floor = max(source_scaling.get("MinCapacity", 0), min_capacity or 0)
+        scaling = {
+            "MinCapacity": floor,
+            "MaxCapacity": max(source_scaling.get("MaxCapacity", floor), floor),
+        }
+        modify_cluster_scaling(cluster_identifier, scaling, step)
+
+        if source_scaling and scaling != source_scaling:
+            settle["scaling"] = {
+                "MinCapacity": source_scaling["MinCapacity"],
+                "MaxCapacity": source_scaling["MaxCapacity"],
+            }
+
+    return settle
+
+
+def settle_cluster(cluster_identifier: str, settle: dict, step: int = 60):
+    """
+    Scale the cluster back down to the steady state settings returned by
+    `prescale_cluster`, the instances are those of the cluster at the time,
+    the cutover may have renamed them
+    :param cluster_identifier: the cluster identifier
+    :param settle: the steady state settings
+    :param step: the polling interval in seconds
+    """
+    _logger.info(f'scaling cluster "{cluster_identifier}" back to steady state')
+
+    if settle["instance_class"]:
+        _modify_instances_class(
+            {
+                instance: settle["instance_class"]
+                for instance in get_cluster_instance_identifiers(cluster_identifier)
+                if describe_instance(instance)["DBInstanceClass"]
+                != settle["instance_class"]
+            },
+            step,
+        )
+    if settle["scaling"]:
+        modify_cluster_scaling(cluster_identifier, settle["scaling"], step)
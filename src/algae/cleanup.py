@@ -0,0 +1,32 @@
+import logging
+from contextlib import contextmanager
+
+from algae.deadlines import DeadlineExceeded
+from algae.rds import delete_cluster
+
+_logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def cleanup_on_overrun(
+    cluster_identifier: str, keep: bool = False, cleanup=delete_cluster
+):
+    """
+    Delete the partially created green cluster when a phase of the enclosed
+    block exceeds its deadline, the overrun is raised after the cleanup
+    :param cluster_identifier: the green cluster identifier
+    :param keep: keep the green cluster for inspection
+    :param cleanup: the function deleting the green resources
+    """
+    try:
+        yield
+    except DeadlineExceeded:
+        if keep:
+            _logger.warning(f'keeping cluster "{cluster_identifier}" after overrun')
+        else:
+            _logger.warning(f'cleaning up cluster "{cluster_identifier}" after overrun')
+            try:
+                cleanup(cluster_identifier)
+            except Exception:
+                _logger.exception(f'failed to clean up cluster "{cluster_identifier}"')
+        raise
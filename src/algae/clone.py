@@ -3,6 +3,9 @@ from algae.rds import (
     create_cluster_db_instances,
     upgrade_clone_cluster_identifier,
 )
+from algae.cleanup import cleanup_on_overrun
+from algae.gate import cutover_gate, load_thresholds
+from algae.state import record_rollout
 from algae.timing import timeit
 
 
@@ -19,18 +22,29 @@ def clone_cluster_in_time(args):
         and args.subnet_group_name is not None
         and args.engine_version
     ):
-        clone_cluster(
-            cluster_identifier=args.new_cluster_identifier,
-            source_cluster_identifier=args.cluster_identifier,
-            subnet_group_name=args.subnet_group_name,
-        )
+        with cleanup_on_overrun(args.new_cluster_identifier, keep=args.keep_on_overrun):
+            clone_cluster(
+                cluster_identifier=args.new_cluster_identifier,
+                source_cluster_identifier=args.cluster_identifier,
+                subnet_group_name=args.subnet_group_name,
+            )
 
-        db_instance_class = "db.t3.small"
-        create_cluster_db_instances(
-            args.new_cluster_identifier,
-            engine_version=args.engine_version,
-            db_instance_class=db_instance_class,
-        )
+            db_instance_class = "db.t3.small"
+            create_cluster_db_instances(
+                args.new_cluster_identifier,
+                engine_version=args.engine_version,
+                db_instance_class=db_instance_class,
+            )
+
+            if args.gate:
+                cutover_gate(
+                    args.cluster_identifier,
+                    args.new_cluster_identifier,
+                    thresholds=load_thresholds(args.gate_thresholds),
+                    step=args.gate_interval,
+                    required_passes=args.gate_passes,
+                    max_ticks=args.gate_max_checks,
+                )
 
         upgrade_clone_cluster_identifier(
             cluster_identifier=args.cluster_identifier,
@@ -39,3 +53,11 @@ def clone_cluster_in_time(args):
             cluster_identifier=args.new_cluster_identifier,
             new_cluster_identifier=args.cluster_identifier,
         )
+
+        record_rollout(
+            args.cluster_identifier,
+            green_cluster_identifier=args.new_cluster_identifier,
+            command=args.command,
+            state_dir=args.state_dir,
+            engine_version=args.engine_version,
+        )
@@ -0,0 +1,293 @@
+import contextvars
+import json
+import logging
+import math
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+import polling2
+
+from algae.metrics import METRICS
+
+_logger = logging.getLogger(__name__)
+
+# service level objective of every phase in seconds, used when there is no
+# configuration nor enough history for the phase
+DEFAULT_DEADLINES = {
+    "clone": 7200,
+    "create-instance": 7200,
+    "upgrade": 10800,
+    "rename": 3600,
+    "instances": 3600,
+    "modify-instance": 7200,
+    "scaling": 3600,
+    "snapshot": 14400,
+    "restore": 10800,
+    "delete": 7200,
+    "blue-green": 10800,
+    "switchover": 900,
+    "fan-out": 14400,
+}
+
+# samples of a phase required before its deadline is derived from history
+MIN_HISTORY_SAMPLES = 5
+
+# deadlines the current rollout runs with, see `use_deadlines`
+_current_deadlines = contextvars.ContextVar("deadlines", default=None)
+
+# listeners of the phases the current rollout completes, see `track_phases`
+_phase_listeners = contextvars.ContextVar("phase_listeners", default=())
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, phase: str, identifier: str, elapsed: float, deadline: float):
+        super().__init__(
+            f'phase "{phase}" of "{identifier}" exceeded its deadline of '
+            f"{deadline:.0f}s after {elapsed:.0f}s"
+        )
+        self.phase = phase
+        self.identifier = identifier
+
+
+class Deadlines:
+    """
+    Per phase deadlines of a rollout
+
+    The escalation hooks are called with the phase event, once with level
+    "warning" when `warn_ratio` of the deadline is spent and once with level
+    "overrun" when the deadline is exceeded. Completed phase durations are
+    appended to the history file, when given.
+    """
+
+    def __init__(
+        self,
+        deadlines: dict = None,
+        hooks: list = None,
+        warn_ratio: float = 0.8,
+        history_path: str = None,
+    ):
+        self.deadlines = dict(DEFAULT_DEADLINES, **(deadlines or {}))
+        self.hooks = hooks or []
+        self.warn_ratio = warn_ratio
+        self.history_path = history_path
+        self._lock = threading.Lock()
+
+    def deadline(self, phase: str) -> float:
+        return self.deadlines.get(phase, max(DEFAULT_DEADLINES.values()))
+
+    def typical(self, phase: str) -> float:
+        """
+        Median recorded duration of the phase, None without history
+        """
+        if self.history_path is None:
+            return None
+
+        durations = load_history(self.history_path).get(phase)
+        if not durations:
+            return None
+        return percentile(durations, 50)
+
+    def escalate(self, event: dict):
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception:
+                _logger.exception(f"escalation hook failed for {event}")
+
+    def record(self, phase: str, elapsed: float):
+        if self.history_path is None:
+            return
+
+        # the history is bookkeeping, failing to keep it doesn't fail the rollout
+        try:
+            with self._lock:
+                history = load_history(self.history_path)
+                history.setdefault(phase, []).append(round(elapsed, 1))
+                directory = os.path.dirname(self.history_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.history_path, "w") as f:
+                    json.dump(history, f)
+        except Exception:
+            _logger.exception(
+                f'failed to record phase "{phase}" in "{self.history_path}"'
+            )
+
+
+class Phase:
+    def __init__(self, name: str, identifier: str, deadlines: Deadlines):
+        self.name = name
+        self.identifier = identifier
+        self.deadlines = deadlines
+        self.deadline = deadlines.deadline(name)
+        self.started = time.time()
+        self.warned = False
+
+    def elapsed(self) -> float:
+        return time.time() - self.started
+
+    def remaining(self) -> float:
+        return self.deadline - self.elapsed()
+
+    def event(self, level: str) -> dict:
+        return {
+            "level": level,
+            "phase": self.name,
+            "identifier": self.identifier,
+            "elapsed": self.elapsed(),
+            "deadline": self.deadline,
+        }
+
+
+def log_hook(event: dict):
+    message = (
+        f'phase "{event["phase"]}" of "{event["identifier"]}" at '
+        f'{event["elapsed"]:.0f}s of its {event["deadline"]:.0f}s deadline'
+    )
+    if event["level"] == "overrun":
+        _logger.error(message)
+    else:
+        _logger.warning(message)
+
+
+def command_hook(command: str):
+    """
+    Escalation hook running a shell command, the event is passed in the
+    ALGAE_* environment variables
+    :param command: the shell command
+    """
+
+    def hook(event: dict):
+        env = dict(
+            os.environ,
+            **{f"ALGAE_{key.upper()}": str(value) for key, value in event.items()},
+        )
+        subprocess.run(command, shell=True, env=env, check=False)
+
+    return hook
+
+
+def load_history(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def percentile(values: list, p: float) -> float:
+    # nearest-rank percentile
+    values = sorted(values)
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def load_deadlines(
+    path: str = None,
+    history_path: str = None,
+    p: float = 95,
+    margin: float = 1.5,
+    hooks: list = None,
+) -> Deadlines:
+    """
+    Build the phase deadlines, the configuration file takes precedence over
+    the history percentiles, which take precedence over the defaults
+    :param path: the path of the JSON file with the deadline of every phase
+    :param history_path: the path of the phase durations history
+    :param p: the history percentile
+    :param margin: the factor applied to the history percentile
+    :param hooks: the escalation hooks
+    :return: the deadlines
+    """
+    deadlines = {}
+
+    if history_path is not None:
+        for phase, durations in load_history(history_path).items():
+            if len(durations) >= MIN_HISTORY_SAMPLES:
+                deadlines[phase] = percentile(durations, p) * margin
+
+    if path is not None:
+        with open(path) as f:
+            deadlines.update(json.load(f))
+
+    return Deadlines(
+        deadlines, hooks=[log_hook] + (hooks or []), history_path=history_path
+    )
+
+
+def current_deadlines() -> Deadlines:
+    deadlines = _current_deadlines.get()
+    if deadlines is None:
+        deadlines = Deadlines(hooks=[log_hook])
+    return deadlines
+
+
+@contextmanager
+def use_deadlines(deadlines: Deadlines):
+    token = _current_deadlines.set(deadlines)
+    try:
+        yield deadlines
+    finally:
+        _current_deadlines.reset(token)
+
+
+@contextmanager
+def track_phases(listener):
+    """
+    Call the listener with the name and the duration of every phase completed
+    in the enclosed block, in the tasks given to `targets.submit` as well
+    :param listener: the function called with the phase name and seconds
+    """
+    token = _phase_listeners.set(_phase_listeners.get() + (listener,))
+    try:
+        yield
+    finally:
+        _phase_listeners.reset(token)
+
+
+@contextmanager
+def phase(name: str, identifier: str):
+    """
+    Bound the waits of the enclosed block by the deadline of the phase, the
+    duration is recorded in the history and reported to the listeners of
+    `track_phases` when the block completes
+    :param name: the phase name
+    :param identifier: the cluster, instance or snapshot identifier
+    """
+    deadlines = current_deadlines()
+    p = Phase(name, identifier, deadlines)
+    METRICS.phase_started(p)
+    try:
+        yield p
+    finally:
+        METRICS.phase_finished(p)
+
+    elapsed = p.elapsed()
+    deadlines.record(name, elapsed)
+    for listener in _phase_listeners.get():
+        listener(name, elapsed)
+
+
+def wait(p: Phase, predicate, step: int = 60):
+    """
+    Poll the predicate until it holds or the phase deadline is exceeded
+    :param p: the phase the wait belongs to
+    :param predicate: the predicate to poll
+    :param step: the polling interval in seconds
+    """
+
+    def check():
+        if not p.warned and p.elapsed() >= p.deadline * p.deadlines.warn_ratio:
+            p.warned = True
+            p.deadlines.escalate(p.event("warning"))
+        METRICS.poll(p.name)
+        return predicate()
+
+    try:
+        # a zero timeout would make polling2 poll forever
+        polling2.poll(check, step=step, timeout=max(p.remaining(), 1))
+    except polling2.TimeoutException:
+        p.deadlines.escalate(p.event("overrun"))
+        raise DeadlineExceeded(p.name, p.identifier, p.elapsed(), p.deadline)
@@ -0,0 +1,279 @@
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from algae.cleanup import cleanup_on_overrun
+from algae.deadlines import percentile, phase, wait
+from algae.rds import (
+    clone_cluster,
+    create_cluster_db_instances,
+    delete_cluster,
+    describe_cluster,
+    list_clusters,
+    list_instances,
+)
+from algae.targets import submit
+from algae.timing import timeit
+
+_logger = logging.getLogger(__name__)
+
+# tags of the clones, the expired clones are deleted by `expire_clones`
+SOURCE_TAG = "algae:source-cluster"
+EXPIRES_TAG = "algae:expires-at"
+
+
+def is_failed_status(status: str) -> bool:
+    return status in ("failed", "inaccessible-encryption-credentials") or (
+        status.startswith("incompatible")
+    )
+
+
+def get_tag(resource: dict, key: str) -> str:
+    for tag in resource.get("TagList", []):
+        if tag["Key"] == key:
+            return tag["Value"]
+    return None
+
+
+def delete_clones(identifiers: list, concurrency: int) -> list:
+    """
+    Delete the clones and their instances concurrently, a failure to delete
+    one of them does not stop the others
+    :param identifiers: the clone identifiers
+    :param concurrency: the clones deleted at the same time
+    :return: the deleted clones
+    """
+    if not identifiers:
+        return []
+
+    _logger.info(f"deleting clones {identifiers}")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            identifier: submit(executor, delete_cluster, identifier)
+            for identifier in identifiers
+        }
+
+    deleted = []
+    for identifier, future in futures.items():
+        try:
+            future.result()
+            deleted.append(identifier)
+        except Exception:
+            _logger.exception(f'failed to delete clone "{identifier}"')
+    return deleted
+
+
+@timeit
+def expire_clones(args):
+    """
+    Delete the clones whose time to live has elapsed
+    :param args:
+    :return: the deleted clones
+    """
+    now = time.time()
+    expired = [
+        cluster["DBClusterIdentifier"]
+        for cluster in list_clusters()
+        if get_tag(cluster, EXPIRES_TAG) is not None
+        and float(get_tag(cluster, EXPIRES_TAG)) <= now
+        and args.cluster_identifier in (None, get_tag(cluster, SOURCE_TAG))
+        and cluster["Status"] != "deleting"
+    ]
+    return delete_clones(expired, args.clone_concurrency)
+
+
+@timeit
+def fan_out_clones(args):
+    """
+    Create copy-on-write clones of the cluster for ephemeral environments, the
+    clones are not swapped with the source cluster
+
+    At most `clone_concurrency` clones are created at the same time, the
+    clusters and the instances of all of them are polled with one call each.
+    The clones of every run get their own suffix and are tagged to expire
+    after `ttl` seconds, the expired clones of the cluster are deleted first.
+    Unless detached, the command holds the clones and deletes them once their
+    time to live elapses. The clones are deleted when the fan-out exceeds its
+    deadline.
+    :param args:
+    :return: the time to ready and endpoint of every clone
+    """
+    if args.cluster_identifier is None or args.subnet_group_name is None:
+        return []
+
+    expire_clones(args)
+
+    source = describe_cluster(args.cluster_identifier)
+    expires_at = int(time.time() + args.ttl)
+    tags = [
+        {"Key": SOURCE_TAG, "Value": args.cluster_identifier},
+        {"Key": EXPIRES_TAG, "Value": str(expires_at)},
+    ]
+    # the clones of a previous run may not have expired yet
+    prefix = args.clone_prefix or f"{args.cluster_identifier}-clone"
+    prefix = f"{prefix}-{uuid.uuid4().hex[:8]}"
+
+    waiting = [f"{prefix}-{i}" for i in range(1, args.count + 1)]
+    clones = {}
+
+    def in_state(*states):
+        return [
+            identifier
+            for identifier, clone in clones.items()
+            if clone["status"] in states
+        ]
+
+    def created():
+        return [
+            identifier for identifier, clone in clones.items() if clone["requested"]
+        ]
+
+    def fail(identifier, reason):
+        _logger.error(f'clone "{identifier}" failed, {reason}')
+        clones[identifier].update(status="failed", error=reason)
+
+    def tick():
+        while waiting and len(in_state("cloning", "creating-instance")) < (
+            args.clone_concurrency
+        ):
+            identifier = waiting.pop(0)
+            clones[identifier] = {
+                "status": "cloning",
+                "started": time.time(),
+                "requested": False,
+            }
+            try:
+                clone_cluster(
+                    identifier,
+                    args.cluster_identifier,
+                    args.subnet_group_name,
+                    tags=tags,
+                    wait_available=False,
+                )
+                clones[identifier]["requested"] = True
+            except Exception as e:
+                fail(identifier, str(e))
+
+        cloning = in_state("cloning")
+        if cloning:
+            clusters = {
+                cluster["DBClusterIdentifier"]: cluster
+                for cluster in list_clusters(
+                    filters=[{"Name": "db-cluster-id", "Values": cloning}]
+                )
+            }
+            for identifier in cloning:
+                # a clone just requested may not be listed yet
+                status = clusters.get(identifier, {}).get("Status", "creating")
+                if is_failed_status(status):
+                    fail(identifier, f"cluster {status}")
+                elif status == "available":
+                    clones[identifier].update(
+                        status="creating-instance",
+                        endpoint=clusters[identifier].get("Endpoint"),
+                    )
+                    try:
+                        create_cluster_db_instances(
+                            identifier,
+                            engine_version=source["EngineVersion"],
+                            db_instance_class=args.db_instance_class,
+                            engine=source["Engine"],
+                            tags=tags,
+                            wait_available=False,
+                        )
+                    except Exception as e:
+                        fail(identifier, str(e))
+
+        creating = in_state("creating-instance")
+        if creating:
+            instances = {
+                instance["DBClusterIdentifier"]: instance["DBInstanceStatus"]
+                for instance in list_instances(
+                    filters=[{"Name": "db-cluster-id", "Values": creating}]
+                )
+            }
+            for identifier in creating:
+                status = instances.get(identifier, "creating")
+                if is_failed_status(status):
+                    fail(identifier, f"instance {status}")
+                elif status == "available":
+                    clone = clones[identifier]
+                    clone.update(
+                        status="ready", time_to_ready=time.time() - clone["started"]
+                    )
+                    _logger.info(
+                        f'clone "{identifier}" ready in '
+                        f'{clone["time_to_ready"]:.0f}s'
+                    )
+
+        return not waiting and not in_state("cloning", "creating-instance")
+
+    _logger.info(
+        f'creating {args.count} clones of "{args.cluster_identifier}", '
+        f"{args.clone_concurrency} at a time, expiring in {args.ttl}s"
+    )
+
+    with cleanup_on_overrun(
+        prefix,
+        keep=args.keep_on_overrun,
+        cleanup=lambda _: delete_clones(created(), args.clone_concurrency),
+    ):
+        with phase("fan-out", args.cluster_identifier) as p:
+            wait(p, tick, step=args.poll_interval)
+
+    report = [
+        {
+            "cluster_identifier": identifier,
+            "status": clone["status"],
+            "time_to_ready": clone.get("time_to_ready"),
+            "endpoint": clone.get("endpoint"),
+        }
+        for identifier, clone in clones.items()
+    ]
+
+    times = [
+        clone["time_to_ready"] for clone in report if clone["time_to_ready"] is not None
+    ]
+    if times:
+        _logger.info(
+            f"{len(times)} of {args.count} clones ready, time to ready median "
+            f"{percentile(times, 50):.0f}s, max {max(times):.0f}s"
+        )
+
+    if not args.detach:
+        hold_clones(args, report, created(), expires_at)
+    return report
+
+
+def hold_clones(args, report: list, identifiers: list, expires_at: float):
+    """
+    Keep the clones until their time to live elapses and delete them, the
+    clones left behind by an interruption are deleted by `expire_clones`
+    :param args:
+    :param report: the clones of the fan-out
+    :param identifiers: the clones created
+    :param expires_at: the expiry time of the clones
+    """
+    _logger.info(
+        "clones available until "
+        f"{datetime.fromtimestamp(expires_at).isoformat()}:\n" + format_clones(report)
+    )
+    time.sleep(max(expires_at - time.time(), 0))
+
+    deleted = delete_clones(identifiers, args.clone_concurrency)
+    for clone in report:
+        if clone["cluster_identifier"] in deleted:
+            clone["status"] = "expired"
+
+
+def format_clones(clones: list, target: str = None) -> str:
+    return "\n".join(
+        (f"{target}\t" if target else "")
+        + f'{clone["cluster_identifier"]}\t{clone["status"]}\t'
+        + ("-" if clone["time_to_ready"] is None else f'{clone["time_to_ready"]:.0f}')
+        + f'\t{clone["endpoint"] or "-"}'
+        for clone in clones
+    )
@@ -0,0 +1,176 @@
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from algae.targets import current_client
+
+_logger = logging.getLogger(__name__)
+
+# CloudWatch metric names, every metric is read with the DBClusterIdentifier
+# dimension
+METRICS = {
+    "cpu": "CPUUtilization",
+    "replica_lag": "AuroraReplicaLagMaximum",
+    "connections": "DatabaseConnections",
+    "commit_latency": "CommitLatency",
+}
+
+# "max" bounds the green cluster metrics, "max_ratio" bounds the green metrics
+# relative to the blue ones, every metric bounded must have datapoints. The
+# replica lag is only reported for clusters with replicas, it is not bounded
+# by default
+DEFAULT_THRESHOLDS = {
+    "max": {"cpu": 80.0, "commit_latency": 50.0},
+    "max_ratio": {"commit_latency": 2.0},
+}
+
+
+class CloudWatchMetrics:
+    """
+    Fetches the latest datapoint of every gate metric for a set of clusters
+    with a single GetMetricData call
+    """
+
+    def __init__(self, client=None, period: int = 60):
+        self.client = client or current_client("cloudwatch")
+        self.period = period
+
+    def fetch(self, cluster_identifiers: list) -> dict:
+        queries = {}
+        for i, cluster_identifier in enumerate(cluster_identifiers):
+            for name, metric_name in METRICS.items():
+                queries[f"m{i}_{name}"] = (cluster_identifier, name, metric_name)
+
+        end = datetime.now(timezone.utc)
+        response = self.client.get_metric_data(
+            MetricDataQueries=[
+                {
+                    "Id": query_id,
+                    "MetricStat": {
+                        "Metric": {
+                            "Namespace": "AWS/RDS",
+                            "MetricName": metric_name,
+                            "Dimensions": [
+                                {
+                                    "Name": "DBClusterIdentifier",
+                                    "Value": cluster_identifier,
+                                }
+                            ],
+                        },
+                        "Period": self.period,
+                        "Stat": "Maximum" if name == "replica_lag" else "Average",
+                    },
+                }
+                for query_id, (cluster_identifier, name, metric_name) in queries.items()
+            ],
+            StartTime=end - timedelta(seconds=self.period * 5),
+            EndTime=end,
+            ScanBy="TimestampDescending",
+        )
+
+        values = {cluster_identifier: {} for cluster_identifier in cluster_identifiers}
+        for result in response["MetricDataResults"]:
+            cluster_identifier, name, _ = queries[result["Id"]]
+            if result["Values"]:
+                values[cluster_identifier][name] = result["Values"][0]
+        return values
+
+
+def load_thresholds(path: str = None) -> dict:
+    """
+    Load the gate thresholds, the file overrides the defaults per metric
+    :param path: the path of the JSON thresholds file
+    :return: the thresholds
+    """
+    thresholds = {key: dict(value) for key, value in DEFAULT_THRESHOLDS.items()}
+    if path is not None:
+        with open(path) as f:
+            for key, value in json.load(f).items():
+                thresholds.setdefault(key, {}).update(value)
+    return thresholds
+
+
+def evaluate(blue: dict, green: dict, thresholds: dict) -> list:
+    """
+    Compare the green cluster metrics against the thresholds, a bounded green
+    metric without datapoints is a violation, a ratio is not evaluated
+    without blue datapoints
+    :param blue: the blue cluster metrics
+    :param green: the green cluster metrics
+    :param thresholds: the gate thresholds
+    :return: the violated thresholds
+    """
+    bounded = dict.fromkeys(
+        list(thresholds.get("max", {})) + list(thresholds.get("max_ratio", {}))
+    )
+    violations = [f"{name}: no datapoints" for name in bounded if name not in green]
+
+    for name, limit in thresholds.get("max", {}).items():
+        if name in green and green[name] > limit:
+            violations.append(f"{name} {green[name]:.2f} > {limit:.2f}")
+
+    for name, limit in thresholds.get("max_ratio", {}).items():
+        if name in green and blue.get(name):
+            ratio = green[name] / blue[name]
+            if ratio > limit:
+                violations.append(f"{name} ratio {ratio:.2f} > {limit:.2f}")
+
+    return violations
+
+
+def cutover_gate(
+    cluster_identifier: str,
+    green_cluster_identifier: str,
+    metrics=None,
+    thresholds: dict = None,
+    step: int = 60,
+    required_passes: int = 3,
+    max_ticks: int = 15,
+):
+    """
+    Hold the cutover until the green cluster is healthy
+
+    The metrics of both clusters are fetched once per tick, the gate proceeds
+    after `required_passes` consecutive healthy ticks and aborts when it does
+    not happen within `max_ticks`.
+    :param cluster_identifier: the blue cluster identifier
+    :param green_cluster_identifier: the green cluster identifier
+    :param metrics: the metrics backend, defaults to CloudWatch
+    :param thresholds: the gate thresholds
+    :param step: the interval between ticks in seconds
+    :param required_passes: the consecutive healthy ticks to proceed
+    :param max_ticks: the ticks before aborting
+    """
+    metrics = metrics or CloudWatchMetrics()
+    thresholds = thresholds or load_thresholds()
+
+    passes = 0
+    for tick in range(max_ticks):
+        values = metrics.fetch([cluster_identifier, green_cluster_identifier])
+        violations = evaluate(
+            values[cluster_identifier], values[green_cluster_identifier], thresholds
+        )
+
+        if violations:
+            passes = 0
+            _logger.warning(
+                f'cluster "{green_cluster_identifier}" not healthy: '
+                f'{", ".join(violations)}'
+            )
+        else:
+            passes += 1
+            _logger.info(
+                f'cluster "{green_cluster_identifier}" healthy '
+                f"({passes}/{required_passes})"
+            )
+            if passes >= required_passes:
+                return
+
+        if tick < max_ticks - 1:
+            time.sleep(step)
+
+    raise Exception(
+        f'aborting cutover, cluster "{green_cluster_identifier}" not healthy '
+        f"after {max_ticks} checks"
+    )
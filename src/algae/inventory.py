@@ -0,0 +1,28 @@
+from algae.rds import list_clusters
+
+
+def cluster_inventory(args):
+    """
+    Lists the clusters with their engine version and status
+    :param args:
+    :return: one entry per cluster
+    """
+    return [
+        {
+            "cluster_identifier": cluster["DBClusterIdentifier"],
+            "engine": cluster["Engine"],
+            "engine_version": cluster["EngineVersion"],
+            "status": cluster["Status"],
+            "instances": len(cluster["DBClusterMembers"]),
+        }
+        for cluster in list_clusters()
+    ]
+
+
+def format_inventory(clusters: list, target: str = None) -> str:
+    return "\n".join(
+        (f"{target}\t" if target else "")
+        + "{cluster_identifier}\t{engine}\t{engine_version}\t{status}\t"
+        "{instances}".format(**cluster)
+        for cluster in clusters
+    )
@@ -1,6 +1,9 @@
 import argparse
+import contextlib
 import logging
+import os
 import sys
+from datetime import datetime
 
 from algae import __version__
 
@@ -9,9 +12,19 @@ __copyright__ = "Cesar Alvernaz"
 __license__ = "MIT"
 
 from algae.config import setup_logging
-from algae.upgrade import upgrade_cluster_version
+from algae.deadlines import command_hook, load_deadlines, use_deadlines
+from algae.rds import delete_cluster
+from algae.upgrade import cutover_cluster, prepare_cluster, upgrade_cluster_version
 from algae.snapshot import restore_from_snapshot
 from algae.clone import clone_cluster_in_time
+from algae.fanout import expire_clones, fan_out_clones, format_clones
+from algae.inventory import cluster_inventory, format_inventory
+from algae.metrics import serve_metrics, track_rollouts
+from algae.rollback import rollback_cluster
+from algae.schedule import format_plan, schedule_rollouts
+from algae.state import DEFAULT_STATE_DIR
+from algae.targets import parse_targets, run_targets
+from algae.trace import record_trace, replay_trace
 
 _logger = logging.getLogger(__name__)
 
@@ -20,6 +33,135 @@ _logger = logging.getLogger(__name__)
 # The functions defined in this section are wrappers around the main Python
 # API allowing them to be called directly from the terminal as a CLI
 # executable/script.
+def add_gate_arguments(parser):
+    parser.add_argument(
+        "--gate",
+        help="hold the cutover until the clone is healthy",
+        action="store_true",
+    )
+    parser.add_argument("--gate-thresholds", help="JSON file with gate thresholds")
+    parser.add_argument(
+        "--gate-interval",
+        help="seconds between health checks",
+        type=int,
+        default=60,
+    )
+    parser.add_argument(
+        "--gate-passes",
+        help="consecutive healthy checks to cutover",
+        type=int,
+        default=3,
+    )
+    parser.add_argument(
+        "--gate-max-checks",
+        help="health checks before aborting the cutover",
+        type=int,
+        default=15,
+    )
+
+
+def add_prepare_arguments(parser):
+    parser.add_argument(
+        "--cluster-identifier", help="name identifier of the cluster clone"
+    )
+    parser.add_argument(
+        "--source-cluster-identifier", help="name identifier of the source cluster"
+    )
+    add_rollout_arguments(parser)
+
+
+def add_rollout_arguments(parser):
+    parser.add_argument("--engine-version", help="upgrade aurora version")
+    parser.add_argument("--subnet-group-name", help="name of VPC subnet group")
+    parser.add_argument(
+        "--backend",
+        help="rollout backend, auto uses RDS Blue/Green Deployments for Aurora",
+        choices=["auto", "classic", "blue-green"],
+        default="auto",
+    )
+    parser.add_argument(
+        "--provision",
+        help="how the classic backend creates the clone at the target version, "
+        "auto restores a snapshot at the target version when RDS allows it",
+        choices=["auto", "clone", "restore"],
+        default="auto",
+    )
+    parser.add_argument(
+        "--migrate-parameter-groups",
+        help="create parameter groups of the target version family with the "
+        "source cluster settings and attach them to the clone",
+        action="store_true",
+    )
+
+
+def add_cutover_arguments(parser):
+    parser.add_argument(
+        "--switchover-timeout",
+        help="seconds RDS allows for the blue/green switchover",
+        type=int,
+        default=300,
+    )
+    parser.add_argument(
+        "--prescale",
+        help="raise the clone capacity to match the source cluster before cutover",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--prescale-instance-class",
+        help="instance class of the clone before cutover, defaults to the source one",
+    )
+    parser.add_argument(
+        "--prescale-min-capacity",
+        help="Aurora Serverless v2 minimum ACUs of the clone before cutover",
+        type=float,
+    )
+    parser.add_argument(
+        "--soak-period",
+        help="seconds to keep the raised capacity after cutover",
+        type=int,
+        default=900,
+    )
+    parser.add_argument("--warmup-queries", help="SQL file with the warm-up queries")
+    parser.add_argument(
+        "--warmup-driver", help="DB-API driver module", default="pymysql"
+    )
+    parser.add_argument("--warmup-database", help="warm-up database name")
+    parser.add_argument(
+        "--warmup-concurrency",
+        help="number of concurrent warm-up connections",
+        type=int,
+        default=4,
+    )
+    parser.add_argument(
+        "--warmup-duration",
+        help="seconds to run the warm-up queries",
+        type=int,
+        default=300,
+    )
+    parser.add_argument(
+        "--verify-tables",
+        help="JSON file with the tables whose data is compared with the source "
+        "cluster before cutover, the writes to the source must be paused",
+    )
+    parser.add_argument(
+        "--verify-database",
+        help="database of the verified tables, defaults to the warm-up database",
+    )
+    parser.add_argument(
+        "--verify-chunk-size",
+        help="primary keys of the chunks checksummed on both clusters",
+        type=int,
+        default=100000,
+    )
+    parser.add_argument(
+        "--verify-concurrency",
+        help="number of chunks checksummed at the same time",
+        type=int,
+        default=8,
+    )
+    add_gate_arguments(parser)
+
+
 def parse_args(args):
     """Parse command line parameters
 
@@ -57,6 +199,76 @@ def parse_args(args):
         const=logging.DEBUG,
         default=False,
     )
+    parser.add_argument(
+        "--state-dir",
+        help="directory where the rollout metadata is kept",
+        default=DEFAULT_STATE_DIR,
+    )
+    parser.add_argument(
+        "--deadlines", help="JSON file with the deadline in seconds of every phase"
+    )
+    parser.add_argument(
+        "--deadline-percentile",
+        help="percentile of the phase history used to derive the deadlines",
+        type=float,
+        default=95,
+    )
+    parser.add_argument(
+        "--deadline-margin",
+        help="factor applied to the phase history percentile",
+        type=float,
+        default=1.5,
+    )
+    parser.add_argument(
+        "--escalation-command",
+        help="shell command run when a phase nears or exceeds its deadline",
+    )
+    parser.add_argument(
+        "--keep-on-overrun",
+        help="keep the partially created clone when a phase exceeds its deadline",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--regions",
+        help="comma separated regions to run the command against concurrently",
+        type=lambda value: value.split(","),
+    )
+    parser.add_argument(
+        "--profiles",
+        help="comma separated credential profiles, combined with every region",
+        type=lambda value: value.split(","),
+    )
+    parser.add_argument(
+        "--roles",
+        help="comma separated IAM roles to assume, combined with every region",
+        type=lambda value: value.split(","),
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        help="number of regions and accounts running at the same time",
+        type=int,
+    )
+    parser.add_argument(
+        "--max-attempts",
+        help="API call attempts per region and account",
+        type=int,
+        default=10,
+    )
+    trace_group = parser.add_mutually_exclusive_group()
+    trace_group.add_argument(
+        "--record-trace",
+        help="record the AWS API calls to this trace file",
+    )
+    trace_group.add_argument(
+        "--replay-trace",
+        help="replay the AWS API calls of this trace file under a virtual clock "
+        "instead of calling AWS",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        help="serve Prometheus metrics on this localhost port while running",
+        type=int,
+    )
 
     sub_parsers = parser.add_subparsers(dest="command")
 
@@ -67,14 +279,72 @@ def parse_args(args):
         "upgrade-cluster-version",
         help="upgrade cluster version",
     )
-    upgrade_parser.add_argument("--engine-version", help="upgrade aurora version")
-    upgrade_parser.add_argument(
-        "--cluster-identifier", help="name identifier of the cluster clone"
+    add_prepare_arguments(upgrade_parser)
+    add_cutover_arguments(upgrade_parser)
+
+    #
+    # prepare sub-parser
+    #
+    prepare_parser = sub_parsers.add_parser(
+        "prepare", help="build and upgrade the cluster clone ahead of the cutover"
     )
-    upgrade_parser.add_argument(
+    add_prepare_arguments(prepare_parser)
+
+    #
+    # cutover sub-parser
+    #
+    cutover_parser = sub_parsers.add_parser(
+        "cutover", help="swap the cluster with the prepared cluster clone"
+    )
+    cutover_parser.add_argument(
         "--source-cluster-identifier", help="name identifier of the source cluster"
     )
-    upgrade_parser.add_argument("--subnet-group-name", help="name of VPC subnet group")
+    cutover_parser.add_argument(
+        "--max-staleness",
+        help="seconds after which the prepared clone is built again",
+        type=int,
+        default=14400,
+    )
+    add_cutover_arguments(cutover_parser)
+
+    #
+    # schedule sub-parser
+    #
+    schedule_parser = sub_parsers.add_parser(
+        "schedule",
+        help="plan and run the upgrade of the fleet within a maintenance window",
+    )
+    schedule_parser.add_argument(
+        "--schedule", help="JSON file with the clusters, windows and priorities"
+    )
+    schedule_parser.add_argument(
+        "--window",
+        help="seconds of the maintenance window",
+        type=int,
+        default=14400,
+    )
+    schedule_parser.add_argument(
+        "--api-budget",
+        help="API calls per second the rollouts may spend per region and account",
+        type=float,
+        default=1.0,
+    )
+    schedule_parser.add_argument(
+        "--max-rollouts",
+        help="rollouts running at the same time per region and account",
+        type=int,
+        default=4,
+    )
+    schedule_parser.add_argument(
+        "--green-suffix",
+        help="suffix of the cluster clones",
+        default="green",
+    )
+    schedule_parser.add_argument(
+        "--dry-run", help="only show the plan", action="store_true"
+    )
+    add_rollout_arguments(schedule_parser)
+    add_cutover_arguments(schedule_parser)
 
     #
     # delete cluster sub-parser
@@ -83,6 +353,16 @@ def parse_args(args):
     delete_parser.add_argument(
         "--cluster-identifier", help="name identifier of the cluster"
     )
+    delete_parser.add_argument(
+        "--yes",
+        help="confirm the deletion of the cluster and its instances",
+        action="store_true",
+    )
+    delete_parser.add_argument(
+        "--skip-final-snapshot",
+        help="delete without the final snapshot of the cluster",
+        action="store_true",
+    )
 
     #
     # snapshot cluster sub-parser
@@ -100,9 +380,8 @@ def parse_args(args):
         "--new-cluster-identifier",
         help="name identifier for the new cluster created from snapshot",
     )
-    snapshot_parser.add_argument(
-        "--engine-version", help="upgrade aurora version"
-    )
+    snapshot_parser.add_argument("--engine-version", help="upgrade aurora version")
+    add_gate_arguments(snapshot_parser)
 
     #
     # clone cluster sub-parser
@@ -117,10 +396,94 @@ def parse_args(args):
         "--new-cluster-identifier",
         help="name identifier for the new cluster created from snapshot",
     )
-    clone_parser.add_argument(
-        "--engine-version", help="upgrade aurora version"
-    )
+    clone_parser.add_argument("--engine-version", help="upgrade aurora version")
     clone_parser.add_argument("--subnet-group-name", help="name of VPC subnet group")
+    add_gate_arguments(clone_parser)
+
+    #
+    # fan-out clones sub-parser
+    #
+    fan_out_parser = sub_parsers.add_parser(
+        "fan-out-clones",
+        help="create short-lived clones of the cluster for ephemeral environments",
+    )
+    fan_out_parser.add_argument(
+        "--cluster-identifier", help="name identifier of the source cluster"
+    )
+    fan_out_parser.add_argument("--count", help="number of clones", type=int, default=1)
+    fan_out_parser.add_argument(
+        "--clone-prefix",
+        help="prefix of the clone identifiers, defaults to <cluster>-clone, "
+        "followed by a suffix unique to the run",
+    )
+    fan_out_parser.add_argument("--subnet-group-name", help="name of VPC subnet group")
+    fan_out_parser.add_argument(
+        "--db-instance-class",
+        help="instance class of the clones",
+        default="db.t3.small",
+    )
+    fan_out_parser.add_argument(
+        "--clone-concurrency",
+        help="number of clones created at the same time",
+        type=int,
+        default=5,
+    )
+    fan_out_parser.add_argument(
+        "--ttl",
+        help="seconds after which the clones are deleted",
+        type=int,
+        default=14400,
+    )
+    fan_out_parser.add_argument(
+        "--detach",
+        help="return once the clones are ready and leave their deletion to "
+        "expire-clones instead of holding them until the ttl",
+        action="store_true",
+    )
+    fan_out_parser.add_argument(
+        "--poll-interval",
+        help="polling interval in seconds",
+        type=int,
+        default=30,
+    )
+
+    #
+    # expire clones sub-parser
+    #
+    expire_parser = sub_parsers.add_parser(
+        "expire-clones", help="delete the clones whose time to live has elapsed"
+    )
+    expire_parser.add_argument(
+        "--cluster-identifier",
+        help="only delete the clones of this source cluster",
+    )
+    expire_parser.add_argument(
+        "--clone-concurrency",
+        help="number of clones deleted at the same time",
+        type=int,
+        default=5,
+    )
+
+    #
+    # rollback sub-parser
+    #
+    rollback_parser = sub_parsers.add_parser(
+        "rollback", help="swap the cluster back to the retained blue cluster"
+    )
+    rollback_parser.add_argument(
+        "--cluster-identifier", help="name identifier of the cluster"
+    )
+    rollback_parser.add_argument(
+        "--poll-interval",
+        help="polling interval in seconds",
+        type=int,
+        default=5,
+    )
+
+    #
+    # inventory sub-parser
+    #
+    sub_parsers.add_parser("inventory", help="list clusters")
 
     if len(args) == 0:
         parser.print_help(sys.stderr)
@@ -129,16 +492,126 @@ def parse_args(args):
     return parser.parse_args(args)
 
 
+def delete_cluster_command(args):
+    if args.cluster_identifier is None:
+        return
+
+    if not args.yes:
+        raise Exception(
+            f'not deleting cluster "{args.cluster_identifier}", confirm with --yes'
+        )
+
+    final_snapshot_identifier = None
+    if not args.skip_final_snapshot:
+        timestamp = datetime.now().strftime("%y-%m-%d-%H-%M")
+        final_snapshot_identifier = f"{args.cluster_identifier}-final-{timestamp}"
+    delete_cluster(
+        args.cluster_identifier, final_snapshot_identifier=final_snapshot_identifier
+    )
+
+
+def get_command(command):
+    if "upgrade-cluster-version" in command:
+        return upgrade_cluster_version
+    if "restore-from-snapshot" in command:
+        return restore_from_snapshot
+    if "clone-cluster-in-time" in command:
+        return clone_cluster_in_time
+    if "rollback" in command:
+        return rollback_cluster
+    if "inventory" in command:
+        return cluster_inventory
+    if "delete-cluster" in command:
+        return delete_cluster_command
+    if "prepare" in command:
+        return prepare_cluster
+    if "cutover" in command:
+        return cutover_cluster
+    if "schedule" in command:
+        return schedule_rollouts
+    if "fan-out-clones" in command:
+        return fan_out_clones
+    if "expire-clones" in command:
+        return expire_clones
+
+
 def main(args):
     args = parse_args(args)
     setup_logging(args.loglevel)
 
-    if "upgrade-cluster-version" in args.command:
-        upgrade_cluster_version(args)
-    if "restore-from-snapshot" in args.command:
-        restore_from_snapshot(args)
-    if "clone-cluster-in-time" in args.command:
-        clone_cluster_in_time(args)
+    # a sub-command without a function does nothing
+    command = get_command(args.command or "")
+    if command is None:
+        return
+    command = track_rollouts(command, args.command)
+
+    hooks = []
+    if args.escalation_command is not None:
+        hooks.append(command_hook(args.escalation_command))
+
+    deadlines = load_deadlines(
+        args.deadlines,
+        history_path=os.path.join(args.state_dir, "history.json"),
+        p=args.deadline_percentile,
+        margin=args.deadline_margin,
+        hooks=hooks,
+    )
+
+    server = None
+    if args.metrics_port is not None:
+        server = serve_metrics(args.metrics_port)
+
+    if args.record_trace is not None:
+        trace = record_trace(args.record_trace)
+    elif args.replay_trace is not None:
+        trace = replay_trace(args.replay_trace)
+    else:
+        trace = contextlib.nullcontext()
+
+    try:
+        with trace, use_deadlines(deadlines):
+            run_command(command, args)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+
+def run_command(command, args):
+    if args.regions is None:
+        result = command(args)
+        if "inventory" in args.command:
+            print(format_inventory(result))
+        if "schedule" in args.command:
+            print(format_plan(result))
+        if "fan-out-clones" in args.command:
+            print(format_clones(result))
+        return
+
+    targets = parse_targets(
+        args.regions,
+        profiles=args.profiles,
+        roles=args.roles,
+        max_attempts=args.max_attempts,
+    )
+    results = run_targets(targets, command, args, max_concurrency=args.max_concurrency)
+
+    if "inventory" in args.command:
+        for name, result in results.items():
+            if result["status"] == "ok":
+                print(format_inventory(result["result"], target=name))
+
+    if "schedule" in args.command:
+        for name, result in results.items():
+            if result["status"] == "ok":
+                print(format_plan(result["result"], target=name))
+
+    if "fan-out-clones" in args.command:
+        for name, result in results.items():
+            if result["status"] == "ok":
+                print(format_clones(result["result"], target=name))
+
+    if any(result["status"] != "ok" for result in results.values()):
+        sys.exit(1)
 
 
 def run():
@@ -0,0 +1,256 @@
+import functools
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_logger = logging.getLogger(__name__)
+
+# error codes of the API calls rejected by the request rate limits
+THROTTLING_ERRORS = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "SlowDown",
+}
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class Metrics:
+    """
+    Live counters and gauges of the running rollouts, rendered in the
+    Prometheus text exposition format
+
+    The current phase of every cluster is tracked from the `deadlines.phase`
+    blocks, the polls from `deadlines.wait` and the API calls from the
+    clients given to `instrument`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases = {}
+        self.polls = {}
+        self.api_calls = {}
+        self.api_errors = {}
+        self.api_throttles = {}
+        self.rollouts_in_flight = {}
+        self.rollouts = {}
+
+    def phase_started(self, p):
+        with self._lock:
+            self.phases.setdefault(p.identifier, []).append(p)
+
+    def phase_finished(self, p):
+        with self._lock:
+            phases = self.phases.get(p.identifier, [])
+            if p in phases:
+                phases.remove(p)
+            if not phases:
+                self.phases.pop(p.identifier, None)
+
+    def poll(self, phase: str):
+        with self._lock:
+            self.polls[phase] = self.polls.get(phase, 0) + 1
+
+    def api_call(self, service: str, operation: str, error_code: str = None):
+        key = (service, operation)
+        with self._lock:
+            self.api_calls[key] = self.api_calls.get(key, 0) + 1
+            if error_code in THROTTLING_ERRORS:
+                self.api_throttles[key] = self.api_throttles.get(key, 0) + 1
+            elif error_code is not None:
+                key = (service, operation, error_code)
+                self.api_errors[key] = self.api_errors.get(key, 0) + 1
+
+    @contextmanager
+    def rollout(self, command: str):
+        with self._lock:
+            self.rollouts_in_flight[command] = (
+                self.rollouts_in_flight.get(command, 0) + 1
+            )
+
+        status = "failed"
+        try:
+            yield
+            status = "ok"
+        finally:
+            with self._lock:
+                self.rollouts_in_flight[command] -= 1
+                key = (command, status)
+                self.rollouts[key] = self.rollouts.get(key, 0) + 1
+
+    def render(self) -> str:
+        lines = []
+
+        def family(name: str, kind: str, description: str, samples):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(**labels)} {value}")
+
+        with self._lock:
+            # the innermost phase of every cluster is the current one
+            current = [phases[-1] for phases in self.phases.values()]
+            family(
+                "algae_phase",
+                "gauge",
+                "Current phase of the cluster",
+                ((dict(cluster=p.identifier, phase=p.name), 1) for p in current),
+            )
+            family(
+                "algae_phase_seconds",
+                "gauge",
+                "Seconds the cluster has spent in its current phase",
+                (
+                    (dict(cluster=p.identifier, phase=p.name), round(p.elapsed(), 1))
+                    for p in current
+                ),
+            )
+            family(
+                "algae_phase_deadline_seconds",
+                "gauge",
+                "Deadline of the current phase of the cluster",
+                (
+                    (dict(cluster=p.identifier, phase=p.name), p.deadline)
+                    for p in current
+                ),
+            )
+            family(
+                "algae_polls_total",
+                "counter",
+                "Status polls issued",
+                ((dict(phase=phase), count) for phase, count in self.polls.items()),
+            )
+            family(
+                "algae_api_calls_total",
+                "counter",
+                "AWS API call attempts, retries included",
+                (
+                    (dict(service=service, operation=operation), count)
+                    for (service, operation), count in self.api_calls.items()
+                ),
+            )
+            family(
+                "algae_api_errors_total",
+                "counter",
+                "AWS API call attempts that failed, throttling excluded",
+                (
+                    (dict(service=service, operation=operation, code=code), count)
+                    for (service, operation, code), count in self.api_errors.items()
+                ),
+            )
+            family(
+                "algae_api_throttles_total",
+                "counter",
+                "AWS API call attempts rejected by the rate limits",
+                (
+                    (dict(service=service, operation=operation), count)
+                    for (service, operation), count in self.api_throttles.items()
+                ),
+            )
+            family(
+                "algae_rollouts_in_flight",
+                "gauge",
+                "Rollouts running",
+                (
+                    (dict(command=command), count)
+                    for command, count in self.rollouts_in_flight.items()
+                ),
+            )
+            family(
+                "algae_rollouts_total",
+                "counter",
+                "Rollouts finished",
+                (
+                    (dict(command=command, status=status), count)
+                    for (command, status), count in self.rollouts.items()
+                ),
+            )
+
+        return "\n".join(lines) + "\n"
+
+
+# metrics of the running process
+METRICS = Metrics()
+
+
+def instrument(client):
+    """
+    Count the API call attempts of the client, with their errors and
+    throttles
+    :param client: the boto3 client
+    :return: the client
+    """
+    service_model = client.meta.service_model
+
+    # emitted once per attempt, with the response or the connection error
+    def on_attempt(response=None, caught_exception=None, operation=None, **kwargs):
+        error_code = None
+        if response is not None:
+            error_code = response[1].get("Error", {}).get("Code")
+        elif caught_exception is not None:
+            error_code = type(caught_exception).__name__
+        METRICS.api_call(service_model.service_name, operation.name, error_code)
+
+    client.meta.events.register(
+        f"needs-retry.{service_model.service_id.hyphenize()}", on_attempt
+    )
+    return client
+
+
+def track_rollouts(fn, command: str):
+    """
+    Count the command as an in-flight rollout while it runs
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with METRICS.rollout(command):
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+
+        body = METRICS.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        _logger.debug(format % args)
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve the metrics in the background for Prometheus to scrape
+    :param port: the port, 0 picks a free one
+    :param host: the address to listen on, localhost by default
+    :return: the server, `shutdown` stops it
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    _logger.info(f"serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
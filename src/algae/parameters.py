@@ -0,0 +1,170 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from algae.rds import (
+    create_cluster_parameter_group,
+    create_db_parameter_group,
+    delete_cluster_parameter_group,
+    delete_db_parameter_group,
+    describe_cluster,
+    describe_instance,
+    get_cluster_writer_identifier,
+    get_parameter_group_family,
+    list_cluster_parameters,
+    list_db_parameters,
+    list_engine_default_cluster_parameters,
+    list_engine_default_db_parameters,
+)
+from algae.targets import submit
+
+_logger = logging.getLogger(__name__)
+
+
+def diff_parameters(parameters: list, target_defaults: list):
+    """
+    Map the modified parameters of the source group onto the target family
+    :param parameters: the user modified parameters of the source group
+    :param target_defaults: the engine default parameters of the target family
+    :return: the parameters to set in the target group and the names of the
+    parameters the target family does not support
+    """
+    defaults = {parameter["ParameterName"]: parameter for parameter in target_defaults}
+
+    supported, unsupported = [], []
+    for parameter in parameters:
+        default = defaults.get(parameter["ParameterName"])
+        if default is None or not default.get("IsModifiable", True):
+            unsupported.append(parameter["ParameterName"])
+            continue
+
+        if parameter.get("ParameterValue") == default.get("ParameterValue"):
+            continue
+
+        supported.append(
+            {
+                "ParameterName": parameter["ParameterName"],
+                "ParameterValue": parameter["ParameterValue"],
+                # the group is attached at creation, every parameter is in
+                # effect once the instances boot
+                "ApplyMethod": (
+                    "pending-reboot"
+                    if default.get("ApplyType") == "static"
+                    else "immediate"
+                ),
+            }
+        )
+
+    return supported, unsupported
+
+
+def parameter_group_name(cluster_identifier: str, family: str) -> str:
+    # the names only allow letters, digits and hyphens
+    return f"{cluster_identifier}-{family}".replace(".", "-")
+
+
+def migrate_cluster_parameter_group(
+    source_group_name: str, family: str, cluster_identifier: str
+) -> dict:
+    supported, unsupported = diff_parameters(
+        list_cluster_parameters(source_group_name, source="user"),
+        list_engine_default_cluster_parameters(family),
+    )
+
+    group_name = parameter_group_name(cluster_identifier, family)
+    create_cluster_parameter_group(
+        group_name,
+        family,
+        f"{source_group_name} migrated to {family}",
+        supported,
+    )
+    return {"name": group_name, "unsupported": unsupported}
+
+
+def migrate_db_parameter_group(
+    source_group_name: str, family: str, cluster_identifier: str
+) -> dict:
+    supported, unsupported = diff_parameters(
+        list_db_parameters(source_group_name, source="user"),
+        list_engine_default_db_parameters(family),
+    )
+
+    group_name = parameter_group_name(f"{cluster_identifier}-instance", family)
+    create_db_parameter_group(
+        group_name,
+        family,
+        f"{source_group_name} migrated to {family}",
+        supported,
+    )
+    return {"name": group_name, "unsupported": unsupported}
+
+
+def migrate_parameter_groups(
+    source_cluster_identifier: str, engine_version: str, cluster_identifier: str
+) -> dict:
+    """
+    Create the cluster and DB parameter groups of the target engine version
+    family with the settings of the source cluster groups, so the green
+    cluster comes up tuned without a reboot to apply them
+    :param source_cluster_identifier: the name identifier of the source cluster
+    :param engine_version: the target engine version
+    :param cluster_identifier: the green cluster identifier, used to name the
+    groups
+    :return: the names of the created groups and the unsupported parameters
+    """
+    source = describe_cluster(source_cluster_identifier)
+    writer = describe_instance(get_cluster_writer_identifier(source_cluster_identifier))
+    family = get_parameter_group_family(source["Engine"], engine_version)
+
+    _logger.info(
+        f'migrating parameter groups of cluster "{source_cluster_identifier}" to '
+        f'family "{family}"'
+    )
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        cluster_group = submit(
+            executor,
+            migrate_cluster_parameter_group,
+            source["DBClusterParameterGroup"],
+            family,
+            cluster_identifier,
+        )
+        db_group = submit(
+            executor,
+            migrate_db_parameter_group,
+            writer["DBParameterGroups"][0]["DBParameterGroupName"],
+            family,
+            cluster_identifier,
+        )
+        cluster_group, db_group = cluster_group.result(), db_group.result()
+
+    unsupported = cluster_group["unsupported"] + db_group["unsupported"]
+    if unsupported:
+        _logger.warning(
+            f'parameters not supported by family "{family}": {", ".join(unsupported)}'
+        )
+
+    return {
+        "cluster": cluster_group["name"],
+        "db": db_group["name"],
+        "unsupported": unsupported,
+        "major": family
+        != get_parameter_group_family(source["Engine"], source["EngineVersion"]),
+    }
+
+
+def delete_parameter_groups(groups: dict):
+    """
+    Delete the parameter groups created by `migrate_parameter_groups`, a group
+    still attached to a cluster or an instance is kept and the failure logged
+    :param groups: the names of the migrated groups
+    """
+    for group_name, delete in (
+        (groups.get("cluster"), delete_cluster_parameter_group),
+        (groups.get("db"), delete_db_parameter_group),
+    ):
+        if group_name is None:
+            continue
+        try:
+            delete(group_name)
+        except Exception:
+            _logger.exception(f'failed to delete parameter group "{group_name}"')
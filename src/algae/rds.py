@@ -1,15 +1,28 @@
 import datetime
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from json import JSONEncoder
 
 import boto3
-import polling2
+
+from algae.deadlines import phase, wait
+from algae.metrics import instrument
+from algae.targets import current_target, submit
+from algae.trace import attach
 
 _logger = logging.getLogger(__name__)
 
-client = boto3.client("rds")
+client = attach(instrument(boto3.client("rds")))
+
+
+def get_client():
+    """
+    RDS client of the target the current rollout runs against
+    """
+    target = current_target()
+    return target.client("rds") if target else client
 
 
 class RestoreType(Enum):
@@ -35,37 +48,86 @@ class EngineType(Enum):
 
 
 def is_cluster_available(cluster_identifier: str) -> bool:
-    response = client.describe_db_clusters(DBClusterIdentifier=cluster_identifier)
+    response = get_client().describe_db_clusters(DBClusterIdentifier=cluster_identifier)
     _logger.info(response["DBClusters"][0]["Status"])
     return response["DBClusters"][0]["Status"] == "available"
 
 
 def is_cluster_upgrading(cluster_identifier: str) -> bool:
-    response = client.describe_db_clusters(DBClusterIdentifier=cluster_identifier)
+    response = get_client().describe_db_clusters(DBClusterIdentifier=cluster_identifier)
     _logger.info(response["DBClusters"][0]["Status"])
     return response["DBClusters"][0]["Status"] == "upgrading"
 
 
 def is_cluster_renaming(cluster_identifier: str) -> bool:
     try:
-        response = client.describe_db_clusters(DBClusterIdentifier=cluster_identifier)
+        response = get_client().describe_db_clusters(
+            DBClusterIdentifier=cluster_identifier
+        )
         _logger.info(response["DBClusters"][0]["Status"])
         return response["DBClusters"][0]["Status"] == "renaming"
-    except client.exceptions.DBClusterNotFoundFault:
+    except get_client().exceptions.DBClusterNotFoundFault:
         _logger.warning("cluster not found, this is the side effect of " "renaming")
         return True
 
 
+def is_cluster_identifier_released(cluster_identifier: str) -> bool:
+    try:
+        response = get_client().describe_db_clusters(
+            DBClusterIdentifier=cluster_identifier
+        )
+        _logger.info(response["DBClusters"][0]["Status"])
+        return False
+    except get_client().exceptions.DBClusterNotFoundFault:
+        return True
+
+
 def is_instance_available(instance_identifier: str) -> bool:
-    response = client.describe_db_instances(
+    response = get_client().describe_db_instances(
         DBInstanceIdentifier=instance_identifier,
     )
     _logger.info(response["DBInstances"][0]["DBInstanceStatus"])
     return response["DBInstances"][0]["DBInstanceStatus"] == "available"
 
 
+def is_instance_deleted(instance_identifier: str) -> bool:
+    try:
+        instance = describe_instance(instance_identifier)
+        _logger.info(instance["DBInstanceStatus"])
+        return False
+    except get_client().exceptions.DBInstanceNotFoundFault:
+        return True
+
+
+def is_cluster_deleted(cluster_identifier: str) -> bool:
+    try:
+        cluster = describe_cluster(cluster_identifier)
+        _logger.info(cluster["Status"])
+        return False
+    except get_client().exceptions.DBClusterNotFoundFault:
+        return True
+
+
+def is_instance_class(instance_identifier: str, db_instance_class: str) -> bool:
+    instance = describe_instance(instance_identifier)
+    _logger.info(instance["DBInstanceStatus"])
+    return (
+        instance["DBInstanceStatus"] == "available"
+        and instance["DBInstanceClass"] == db_instance_class
+    )
+
+
+def is_cluster_scaled(cluster_identifier: str, scaling_configuration: dict) -> bool:
+    cluster = describe_cluster(cluster_identifier)
+    _logger.info(cluster["Status"])
+    current = cluster.get("ServerlessV2ScalingConfiguration", {})
+    return cluster["Status"] == "available" and all(
+        current.get(key) == value for key, value in scaling_configuration.items()
+    )
+
+
 def is_snapshot_available(cluster_identifier: str, snapshot_identifier: str) -> bool:
-    response = client.describe_db_cluster_snapshots(
+    response = get_client().describe_db_cluster_snapshots(
         DBClusterIdentifier=cluster_identifier,
         DBClusterSnapshotIdentifier=snapshot_identifier,
         SnapshotType="manual",
@@ -75,7 +137,11 @@ def is_snapshot_available(cluster_identifier: str, snapshot_identifier: str) ->
 
 
 def clone_cluster(
-    cluster_identifier: str, source_cluster_identifier: str, subnet_group_name: str
+    cluster_identifier: str,
+    source_cluster_identifier: str,
+    subnet_group_name: str,
+    tags: list = None,
+    wait_available: bool = True,
 ):
     """
     Clone cluster
@@ -83,6 +149,8 @@ def clone_cluster(
     :param source_cluster_identifier: the name identifier of the source cluster
     :param subnet_group_name: the name of the VPC subnet where the clone will
     belong
+    :param tags: the tags of the clone
+    :param wait_available: wait for the clone to be available
     """
 
     _logger.info(
@@ -90,12 +158,13 @@ def clone_cluster(
         f'identifier "{cluster_identifier}"'
     )
 
-    response = client.restore_db_cluster_to_point_in_time(
+    response = get_client().restore_db_cluster_to_point_in_time(
         DBClusterIdentifier=cluster_identifier,
         RestoreType=RestoreType.COPY_ON_WRITE.value,
         SourceDBClusterIdentifier=source_cluster_identifier,
         UseLatestRestorableTime=True,
         DBSubnetGroupName=subnet_group_name,
+        Tags=tags or [],
     )
 
     _logger.debug(json.dumps(response, cls=SimpleJSONEncoder))
@@ -111,9 +180,9 @@ def clone_cluster(
             f"code {status_code}"
         )
 
-    polling2.poll(
-        lambda: is_cluster_available(cluster_identifier), step=60, poll_forever=True
-    )
+    if wait_available:
+        with phase("clone", cluster_identifier) as p:
+            wait(p, lambda: is_cluster_available(cluster_identifier))
 
 
 def create_cluster_db_instances(
@@ -121,6 +190,9 @@ def create_cluster_db_instances(
     engine_version: str,
     db_instance_class: str,
     engine: EngineType = EngineType.AURORA_MYSQL.value,
+    db_parameter_group_name: str = None,
+    tags: list = None,
+    wait_available: bool = True,
 ):
     """
     Create a database instance and associate to the cluster.
@@ -129,19 +201,28 @@ def create_cluster_db_instances(
     :param engine_version: engine version
     :param engine: aurora engine type
     :param db_instance_class: the instance class
+    :param db_parameter_group_name: the DB parameter group of the instance
+    :param tags: the tags of the instance
+    :param wait_available: wait for the instance to be available
     :return:
     """
 
     _logger.info(
-        f"creating cluster database instance in cluster \"{cluster_identifier}\" with version \"{engine_version}\""
+        f'creating cluster database instance in cluster "{cluster_identifier}" with version "{engine_version}"'
     )
 
-    response = client.create_db_instance(
+    parameters = {}
+    if db_parameter_group_name is not None:
+        parameters["DBParameterGroupName"] = db_parameter_group_name
+
+    response = get_client().create_db_instance(
         DBInstanceIdentifier=f"{cluster_identifier}-instance",
         DBClusterIdentifier=cluster_identifier,
         DBInstanceClass=db_instance_class,
         Engine=engine,
         EngineVersion=engine_version,
+        Tags=tags or [],
+        **parameters,
     )
 
     _logger.debug(json.dumps(response, cls=SimpleJSONEncoder))
@@ -156,23 +237,43 @@ def create_cluster_db_instances(
             f"failed to modify {cluster_identifier} with status " f"code {status_code}"
         )
 
-    polling2.poll(
-        lambda: is_instance_available(f"{cluster_identifier}-instance"),
-        step=60,
-        poll_forever=True,
-    )
+    if wait_available:
+        with phase("create-instance", f"{cluster_identifier}-instance") as p:
+            wait(p, lambda: is_instance_available(f"{cluster_identifier}-instance"))
 
 
-def upgrade_clone_cluster(cluster_identifier: str, engine_version: str):
+def upgrade_clone_cluster(
+    cluster_identifier: str,
+    engine_version: str,
+    cluster_parameter_group_name: str = None,
+    db_parameter_group_name: str = None,
+):
+    """
+    Upgrade the cluster engine version
+    :param cluster_identifier: the cluster identifier
+    :param engine_version: the target engine version
+    :param cluster_parameter_group_name: the cluster parameter group to attach
+    with the upgrade
+    :param db_parameter_group_name: the DB parameter group to attach to the
+    instances with the upgrade, only for major version upgrades
+    """
     _logger.info(
         f'modifying cluster clone "{cluster_identifier}" to engine '
         f"version {engine_version}"
     )
 
-    response = client.modify_db_cluster(
+    parameters = {}
+    if cluster_parameter_group_name is not None:
+        parameters["DBClusterParameterGroupName"] = cluster_parameter_group_name
+    if db_parameter_group_name is not None:
+        parameters["DBInstanceParameterGroupName"] = db_parameter_group_name
+        parameters["AllowMajorVersionUpgrade"] = True
+
+    response = get_client().modify_db_cluster(
         DBClusterIdentifier=cluster_identifier,
         ApplyImmediately=True,
         EngineVersion=engine_version,
+        **parameters,
     )
 
     _logger.debug(json.dumps(response, cls=SimpleJSONEncoder))
@@ -191,18 +292,28 @@ def upgrade_clone_cluster(cluster_identifier: str, engine_version: str):
         f'version "{engine_version}"'
     )
 
-    polling2.poll(
-        lambda: is_cluster_upgrading(cluster_identifier), step=60, poll_forever=True
-    )
-
-    polling2.poll(
-        lambda: is_cluster_available(cluster_identifier), step=60, poll_forever=True
-    )
+    with phase("upgrade", cluster_identifier) as p:
+        wait(p, lambda: is_cluster_upgrading(cluster_identifier))
+        wait(p, lambda: is_cluster_available(cluster_identifier))
 
 
 def upgrade_clone_cluster_identifier(
-    cluster_identifier: str, new_cluster_identifier: str = None, suffix: str = "backup"
+    cluster_identifier: str,
+    new_cluster_identifier: str = None,
+    suffix: str = "backup",
+    step: int = 60,
+    wait_available: bool = True,
 ):
+    """
+    Rename a cluster
+    :param cluster_identifier: the current name identifier of the cluster
+    :param new_cluster_identifier: the new name identifier of the cluster
+    :param suffix: the suffix appended to the current identifier when no new
+    identifier is given
+    :param step: the polling interval in seconds
+    :param wait_available: wait for the renamed cluster to be available, when
+    false it only waits until the current identifier is released
+    """
     if not suffix and not new_cluster_identifier:
         raise Exception("it requires suffix or a new identifier")
 
@@ -214,7 +325,7 @@ def upgrade_clone_cluster_identifier(
         f'{new_cluster_identifier}"'
     )
 
-    response = client.modify_db_cluster(
+    response = get_client().modify_db_cluster(
         DBClusterIdentifier=cluster_identifier,
         ApplyImmediately=True,
         NewDBClusterIdentifier=new_cluster_identifier,
@@ -231,21 +342,228 @@ def upgrade_clone_cluster_identifier(
             f"failed to modify {cluster_identifier} with status " f"code {status_code}"
         )
 
-    polling2.poll(
-        lambda: is_cluster_renaming(cluster_identifier), step=60, poll_forever=True
+    with phase("rename", cluster_identifier) as p:
+        # the cluster reports "renaming" under the current identifier before
+        # the new one can be described and the current one taken by another
+        # cluster
+        wait(p, lambda: is_cluster_identifier_released(cluster_identifier), step=step)
+
+        if wait_available:
+            wait(p, lambda: is_cluster_available(new_cluster_identifier), step=step)
+
+
+def list_clusters(filters: list = None) -> list:
+    paginator = get_client().get_paginator("describe_db_clusters")
+    return [
+        cluster
+        for page in paginator.paginate(Filters=filters or [])
+        for cluster in page["DBClusters"]
+    ]
+
+
+def list_instances(filters: list = None) -> list:
+    paginator = get_client().get_paginator("describe_db_instances")
+    return [
+        instance
+        for page in paginator.paginate(Filters=filters or [])
+        for instance in page["DBInstances"]
+    ]
+
+
+def describe_cluster(cluster_identifier: str) -> dict:
+    response = get_client().describe_db_clusters(DBClusterIdentifier=cluster_identifier)
+    return response["DBClusters"][0]
+
+
+def describe_instance(instance_identifier: str) -> dict:
+    response = get_client().describe_db_instances(
+        DBInstanceIdentifier=instance_identifier
+    )
+    return response["DBInstances"][0]
+
+
+def get_cluster_endpoint(cluster_identifier: str) -> str:
+    return describe_cluster(cluster_identifier)["Endpoint"]
+
+
+def get_cluster_instance_identifiers(cluster_identifier: str) -> list:
+    return [
+        member["DBInstanceIdentifier"]
+        for member in describe_cluster(cluster_identifier)["DBClusterMembers"]
+    ]
+
+
+def get_cluster_writer_identifier(cluster_identifier: str) -> str:
+    for member in describe_cluster(cluster_identifier)["DBClusterMembers"]:
+        if member["IsClusterWriter"]:
+            return member["DBInstanceIdentifier"]
+    raise Exception(f'cluster "{cluster_identifier}" has no writer instance')
+
+
+def modify_instance_class(
+    instance_identifier: str, db_instance_class: str, step: int = 60
+):
+    """
+    Change the instance class of a database instance
+    :param instance_identifier: the database instance identifier
+    :param db_instance_class: the new instance class
+    :param step: the polling interval in seconds
+    """
+    _logger.info(
+        f'modifying instance "{instance_identifier}" to instance class '
+        f'"{db_instance_class}"'
+    )
+
+    response = get_client().modify_db_instance(
+        DBInstanceIdentifier=instance_identifier,
+        DBInstanceClass=db_instance_class,
+        ApplyImmediately=True,
+    )
+
+    _logger.debug(json.dumps(response, cls=SimpleJSONEncoder))
+
+    status_code = response["ResponseMetadata"]["HTTPStatusCode"]
+    if status_code != 200:
+        _logger.error(
+            f"failed to modify {instance_identifier} with status code {status_code}"
+        )
+        raise Exception(
+            f"failed to modify {instance_identifier} with status code {status_code}"
+        )
+
+    with phase("modify-instance", instance_identifier) as p:
+        wait(
+            p,
+            lambda: is_instance_class(instance_identifier, db_instance_class),
+            step=step,
+        )
+
+
+def modify_cluster_scaling(
+    cluster_identifier: str, scaling_configuration: dict, step: int = 60
+):
+    """
+    Change the Aurora Serverless v2 capacity range of a cluster
+    :param cluster_identifier: the cluster identifier
+    :param scaling_configuration: the "MinCapacity" and "MaxCapacity" in ACUs
+    :param step: the polling interval in seconds
+    """
+    _logger.info(
+        f'modifying cluster "{cluster_identifier}" capacity to '
+        f"{scaling_configuration}"
+    )
+
+    response = get_client().modify_db_cluster(
+        DBClusterIdentifier=cluster_identifier,
+        ApplyImmediately=True,
+        ServerlessV2ScalingConfiguration=scaling_configuration,
     )
 
-    polling2.poll(
-        lambda: is_cluster_available(new_cluster_identifier), step=60, poll_forever=True
+    _logger.debug(json.dumps(response, cls=SimpleJSONEncoder))
+
+    status_code = response["ResponseMetadata"]["HTTPStatusCode"]
+    if status_code != 200:
+        _logger.error(
+            f"failed to modify {cluster_identifier} with status code {status_code}"
+        )
+        raise Exception(
+            f"failed to modify {cluster_identifier} with status code {status_code}"
+        )
+
+    with phase("scaling", cluster_identifier) as p:
+        wait(
+            p,
+            lambda: is_cluster_scaled(cluster_identifier, scaling_configuration),
+            step=step,
+        )
+
+
+def wait_cluster_instances_available(cluster_identifier: str, step: int = 60):
+    """
+    Wait for every database instance of the cluster to be available, the
+    instances are polled concurrently
+    :param cluster_identifier: the cluster identifier
+    :param step: the polling interval in seconds
+    """
+    instance_identifiers = get_cluster_instance_identifiers(cluster_identifier)
+    if not instance_identifiers:
+        return
+
+    with phase("instances", cluster_identifier) as p:
+
+        def wait_instance(instance_identifier):
+            wait(p, lambda: is_instance_available(instance_identifier), step=step)
+
+        with ThreadPoolExecutor(max_workers=len(instance_identifiers)) as executor:
+            futures = [
+                submit(executor, wait_instance, instance_identifier)
+                for instance_identifier in instance_identifiers
+            ]
+            # consume the results so a failure in any of the waits is raised
+            for future in futures:
+                future.result()
+
+
+def delete_cluster(
+    cluster_identifier: str, step: int = 60, final_snapshot_identifier: str = None
+):
+    """
+    Delete the cluster and its database instances, without final snapshot
+    unless an identifier is given for it
+    :param cluster_identifier: the cluster identifier
+    :param step: the polling interval in seconds
+    :param final_snapshot_identifier: the identifier of the final cluster
+    snapshot
+    """
+    instance_identifiers = get_cluster_instance_identifiers(cluster_identifier)
+
+    _logger.info(
+        f'deleting cluster "{cluster_identifier}" and instances '
+        f"{instance_identifiers}"
     )
 
+    with phase("delete", cluster_identifier) as p:
+        for instance_identifier in instance_identifiers:
+            response = get_client().delete_db_instance(
+                DBInstanceIdentifier=instance_identifier,
+                SkipFinalSnapshot=True,
+            )
+            _logger.debug(json.dumps(response, cls=SimpleJSONEncoder))
+
+        # the cluster can only be deleted once it has no instances
+        for instance_identifier in instance_identifiers:
+            wait(p, lambda: is_instance_deleted(instance_identifier), step=step)
+
+        snapshot = {"SkipFinalSnapshot": True}
+        if final_snapshot_identifier is not None:
+            snapshot = {
+                "SkipFinalSnapshot": False,
+                "FinalDBSnapshotIdentifier": final_snapshot_identifier,
+            }
+
+        response = get_client().delete_db_cluster(
+            DBClusterIdentifier=cluster_identifier, **snapshot
+        )
+        _logger.debug(json.dumps(response, cls=SimpleJSONEncoder))
+
+        status_code = response["ResponseMetadata"]["HTTPStatusCode"]
+        if status_code != 200:
+            _logger.error(
+                f"failed to delete {cluster_identifier} with status code {status_code}"
+            )
+            raise Exception(
+                f"failed to delete {cluster_identifier} with status code {status_code}"
+            )
+
+        wait(p, lambda: is_cluster_deleted(cluster_identifier), step=step)
+
 
 def create_db_cluster_snapshot(cluster_identifier: str, snapshot_identifier: str):
     _logger.info(
         f'creating cluster snapshot from "{cluster_identifier}" with identifier "{snapshot_identifier}"'
     )
 
-    response = client.create_db_cluster_snapshot(
+    response = get_client().create_db_cluster_snapshot(
         DBClusterIdentifier=cluster_identifier,
         DBClusterSnapshotIdentifier=snapshot_identifier,
     )
@@ -261,26 +579,63 @@ def create_db_cluster_snapshot(cluster_identifier: str, snapshot_identifier: str
             f"failed to snapshot {cluster_identifier} with status code {status_code}"
         )
 
-    polling2.poll(
-        lambda: is_snapshot_available(
-            cluster_identifier=cluster_identifier,
-            snapshot_identifier=snapshot_identifier,
-        ),
-        step=60,
-        poll_forever=True,
+    with phase("snapshot", snapshot_identifier) as p:
+        wait(
+            p,
+            lambda: is_snapshot_available(
+                cluster_identifier=cluster_identifier,
+                snapshot_identifier=snapshot_identifier,
+            ),
+        )
+
+
+def delete_db_cluster_snapshot(snapshot_identifier: str):
+    _logger.info(f'deleting cluster snapshot "{snapshot_identifier}"')
+
+    response = get_client().delete_db_cluster_snapshot(
+        DBClusterSnapshotIdentifier=snapshot_identifier
     )
 
+    _logger.debug(json.dumps(response, cls=SimpleJSONEncoder))
+
 
 def restore_cluster_from_snapshot(
-    snapshot_identifier: str, new_cluster_identifier: str, engine_type: EngineType
+    snapshot_identifier: str,
+    new_cluster_identifier: str,
+    engine_type: EngineType,
+    engine_version: str = None,
+    subnet_group_name: str = None,
+    cluster_parameter_group_name: str = None,
 ):
+    """
+    Restore a cluster from a snapshot
+    :param snapshot_identifier: the snapshot identifier
+    :param new_cluster_identifier: the name identifier for the new cluster
+    :param engine_type: aurora engine type
+    :param engine_version: the engine version of the new cluster, defaults to
+    the snapshot one
+    :param subnet_group_name: the name of the VPC subnet where the new cluster
+    will belong
+    :param cluster_parameter_group_name: the cluster parameter group of the new
+    cluster
+    """
     _logger.info(
         f'restoring cluster from snapshot "{snapshot_identifier}" with identifier "{new_cluster_identifier}"'
     )
-    response = client.restore_db_cluster_from_snapshot(
+
+    parameters = {}
+    if engine_version is not None:
+        parameters["EngineVersion"] = engine_version
+    if subnet_group_name is not None:
+        parameters["DBSubnetGroupName"] = subnet_group_name
+    if cluster_parameter_group_name is not None:
+        parameters["DBClusterParameterGroupName"] = cluster_parameter_group_name
+
+    response = get_client().restore_db_cluster_from_snapshot(
         DBClusterIdentifier=new_cluster_identifier,
         SnapshotIdentifier=snapshot_identifier,
         Engine=engine_type,
+        **parameters,
     )
 
     _logger.debug(json.dumps(response, cls=SimpleJSONEncoder))
@@ -294,10 +649,282 @@ def restore_cluster_from_snapshot(
             f"failed to restore {new_cluster_identifier} with status code {status_code}"
         )
 
-    polling2.poll(
-        lambda: is_cluster_available(new_cluster_identifier), step=60, poll_forever=True
+    with phase("restore", new_cluster_identifier) as p:
+        wait(p, lambda: is_cluster_available(new_cluster_identifier))
+
+
+def get_parameter_group_family(engine: str, engine_version: str) -> str:
+    response = get_client().describe_db_engine_versions(
+        Engine=engine, EngineVersion=engine_version
+    )
+    return response["DBEngineVersions"][0]["DBParameterGroupFamily"]
+
+
+def list_cluster_parameters(parameter_group_name: str, source: str = None) -> list:
+    paginator = get_client().get_paginator("describe_db_cluster_parameters")
+    parameters = {"Source": source} if source else {}
+    return [
+        parameter
+        for page in paginator.paginate(
+            DBClusterParameterGroupName=parameter_group_name, **parameters
+        )
+        for parameter in page["Parameters"]
+    ]
+
+
+def list_db_parameters(parameter_group_name: str, source: str = None) -> list:
+    paginator = get_client().get_paginator("describe_db_parameters")
+    parameters = {"Source": source} if source else {}
+    return [
+        parameter
+        for page in paginator.paginate(
+            DBParameterGroupName=parameter_group_name, **parameters
+        )
+        for parameter in page["Parameters"]
+    ]
+
+
+def list_engine_default_cluster_parameters(family: str) -> list:
+    paginator = get_client().get_paginator("describe_engine_default_cluster_parameters")
+    return [
+        parameter
+        for page in paginator.paginate(DBParameterGroupFamily=family)
+        for parameter in page["EngineDefaults"]["Parameters"]
+    ]
+
+
+def list_engine_default_db_parameters(family: str) -> list:
+    paginator = get_client().get_paginator("describe_engine_default_parameters")
+    return [
+        parameter
+        for page in paginator.paginate(DBParameterGroupFamily=family)
+        for parameter in page["EngineDefaults"]["Parameters"]
+    ]
+
+
+# maximum parameters of a single modify parameter group call
+MAX_MODIFY_PARAMETERS = 20
+
+
+def create_cluster_parameter_group(
+    parameter_group_name: str, family: str, description: str, parameters: list
+):
+    """
+    Create a cluster parameter group, or update it when it already exists
+    :param parameter_group_name: the parameter group name
+    :param family: the parameter group family
+    :param description: the parameter group description
+    :param parameters: the parameters to set
+    """
+    _logger.info(
+        f'creating cluster parameter group "{parameter_group_name}" of family '
+        f'"{family}"'
+    )
+
+    try:
+        get_client().create_db_cluster_parameter_group(
+            DBClusterParameterGroupName=parameter_group_name,
+            DBParameterGroupFamily=family,
+            Description=description,
+        )
+    except get_client().exceptions.DBParameterGroupAlreadyExistsFault:
+        _logger.warning(f'cluster parameter group "{parameter_group_name}" exists')
+
+    for i in range(0, len(parameters), MAX_MODIFY_PARAMETERS):
+        get_client().modify_db_cluster_parameter_group(
+            DBClusterParameterGroupName=parameter_group_name,
+            Parameters=parameters[i : i + MAX_MODIFY_PARAMETERS],
+        )
+
+
+def create_db_parameter_group(
+    parameter_group_name: str, family: str, description: str, parameters: list
+):
+    """
+    Create a DB parameter group, or update it when it already exists
+    :param parameter_group_name: the parameter group name
+    :param family: the parameter group family
+    :param description: the parameter group description
+    :param parameters: the parameters to set
+    """
+    _logger.info(
+        f'creating DB parameter group "{parameter_group_name}" of family "{family}"'
+    )
+
+    try:
+        get_client().create_db_parameter_group(
+            DBParameterGroupName=parameter_group_name,
+            DBParameterGroupFamily=family,
+            Description=description,
+        )
+    except get_client().exceptions.DBParameterGroupAlreadyExistsFault:
+        _logger.warning(f'DB parameter group "{parameter_group_name}" exists')
+
+    for i in range(0, len(parameters), MAX_MODIFY_PARAMETERS):
+        get_client().modify_db_parameter_group(
+            DBParameterGroupName=parameter_group_name,
+            Parameters=parameters[i : i + MAX_MODIFY_PARAMETERS],
+        )
+
+
+def delete_cluster_parameter_group(parameter_group_name: str):
+    _logger.info(f'deleting cluster parameter group "{parameter_group_name}"')
+
+    response = get_client().delete_db_cluster_parameter_group(
+        DBClusterParameterGroupName=parameter_group_name
+    )
+
+    _logger.debug(json.dumps(response, cls=SimpleJSONEncoder))
+
+
+def delete_db_parameter_group(parameter_group_name: str):
+    _logger.info(f'deleting DB parameter group "{parameter_group_name}"')
+
+    response = get_client().delete_db_parameter_group(
+        DBParameterGroupName=parameter_group_name
+    )
+
+    _logger.debug(json.dumps(response, cls=SimpleJSONEncoder))
+
+
+def describe_blue_green_deployment(deployment_identifier: str) -> dict:
+    response = get_client().describe_blue_green_deployments(
+        BlueGreenDeploymentIdentifier=deployment_identifier
+    )
+    return response["BlueGreenDeployments"][0]
+
+
+def is_blue_green_deployment_status(deployment_identifier: str, status: str) -> bool:
+    deployment = describe_blue_green_deployment(deployment_identifier)
+    _logger.info(deployment["Status"])
+    if deployment["Status"] in ("INVALID_CONFIGURATION", "SWITCHOVER_FAILED"):
+        raise Exception(
+            f'blue/green deployment "{deployment_identifier}" failed with status '
+            f'{deployment["Status"]}: {deployment.get("StatusDetails")}'
+        )
+    return deployment["Status"] == status
+
+
+def create_blue_green_deployment(
+    deployment_name: str,
+    source_cluster_identifier: str,
+    engine_version: str,
+    parameter_group_name: str = None,
+    db_parameter_group_name: str = None,
+) -> str:
+    """
+    Create a managed blue/green deployment of the cluster, the green cluster
+    is created at the target engine version, see
+    `wait_blue_green_deployment_available`
+    :param deployment_name: the name of the deployment
+    :param source_cluster_identifier: the name identifier of the source cluster
+    :param engine_version: the engine version of the green cluster
+    :param parameter_group_name: the cluster parameter group of the green
+    cluster
+    :param db_parameter_group_name: the DB parameter group of the green
+    instances
+    :return: the deployment identifier
+    """
+    _logger.info(
+        f'creating blue/green deployment "{deployment_name}" of cluster '
+        f'"{source_cluster_identifier}" with engine version "{engine_version}"'
+    )
+
+    parameters = {}
+    if parameter_group_name is not None:
+        parameters["TargetDBClusterParameterGroupName"] = parameter_group_name
+    if db_parameter_group_name is not None:
+        parameters["TargetDBParameterGroupName"] = db_parameter_group_name
+
+    response = get_client().create_blue_green_deployment(
+        BlueGreenDeploymentName=deployment_name,
+        Source=describe_cluster(source_cluster_identifier)["DBClusterArn"],
+        TargetEngineVersion=engine_version,
+        **parameters,
+    )
+
+    _logger.debug(json.dumps(response, cls=SimpleJSONEncoder))
+
+    status_code = response["ResponseMetadata"]["HTTPStatusCode"]
+    if status_code != 200:
+        _logger.error(
+            f"failed to create blue/green deployment {deployment_name} with "
+            f"status code {status_code}"
+        )
+        raise Exception(
+            f"failed to create blue/green deployment {deployment_name} with "
+            f"status code {status_code}"
+        )
+
+    return response["BlueGreenDeployment"]["BlueGreenDeploymentIdentifier"]
+
+
+def wait_blue_green_deployment_available(deployment_identifier: str, step: int = 60):
+    with phase("blue-green", deployment_identifier) as p:
+        wait(
+            p,
+            lambda: is_blue_green_deployment_status(deployment_identifier, "AVAILABLE"),
+            step=step,
+        )
+
+
+def switchover_blue_green_deployment(
+    deployment_identifier: str, timeout: int = 300, step: int = 15
+):
+    """
+    Switch the production traffic over to the green cluster
+    :param deployment_identifier: the deployment identifier
+    :param timeout: seconds RDS allows for the switchover before rolling back
+    :param step: the polling interval in seconds
+    """
+    _logger.info(f'switching over blue/green deployment "{deployment_identifier}"')
+
+    response = get_client().switchover_blue_green_deployment(
+        BlueGreenDeploymentIdentifier=deployment_identifier,
+        SwitchoverTimeout=timeout,
+    )
+
+    _logger.debug(json.dumps(response, cls=SimpleJSONEncoder))
+
+    status_code = response["ResponseMetadata"]["HTTPStatusCode"]
+    if status_code != 200:
+        _logger.error(
+            f"failed to switchover {deployment_identifier} with status code "
+            f"{status_code}"
+        )
+        raise Exception(
+            f"failed to switchover {deployment_identifier} with status code "
+            f"{status_code}"
+        )
+
+    with phase("switchover", deployment_identifier) as p:
+        wait(
+            p,
+            lambda: is_blue_green_deployment_status(
+                deployment_identifier, "SWITCHOVER_COMPLETED"
+            ),
+            step=step,
+        )
+
+
+def delete_blue_green_deployment(
+    deployment_identifier: str, delete_target: bool = False
+):
+    """
+    Delete the blue/green deployment, the clusters are kept unless
+    `delete_target` is set before the switchover
+    :param deployment_identifier: the deployment identifier
+    :param delete_target: delete the green cluster as well
+    """
+    _logger.info(f'deleting blue/green deployment "{deployment_identifier}"')
+
+    response = get_client().delete_blue_green_deployment(
+        BlueGreenDeploymentIdentifier=deployment_identifier,
+        DeleteTarget=delete_target,
     )
 
+    _logger.debug(json.dumps(response, cls=SimpleJSONEncoder))
+
 
 class SimpleJSONEncoder(JSONEncoder):
     def default(self, o):
@@ -0,0 +1,91 @@
+import logging
+import time
+
+from algae.deadlines import phase, wait
+from algae.rds import (
+    is_cluster_available,
+    upgrade_clone_cluster_identifier,
+    wait_cluster_instances_available,
+)
+from algae.state import load_rollout, save_rollout
+from algae.timing import timeit
+
+_logger = logging.getLogger(__name__)
+
+
+@timeit
+def rollback_cluster(args):
+    """
+    Swaps the canonical cluster identifier back to the retained blue cluster
+    recorded by the last rollout.
+
+    The green cluster gets its pre-cutover identifier back and the blue
+    cluster is renamed to the canonical identifier as soon as it is released,
+    without waiting for the green cluster to settle. The green cluster is
+    renamed back to the canonical identifier when the blue cluster can't take
+    it.
+    :param args:
+    :return:
+    """
+    if args.cluster_identifier is None:
+        return
+
+    rollout = load_rollout(args.cluster_identifier, state_dir=args.state_dir)
+    if rollout["status"] != "completed":
+        raise Exception(
+            f'cannot rollback "{args.cluster_identifier}", last rollout is '
+            f'"{rollout["status"]}"'
+        )
+
+    cluster_identifier = rollout["cluster_identifier"]
+    backup_cluster_identifier = rollout["backup_cluster_identifier"]
+    green_cluster_identifier = rollout["green_cluster_identifier"]
+    step = args.poll_interval
+
+    ts = time.time()
+
+    # the blue cluster must be able to take traffic before we take the
+    # canonical identifier away from the green cluster
+    if not is_cluster_available(backup_cluster_identifier):
+        raise Exception(f'backup cluster "{backup_cluster_identifier}" not available')
+
+    upgrade_clone_cluster_identifier(
+        cluster_identifier=cluster_identifier,
+        new_cluster_identifier=green_cluster_identifier,
+        step=step,
+        wait_available=False,
+    )
+    try:
+        upgrade_clone_cluster_identifier(
+            cluster_identifier=backup_cluster_identifier,
+            new_cluster_identifier=cluster_identifier,
+            step=step,
+        )
+    except Exception:
+        # production must not be left without a cluster under the canonical
+        # identifier, the green cluster takes it back
+        _logger.exception(
+            f'failed to rename "{backup_cluster_identifier}" to '
+            f'"{cluster_identifier}", restoring the green cluster'
+        )
+        with phase("rename", green_cluster_identifier) as p:
+            wait(p, lambda: is_cluster_available(green_cluster_identifier), step=step)
+        upgrade_clone_cluster_identifier(
+            cluster_identifier=green_cluster_identifier,
+            new_cluster_identifier=cluster_identifier,
+            step=step,
+        )
+        raise
+    wait_cluster_instances_available(cluster_identifier, step=step)
+
+    recovery_time = time.time() - ts
+    _logger.info(
+        f'rolled back "{cluster_identifier}" to the blue cluster in '
+        f"{recovery_time:.1f}s"
+    )
+
+    save_rollout(
+        cluster_identifier,
+        dict(rollout, status="rolled-back", recovery_time=recovery_time),
+        state_dir=args.state_dir,
+    )
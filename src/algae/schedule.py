@@ -0,0 +1,397 @@
+import copy
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from algae.backends import select_backend
+from algae.deadlines import current_deadlines, track_phases
+from algae.inventory import cluster_inventory
+from algae.targets import current_target, submit
+from algae.timing import timeit
+from algae.upgrade import upgrade_cluster_version
+
+_logger = logging.getLogger(__name__)
+
+# typical phase durations in seconds, used when there is no history for a phase
+TYPICAL_DURATIONS = {
+    "clone": 900,
+    "create-instance": 900,
+    "upgrade": 2700,
+    "snapshot": 600,
+    "restore": 1800,
+    "rename": 120,
+    "blue-green": 2700,
+    "switchover": 120,
+}
+
+# polling interval of the rollout waits, each poll is one API call
+POLL_INTERVAL = 60
+
+# seconds between the checks of the running rollouts for completed phases
+SCHEDULE_INTERVAL = 15
+
+# suffixes of the clusters created by the rollouts, never scheduled themselves
+ROLLOUT_SUFFIXES = ("-backup", "-old1")
+
+
+def load_schedule(path: str = None) -> dict:
+    """
+    Read the schedule configuration, a JSON file like
+
+        {
+            "clusters": {
+                "orders": {"priority": 10, "not_after": 7200},
+                "reports": {"not_before": 3600, "engine_version": "..."}
+            },
+            "durations": {"upgrade": 3600},
+            "api_budget": {"default": 1.0, "111111111111:admin/us-east-1": 0.5}
+        }
+
+    Without clusters every cluster of the inventory not at the target engine
+    version is scheduled. The windows are in seconds from the start of the
+    schedule, higher priorities are scheduled first.
+    :param path: the path of the JSON file
+    :return: the configuration
+    """
+    if path is None:
+        return {}
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def predict_phases(args, backend, durations: dict = None) -> list:
+    """
+    Predict the duration of every phase of a rollout from the configured
+    durations, the recorded phase durations or the typical ones, in this order
+    :return: the phase names with their durations, in the order they run
+    """
+    durations = durations or {}
+    deadlines = current_deadlines()
+
+    phases = []
+    for name in backend.phases(args):
+        typical = deadlines.typical(name)
+        if typical is None:
+            typical = TYPICAL_DURATIONS[name]
+        phases.append((name, durations.get(name, typical)))
+    return phases
+
+
+def predict_steps(args) -> float:
+    # the steps of the cutover
+    duration = 0
+    if args.warmup_queries is not None:
+        duration += args.warmup_duration
+    if args.gate:
+        duration += args.gate_interval * args.gate_passes
+    if args.prescale:
+        duration += args.soak_period
+    return duration
+
+
+def predict_duration(args, backend, durations: dict = None) -> float:
+    """
+    Predict the duration of a rollout, its phases and the steps of the cutover
+    """
+    phases = predict_phases(args, backend, durations)
+    return sum(duration for _, duration in phases) + predict_steps(args)
+
+
+class RolloutProgress:
+    """
+    Predicted end of a running rollout, corrected as its phases complete
+
+    The phases still to run keep their predicted durations from the
+    completion of the last phase, the phases finishing early or late move the
+    end along with them.
+    """
+
+    def __init__(self, rollout: dict, started: float):
+        self.started = started
+        self.remaining = list(rollout["phases"])
+        self.steps = rollout["duration"] - sum(d for _, d in self.remaining)
+        self.last = time.time() - started
+        self.finished = None
+        self.changed = False
+        self._lock = threading.Lock()
+
+    def phase_finished(self, name: str, elapsed: float):
+        with self._lock:
+            names = [phase for phase, _ in self.remaining]
+            # the phases nested in the predicted ones
+            if name not in names:
+                return
+
+            del self.remaining[names.index(name)]
+            self.last = time.time() - self.started
+            self.changed = True
+
+    def end(self, now: float) -> float:
+        with self._lock:
+            end = self.last + sum(d for _, d in self.remaining) + self.steps
+        # late rollouts are expected to complete by the next poll
+        return max(end, now + POLL_INTERVAL)
+
+    def updated(self) -> bool:
+        """
+        Whether a phase completed since the last call
+        """
+        with self._lock:
+            changed, self.changed = self.changed, False
+            return changed
+
+    def run(self, fn, args):
+        with track_phases(self.phase_finished):
+            try:
+                return fn(args)
+            finally:
+                self.finished = time.time() - self.started
+
+
+def rollout_args(args, cluster_identifier: str, engine_version: str):
+    rollout = copy.copy(args)
+    rollout.source_cluster_identifier = cluster_identifier
+    rollout.cluster_identifier = f"{cluster_identifier}-{args.green_suffix}"
+    rollout.engine_version = engine_version
+    return rollout
+
+
+def collect_rollouts(args, config: dict) -> list:
+    """
+    Build the rollouts to schedule from the cluster inventory
+    :param args:
+    :param config: the schedule configuration
+    :return: one entry per cluster to upgrade
+    """
+    clusters = config.get("clusters")
+
+    rollouts = []
+    for cluster in cluster_inventory(args):
+        identifier = cluster["cluster_identifier"]
+        settings = (clusters or {}).get(identifier, {})
+        engine_version = settings.get("engine_version", args.engine_version)
+
+        if clusters is not None and identifier not in clusters:
+            continue
+        if identifier.endswith(ROLLOUT_SUFFIXES + (f"-{args.green_suffix}",)):
+            continue
+        if engine_version is None or cluster["engine_version"] == engine_version:
+            continue
+        if cluster["status"] != "available":
+            _logger.warning(f'skipping cluster "{identifier}", {cluster["status"]}')
+            continue
+
+        backend = select_backend(rollout_args(args, identifier, engine_version))
+        phases = predict_phases(args, backend, config.get("durations"))
+        rollouts.append(
+            {
+                "cluster_identifier": identifier,
+                "engine_version": engine_version,
+                "backend": backend.name,
+                "phases": phases,
+                "duration": sum(d for _, d in phases) + predict_steps(args),
+                # the cluster wait and one wait per instance poll concurrently
+                "api_rate": (1 + cluster["instances"]) / POLL_INTERVAL,
+                "priority": settings.get("priority", 0),
+                "not_before": settings.get("not_before", 0),
+                "not_after": settings.get("not_after"),
+            }
+        )
+
+    return rollouts
+
+
+def plan_rollouts(
+    rollouts: list,
+    window: float,
+    api_budget: float,
+    max_rollouts: int,
+    now: float = 0,
+    running: list = None,
+) -> list:
+    """
+    Plan the start of every rollout so as many as possible complete within
+    the window
+
+    The rollouts start highest priority first then shortest first, the
+    shortest first order completes the most rollouts in a window, as soon as
+    a slot is free, their window is open and the API rate of the running
+    rollouts leaves room for them.
+    :param rollouts: the rollouts to plan
+    :param window: the seconds from the start of the schedule every rollout
+    must complete in
+    :param api_budget: the API calls per second the running rollouts may spend
+    :param max_rollouts: the rollouts running at the same time
+    :param now: the seconds elapsed since the start of the schedule
+    :param running: the predicted end and API rate of the running rollouts
+    :return: the rollouts with their planned start and end, None when they
+    can't complete within the window
+    """
+    pending = sorted(rollouts, key=lambda r: (-r["priority"], r["duration"]))
+    active = [(r["end"], r["api_rate"]) for r in running or []]
+    plan = []
+
+    t = now
+    while pending:
+        active = [(end, rate) for end, rate in active if end > t]
+
+        for rollout in list(pending):
+            end = t + rollout["duration"]
+            if (
+                len(active) < max_rollouts
+                and sum(rate for _, rate in active) + rollout["api_rate"] <= api_budget
+                and rollout["not_before"] <= t
+                and end <= min(window, rollout["not_after"] or window)
+            ):
+                plan.append(dict(rollout, start=t, end=end))
+                active.append((end, rollout["api_rate"]))
+                pending.remove(rollout)
+
+        # the next time a slot frees or a window opens
+        events = [end for end, _ in active] + [
+            r["not_before"] for r in pending if r["not_before"] > t
+        ]
+        if not events:
+            break
+        t = min(events)
+
+    plan += [dict(rollout, start=None, end=None) for rollout in pending]
+    return plan
+
+
+def format_plan(plan: list, target: str = None) -> str:
+    def seconds(value):
+        return "-" if value is None else f"{value:.0f}"
+
+    return "\n".join(
+        (f"{target}\t" if target else "")
+        + f'{rollout["cluster_identifier"]}\t{rollout["engine_version"]}\t'
+        f'{rollout["backend"]}\t{seconds(rollout["start"])}\t'
+        f'{seconds(rollout["end"])}\t{rollout["status"]}'
+        for rollout in sorted(plan, key=lambda r: (r["start"] is None, r["start"] or 0))
+    )
+
+
+def get_api_budget(args, config: dict) -> float:
+    budget = config.get("api_budget", args.api_budget)
+    if not isinstance(budget, dict):
+        return budget
+
+    target = current_target()
+    return budget.get(
+        target.name if target else "default",
+        budget.get("default", args.api_budget),
+    )
+
+
+@timeit
+def schedule_rollouts(args):
+    """
+    Plan the upgrade of the fleet within the maintenance window and run it,
+    the remaining rollouts are planned again every time a phase or a rollout
+    completes
+    :param args:
+    :return: the rollouts with their start, end and status
+    """
+    config = load_schedule(args.schedule)
+    api_budget = get_api_budget(args, config)
+    pending = collect_rollouts(args, config)
+
+    if args.dry_run:
+        plan = plan_rollouts(pending, args.window, api_budget, args.max_rollouts)
+        return [
+            dict(r, status="planned" if r["start"] is not None else "deferred")
+            for r in plan
+        ]
+
+    started = time.time()
+    running, results = {}, []
+    plan = None
+
+    with ThreadPoolExecutor(max_workers=args.max_rollouts) as executor:
+        while True:
+            now = time.time() - started
+
+            for future in [future for future in running if future.done()]:
+                rollout, progress = running.pop(future)
+                try:
+                    future.result()
+                    status = "completed"
+                except Exception:
+                    _logger.exception(
+                        f'rollout of "{rollout["cluster_identifier"]}" failed'
+                    )
+                    status = "failed"
+
+                _logger.info(
+                    f'rollout of "{rollout["cluster_identifier"]}" {status} in '
+                    f'{progress.finished - rollout["start"]:.0f}s, predicted '
+                    f'{rollout["duration"]:.0f}s'
+                )
+                results.append(dict(rollout, end=progress.finished, status=status))
+                plan = None
+
+            # every progress is reset, not only the first updated one
+            if any([progress.updated() for _, progress in running.values()]):
+                plan = None
+
+            if plan is None:
+                plan = plan_rollouts(
+                    pending,
+                    args.window,
+                    api_budget,
+                    args.max_rollouts,
+                    now=now,
+                    running=[
+                        dict(rollout, end=progress.end(now))
+                        for rollout, progress in running.values()
+                    ],
+                )
+                _logger.info(
+                    f"{len(running)} rollouts running, plan:\n"
+                    + format_plan(
+                        [
+                            dict(r, status="planned")
+                            for r in plan
+                            if r["start"] is not None
+                        ]
+                    )
+                )
+
+            for rollout in plan:
+                if rollout["start"] is None or rollout["start"] > now:
+                    continue
+
+                _logger.info(f'starting rollout of "{rollout["cluster_identifier"]}"')
+                rollout = dict(rollout, start=now)
+                progress = RolloutProgress(rollout, started)
+                future = submit(
+                    executor,
+                    progress.run,
+                    upgrade_cluster_version,
+                    rollout_args(
+                        args, rollout["cluster_identifier"], rollout["engine_version"]
+                    ),
+                )
+                running[future] = (rollout, progress)
+                pending = [
+                    r
+                    for r in pending
+                    if r["cluster_identifier"] != rollout["cluster_identifier"]
+                ]
+                plan = None
+
+            if plan is None:
+                continue
+
+            # the windows of the next rollouts open, the running rollouts are
+            # checked for completed phases in between
+            starts = [r["start"] - now for r in plan if r["start"] is not None]
+            if not running and not starts:
+                break
+            time.sleep(min(starts + ([SCHEDULE_INTERVAL] if running else [])))
+
+    return results + [dict(r, start=None, end=None, status="deferred") for r in pending]
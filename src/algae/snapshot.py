@@ -1,5 +1,8 @@
 from datetime import datetime
 
+from algae.cleanup import cleanup_on_overrun
+from algae.gate import cutover_gate, load_thresholds
+from algae.state import record_rollout
 from algae.timing import timeit
 from algae.rds import (
     create_db_cluster_snapshot,
@@ -21,18 +24,29 @@ def restore_from_snapshot(args):
             snapshot_identifier=snapshot_identifier,
         )
 
-        restore_cluster_from_snapshot(
-            snapshot_identifier,
-            args.new_cluster_identifier,
-            EngineType.AURORA_MYSQL.value,
-        )
+        with cleanup_on_overrun(args.new_cluster_identifier, keep=args.keep_on_overrun):
+            restore_cluster_from_snapshot(
+                snapshot_identifier,
+                args.new_cluster_identifier,
+                EngineType.AURORA_MYSQL.value,
+            )
 
-        db_instance_class = "db.t3.small"
-        create_cluster_db_instances(
-            args.new_cluster_identifier,
-            engine_version=args.engine_version,
-            db_instance_class=db_instance_class,
-        )
+            db_instance_class = "db.t3.small"
+            create_cluster_db_instances(
+                args.new_cluster_identifier,
+                engine_version=args.engine_version,
+                db_instance_class=db_instance_class,
+            )
+
+            if args.gate:
+                cutover_gate(
+                    args.cluster_identifier,
+                    args.new_cluster_identifier,
+                    thresholds=load_thresholds(args.gate_thresholds),
+                    step=args.gate_interval,
+                    required_passes=args.gate_passes,
+                    max_ticks=args.gate_max_checks,
+                )
 
         # rename original cluster to "original-backup"
         upgrade_clone_cluster_identifier(
@@ -44,3 +58,11 @@ def restore_from_snapshot(args):
             cluster_identifier=args.new_cluster_identifier,
             new_cluster_identifier=args.cluster_identifier,
         )
+
+        record_rollout(
+            args.cluster_identifier,
+            green_cluster_identifier=args.new_cluster_identifier,
+            command=args.command,
+            state_dir=args.state_dir,
+            engine_version=args.engine_version,
+        )
@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+from datetime import datetime
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_DIR = os.path.expanduser("~/.algae")
+
+
+def rollout_path(cluster_identifier: str, state_dir: str = DEFAULT_STATE_DIR) -> str:
+    return os.path.join(state_dir, "rollouts", f"{cluster_identifier}.json")
+
+
+def save_rollout(
+    cluster_identifier: str, record: dict, state_dir: str = DEFAULT_STATE_DIR
+):
+    """
+    Persist the rollout metadata of a cluster
+    :param cluster_identifier: the canonical name identifier of the cluster
+    :param record: the rollout metadata
+    :param state_dir: the directory where the rollout metadata is kept
+    """
+    path = rollout_path(cluster_identifier, state_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    record = dict(record, updated_at=datetime.now().isoformat())
+
+    # write aside and move, a crash mid-write must not lose the previous record
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(record, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+    _logger.debug(f'saved rollout metadata of "{cluster_identifier}" to {path}')
+
+
+def load_rollout(cluster_identifier: str, state_dir: str = DEFAULT_STATE_DIR) -> dict:
+    path = rollout_path(cluster_identifier, state_dir)
+    if not os.path.exists(path):
+        raise Exception(f'no rollout metadata recorded for "{cluster_identifier}"')
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def record_rollout(
+    cluster_identifier: str,
+    green_cluster_identifier: str,
+    command: str,
+    state_dir: str = DEFAULT_STATE_DIR,
+    suffix: str = "backup",
+    **extra,
+):
+    """
+    Record a completed blue/green swap, the previous (blue) cluster is retained
+    under the "-backup" suffix and can be swapped back with `algae rollback`
+    :param cluster_identifier: the canonical name identifier of the cluster
+    :param green_cluster_identifier: the identifier the green cluster had before
+    the swap
+    :param command: the command that performed the swap
+    :param state_dir: the directory where the rollout metadata is kept
+    :param suffix: the suffix used to retain the blue cluster
+    """
+    save_rollout(
+        cluster_identifier,
+        {
+            "cluster_identifier": cluster_identifier,
+            "backup_cluster_identifier": f"{cluster_identifier}-{suffix}",
+            "green_cluster_identifier": green_cluster_identifier,
+            "command": command,
+            "status": "completed",
+            **extra,
+        },
+        state_dir=state_dir,
+    )
+
+
+def prepared_path(cluster_identifier: str, state_dir: str = DEFAULT_STATE_DIR) -> str:
+    return os.path.join(state_dir, "prepared", f"{cluster_identifier}.json")
+
+
+def save_prepared(
+    cluster_identifier: str, record: dict, state_dir: str = DEFAULT_STATE_DIR
+):
+    """
+    Persist the green cluster prepared ahead of the cutover of a cluster
+    :param cluster_identifier: the canonical name identifier of the cluster
+    :param record: the prepared green cluster metadata
+    :param state_dir: the directory where the rollout metadata is kept
+    """
+    path = prepared_path(cluster_identifier, state_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(record, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+    _logger.debug(f'saved prepared cluster of "{cluster_identifier}" to {path}')
+
+
+def load_prepared(cluster_identifier: str, state_dir: str = DEFAULT_STATE_DIR) -> dict:
+    path = prepared_path(cluster_identifier, state_dir)
+    if not os.path.exists(path):
+        raise Exception(f'no prepared cluster recorded for "{cluster_identifier}"')
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def remove_prepared(cluster_identifier: str, state_dir: str = DEFAULT_STATE_DIR):
+    path = prepared_path(cluster_identifier, state_dir)
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,199 @@
+import contextvars
+import copy
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import product
+
+import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import (
+    AssumeRoleCredentialFetcher,
+    DeferredRefreshableCredentials,
+)
+
+from algae.metrics import instrument
+from algae.trace import attach
+
+_logger = logging.getLogger(__name__)
+
+# target the current rollout runs against, see `use_target`
+_current_target = contextvars.ContextVar("target", default=None)
+
+
+class Target:
+    """
+    An account and region pair, identified by a profile, an IAM role to
+    assume, or the default credentials.
+
+    Every target keeps its own clients so the client side rate limiting of
+    the adaptive retry mode gives each account and region an independent
+    API budget.
+    """
+
+    def __init__(
+        self,
+        region: str,
+        profile: str = None,
+        role_arn: str = None,
+        max_attempts: int = 10,
+        max_pool_connections: int = 10,
+    ):
+        self.region = region
+        self.profile = profile
+        self.role_arn = role_arn
+        self.config = Config(
+            region_name=region,
+            retries={"mode": "adaptive", "max_attempts": max_attempts},
+            max_pool_connections=max_pool_connections,
+        )
+        self._session = None
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        if self.role_arn:
+            # arn:aws:iam::<account>:role/<name>
+            account = self.role_arn.split(":")[4]
+            credentials = f'{account}:{self.role_arn.split("/")[-1]}'
+        else:
+            credentials = self.profile or "default"
+        return f"{credentials}/{self.region}"
+
+    def session(self) -> boto3.Session:
+        if self._session is None:
+            session = boto3.Session(profile_name=self.profile, region_name=self.region)
+            if self.role_arn:
+                # the role is assumed again before its credentials expire, a
+                # rollout outlives the one hour session of the role
+                fetcher = AssumeRoleCredentialFetcher(
+                    client_creator=session._session.create_client,
+                    source_credentials=session.get_credentials(),
+                    role_arn=self.role_arn,
+                    extra_args={"RoleSessionName": "algae"},
+                )
+                botocore_session = botocore.session.Session()
+                botocore_session._credentials = DeferredRefreshableCredentials(
+                    refresh_using=fetcher.fetch_credentials, method="assume-role"
+                )
+                session = boto3.Session(
+                    botocore_session=botocore_session, region_name=self.region
+                )
+            self._session = session
+        return self._session
+
+    def client(self, service: str):
+        # sessions are not thread safe, the clients they create are
+        with self._lock:
+            if service not in self._clients:
+                self._clients[service] = attach(
+                    instrument(self.session().client(service, config=self.config))
+                )
+            return self._clients[service]
+
+
+def parse_targets(
+    regions: list,
+    profiles: list = None,
+    roles: list = None,
+    max_attempts: int = 10,
+) -> list:
+    """
+    Build the target matrix of (profile or role) x region
+    :param regions: the regions
+    :param profiles: the credential profiles
+    :param roles: the IAM roles to assume with the default credentials
+    :param max_attempts: the API call attempts of each target client
+    :return: the targets
+    """
+    credentials = [(profile, None) for profile in profiles or []]
+    credentials += [(None, role_arn) for role_arn in roles or []]
+
+    return [
+        Target(region, profile=profile, role_arn=role_arn, max_attempts=max_attempts)
+        for (profile, role_arn), region in product(
+            credentials or [(None, None)], regions
+        )
+    ]
+
+
+def current_target() -> Target:
+    return _current_target.get()
+
+
+def current_client(service: str):
+    """
+    Client of the given service for the current target, or the default one
+    when running without targets
+    """
+    target = _current_target.get()
+    if target is None:
+        return attach(instrument(boto3.client(service)))
+    return target.client(service)
+
+
+@contextmanager
+def use_target(target: Target):
+    """
+    Run the AWS calls of the enclosed block, and of the tasks submitted with
+    `submit`, against the given target
+    :param target: the target
+    """
+    token = _current_target.set(target)
+    try:
+        yield target
+    finally:
+        _current_target.reset(token)
+
+
+def submit(executor, fn, *args, **kwargs):
+    """
+    Submit a task to the executor keeping the target of the caller
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def run_targets(targets: list, fn, args, max_concurrency: int = None) -> dict:
+    """
+    Run the command against every target concurrently, a failure in one
+    target does not stop the others
+    :param targets: the targets
+    :param fn: the command function
+    :param args: the command arguments
+    :param max_concurrency: the number of targets running at the same time
+    :return: the outcome of the command per target name
+    """
+
+    def run(target):
+        # rollout metadata of clusters with the same name in other targets
+        # must not collide
+        target_args = copy.copy(args)
+        target_args.state_dir = os.path.join(
+            args.state_dir, *target.name.replace(":", "-").split("/")
+        )
+
+        ts = time.time()
+        with use_target(target):
+            try:
+                result = fn(target_args)
+                return {"status": "ok", "result": result, "time": time.time() - ts}
+            except Exception as e:
+                _logger.exception(f"{target.name} failed")
+                return {"status": "failed", "error": str(e), "time": time.time() - ts}
+
+    with ThreadPoolExecutor(max_workers=max_concurrency or len(targets)) as executor:
+        futures = {target.name: submit(executor, run, target) for target in targets}
+        results = {name: future.result() for name, future in futures.items()}
+
+    for name, result in results.items():
+        _logger.info(
+            f'{name}: {result["status"]} in {result["time"]:.1f}s'
+            + (f' ({result["error"]})' if "error" in result else "")
+        )
+
+    return results
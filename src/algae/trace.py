@@ -0,0 +1,302 @@
+import gzip
+import heapq
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from botocore.awsrequest import AWSResponse
+from botocore.utils import parse_timestamp
+
+_logger = logging.getLogger(__name__)
+
+TRACE_VERSION = 1
+
+# operations that only read state, every other operation changes it
+READ_PREFIXES = ("Describe", "List", "Get")
+
+# the recorder or the replayer the clients given to `attach` report to
+_active = None
+
+# real clock functions, kept aside while a virtual clock is in use
+_time, _sleep = time.time, time.sleep
+
+
+def _key(params: dict) -> str:
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def load_trace(path: str) -> tuple:
+    """
+    Read a trace file written by `TraceRecorder`
+    :param path: the path of the gzipped JSON lines trace
+    :return: the trace header and the recorded calls
+    """
+    with gzip.open(path, "rt") as f:
+        header, *calls = [json.loads(line) for line in f if line.strip()]
+
+    if header.get("version") != TRACE_VERSION:
+        raise Exception(f"unsupported trace version {header.get('version')}")
+    return header, calls
+
+
+def _restore_types(shape, value):
+    """
+    Restore the values JSON turned into strings, the timestamps, from the
+    shape of the operation output
+    """
+    if shape is None or value is None:
+        return value
+
+    if shape.type_name == "structure":
+        return {
+            key: _restore_types(shape.members.get(key), item)
+            for key, item in value.items()
+        }
+    if shape.type_name == "list":
+        return [_restore_types(shape.member, item) for item in value]
+    if shape.type_name == "map":
+        return {key: _restore_types(shape.value, item) for key, item in value.items()}
+    if shape.type_name == "timestamp" and isinstance(value, str):
+        return parse_timestamp(value)
+    return value
+
+
+class TraceRecorder:
+    """
+    Records every API call of the attached clients, with the time it was
+    issued relative to the start of the recording and its latency, and writes
+    them as gzipped JSON lines
+
+    The timestamps of the responses are written as strings, the replayer
+    restores them from the output shapes of the operations.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.time()
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def before_call(self, model, params, context):
+        context["trace_started"] = time.time()
+
+    def after_call(self, model, http_response, parsed, context):
+        started = context.pop("trace_started", None)
+        if started is None:
+            return
+
+        response = {k: v for k, v in parsed.items() if k != "ResponseMetadata"}
+        call = {
+            "t": round(started - self.started, 3),
+            "d": round(time.time() - started, 3),
+            "op": model.name,
+            "params": context.pop("trace_params"),
+            "status": http_response.status_code,
+            "response": response,
+        }
+        with self._lock:
+            self.calls.append(call)
+
+    def save(self):
+        with self._lock:
+            calls = sorted(self.calls, key=lambda call: call["t"])
+
+        with gzip.open(self.path, "wt") as f:
+            header = {"version": TRACE_VERSION, "started": self.started}
+            f.write(json.dumps(header) + "\n")
+            for call in calls:
+                f.write(json.dumps(call, separators=(",", ":"), default=str) + "\n")
+
+        _logger.info(f"recorded {len(calls)} API calls to {self.path}")
+
+
+class VirtualClock:
+    """
+    A clock whose sleeps return at once and advance the time instead
+
+    Concurrent sleepers wake in order of their wake up time, the clock moves
+    to the next wake up time once no thread has touched it for `quiescence`
+    real seconds, that is once every thread is sleeping or blocked.
+    """
+
+    def __init__(self, start: float = 0.0, quiescence: float = 0.01):
+        self.now = start
+        self.quiescence = quiescence
+        self._wakeups = []
+        self._condition = threading.Condition()
+
+    def time(self) -> float:
+        with self._condition:
+            return self.now
+
+    def sleep(self, seconds: float):
+        with self._condition:
+            wakeup = self.now + max(seconds, 0)
+            heapq.heappush(self._wakeups, wakeup)
+            while self.now < wakeup:
+                if not self._condition.wait(self.quiescence):
+                    self.now = max(self.now, self._wakeups[0])
+                    self._condition.notify_all()
+            self._wakeups.remove(wakeup)
+            heapq.heapify(self._wakeups)
+
+
+@contextmanager
+def use_clock(clock: VirtualClock):
+    """
+    Replace `time.time` and `time.sleep` with the virtual clock, for the
+    polling, the deadlines and the timings of the enclosed block
+    """
+    time.time, time.sleep = clock.time, clock.sleep
+    try:
+        yield clock
+    finally:
+        time.time, time.sleep = _time, _sleep
+
+
+class TraceReplayer:
+    """
+    Serves the recorded responses to the attached clients under a virtual
+    clock, without calling AWS
+
+    The state RDS reports changes with time, a read is answered with the last
+    response recorded for the same request up to the current virtual time, so
+    a strategy polling at another interval sees the same state transitions.
+    The timeline is shifted whenever a call changing the state is replayed,
+    a strategy issuing it earlier or later moves the following transitions
+    along with it.
+    """
+
+    def __init__(self, path: str, clock: VirtualClock = None):
+        header, calls = load_trace(path)
+        self.clock = clock or VirtualClock(start=header["started"])
+        self.started = self.clock.time()
+        self.shift = 0.0
+        self.calls = {}
+        self._timelines = {}
+        self._writes = {}
+        self._lock = threading.Lock()
+
+        for call in calls:
+            timeline = self._timelines.setdefault(call["op"], {})
+            timeline.setdefault(_key(call["params"]), []).append(call)
+            timeline.setdefault(None, []).append(call)
+            if not call["op"].startswith(READ_PREFIXES):
+                self._writes.setdefault((call["op"], _key(call["params"])), []).append(
+                    call
+                )
+
+    def elapsed(self) -> float:
+        return self.clock.time() - self.started
+
+    def lookup(self, operation: str, params: dict) -> dict:
+        key = _key(params)
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+
+            writes = self._writes.get((operation, key))
+            if writes:
+                call = writes.pop(0)
+                self.shift = self.elapsed() - call["t"]
+                return call
+
+            timeline = self._timelines.get(operation, {})
+            calls = timeline.get(key)
+            if calls is None:
+                # requests with generated values, e.g. timestamped names
+                _logger.debug(f"no recorded {operation} with {key}")
+                calls = timeline.get(None)
+            if not calls:
+                raise Exception(f"no recorded response for {operation} {key}")
+
+            t = self.elapsed() - self.shift
+            recorded = [call for call in calls if call["t"] <= t]
+            return recorded[-1] if recorded else calls[0]
+
+    def before_call(self, model, params, context):
+        call = self.lookup(model.name, context["trace_params"])
+
+        # the latency of the recorded call
+        self.clock.sleep(call["d"])
+
+        response = call["response"]
+        if "Error" not in response:
+            response = _restore_types(model.output_shape, response)
+
+        parsed = dict(
+            response,
+            ResponseMetadata={"HTTPStatusCode": call["status"], "HTTPHeaders": {}},
+        )
+        return AWSResponse(None, call["status"], {}, None), parsed
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "duration": self.elapsed(),
+                "api_calls": sum(self.calls.values()),
+                "operations": dict(self.calls),
+            }
+
+
+def attach(client):
+    """
+    Report the API calls of the client to the active recorder or replayer
+    :param client: the boto3 client
+    :return: the client
+    """
+    service_id = client.meta.service_model.service_id.hyphenize()
+
+    def on_parameters(params, model, context, **kwargs):
+        if _active is not None:
+            context["trace_params"] = params
+
+    def on_before_call(model, params, context, **kwargs):
+        if _active is not None:
+            return _active.before_call(model, params, context)
+
+    def on_after_call(model, http_response, parsed, context, **kwargs):
+        if isinstance(_active, TraceRecorder):
+            _active.after_call(model, http_response, parsed, context)
+
+    client.meta.events.register(f"before-parameter-build.{service_id}", on_parameters)
+    client.meta.events.register(f"before-call.{service_id}", on_before_call)
+    client.meta.events.register(f"after-call.{service_id}", on_after_call)
+    return client
+
+
+@contextmanager
+def record_trace(path: str):
+    """
+    Record the API calls of the enclosed block to the trace file
+    :param path: the path of the trace file
+    """
+    global _active
+    recorder = _active = TraceRecorder(path)
+    try:
+        yield recorder
+    finally:
+        _active = None
+        recorder.save()
+
+
+@contextmanager
+def replay_trace(path: str):
+    """
+    Run the enclosed block against the recorded trace under a virtual clock
+    :param path: the path of the trace file
+    """
+    global _active
+    replayer = _active = TraceReplayer(path)
+    try:
+        with use_clock(replayer.clock):
+            yield replayer
+    finally:
+        _active = None
+
+        report = replayer.report()
+        _logger.info(
+            f'replayed in {report["duration"]:.0f}s of virtual time with '
+            f'{report["api_calls"]} API calls'
+        )
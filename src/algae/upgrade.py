@@ -1,38 +1,103 @@
-from algae.rds import (
-    clone_cluster,
-    create_cluster_db_instances,
-    upgrade_clone_cluster,
-    upgrade_clone_cluster_identifier,
-)
+import copy
+import logging
+import time
+
+from algae.backends import BACKENDS, select_backend
+from algae.state import load_prepared, remove_prepared, save_prepared
 from algae.timing import timeit
 
+_logger = logging.getLogger(__name__)
+
+# arguments given at prepare time that the cutover reuses
+PREPARE_ARGUMENTS = (
+    "cluster_identifier",
+    "source_cluster_identifier",
+    "engine_version",
+    "subnet_group_name",
+    "provision",
+    "migrate_parameter_groups",
+)
+
 
 @timeit
 def upgrade_cluster_version(args):
+    if args.cluster_identifier is None or args.source_cluster_identifier is None:
+        return
+
+    backend = select_backend(args)
+    _logger.info(f"upgrading with the {backend.name} backend")
+
+    prepared = backend.prepare(args)
+    if args.engine_version is not None:
+        backend.cutover(args, prepared)
+
+
+@timeit
+def prepare_cluster(args):
+    """
+    Builds and upgrades the green cluster ahead of the cutover and records it
+    :param args:
+    :return:
+    """
     if (
-        args.cluster_identifier is not None
-        and args.source_cluster_identifier is not None
+        args.cluster_identifier is None
+        or args.source_cluster_identifier is None
+        or args.engine_version is None
     ):
-        clone_cluster(
-            cluster_identifier=args.cluster_identifier,
-            source_cluster_identifier=args.source_cluster_identifier,
-            subnet_group_name=args.subnet_group_name,
+        return
+
+    backend = select_backend(args)
+    _logger.info(f"preparing with the {backend.name} backend")
+
+    # the clone is a copy of the source cluster at the start of the prepare
+    prepared_at = time.time()
+    prepared = backend.prepare(args)
+
+    save_prepared(
+        args.source_cluster_identifier,
+        dict(
+            prepared,
+            backend=backend.name,
+            prepared_at=prepared_at,
+            **{key: getattr(args, key) for key in PREPARE_ARGUMENTS},
+        ),
+        state_dir=args.state_dir,
+    )
+
+
+@timeit
+def cutover_cluster(args):
+    """
+    Swaps the cluster with the green cluster recorded by `prepare_cluster`,
+    a stale green cluster is prepared again first
+    :param args:
+    :return:
+    """
+    if args.source_cluster_identifier is None:
+        return
+
+    prepared = load_prepared(args.source_cluster_identifier, state_dir=args.state_dir)
+
+    # the backends read the cluster settings given at prepare time
+    args = copy.copy(args)
+    for key in PREPARE_ARGUMENTS:
+        setattr(args, key, prepared.get(key))
+
+    backend = BACKENDS[prepared["backend"]]
+
+    if not backend.is_fresh(args, prepared):
+        _logger.warning(
+            f'prepared cluster "{prepared["green_cluster_identifier"]}" is stale, '
+            f"preparing it again"
         )
+        backend.discard(args, prepared)
+
+        prepared_at = time.time()
+        prepared = dict(prepared, **backend.prepare(args), prepared_at=prepared_at)
+        save_prepared(
+            args.source_cluster_identifier, prepared, state_dir=args.state_dir
+        )
+
+    backend.cutover(args, prepared)
 
-        if args.engine_version is not None:
-            db_instance_class = "db.t3.small"
-            create_cluster_db_instances(
-                args.new_cluster_identifier,
-                engine_version=args.engine_version,
-                db_instance_class=db_instance_class,
-            )
-
-            upgrade_clone_cluster(args.cluster_identifier, args.engine_version)
-
-            upgrade_clone_cluster_identifier(
-                cluster_identifier=args.source_cluster_identifier,
-            )
-            upgrade_clone_cluster_identifier(
-                cluster_identifier=args.cluster_identifier,
-                new_cluster_identifier=args.source_cluster_identifier,
-            )
+    remove_prepared(args.source_cluster_identifier, state_dir=args.state_dir)
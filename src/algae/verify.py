@@ -0,0 +1,237 @@
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+_logger = logging.getLogger(__name__)
+
+# aggregate checksum of a key range computed by the database, the rows are
+# hashed client side for the other dialects
+CHECKSUM_QUERIES = {
+    "mysql": (
+        "SELECT COUNT(*), BIT_XOR(CAST(CONV(SUBSTRING(MD5(CONCAT_WS('#', "
+        "{nullable_columns})), 1, 16), 16, 10) AS UNSIGNED)) FROM {table} "
+        "WHERE {key} >= {lo} AND {key} < {hi}"
+    ),
+    "postgresql": (
+        "SELECT COUNT(*), md5(string_agg(md5(ROW({columns})::text), '' "
+        "ORDER BY {key})) FROM {table} WHERE {key} >= {lo} AND {key} < {hi}"
+    ),
+}
+
+# dialects of the DB-API driver modules
+DRIVER_DIALECTS = {
+    "pymysql": "mysql",
+    "MySQLdb": "mysql",
+    "mysql.connector": "mysql",
+    "psycopg2": "postgresql",
+    "psycopg": "postgresql",
+    "pg8000": "postgresql",
+}
+
+
+def load_tables(path: str) -> list:
+    """
+    Load the tables to verify, a JSON list of {"table": ..., "key": ...}
+    where the key is an integer primary key column
+    :param path: the path of the JSON file
+    :return: the tables
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+class Side:
+    """
+    One of the clusters being compared, every worker thread gets its own
+    DB-API connection
+    """
+
+    def __init__(self, name: str, connect, dialect: str = None):
+        self.name = name
+        self.connect = connect
+        self.dialect = dialect
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def cursor(self):
+        if not hasattr(self._local, "connection"):
+            self._local.connection = self.connect()
+            with self._lock:
+                self._connections.append(self._local.connection)
+        return self._local.connection.cursor()
+
+    def query(self, sql: str) -> list:
+        cursor = self.cursor()
+        try:
+            cursor.execute(sql)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def columns(self, table: str) -> list:
+        cursor = self.cursor()
+        try:
+            cursor.execute(f"SELECT * FROM {table} WHERE 1 = 0")
+            cursor.fetchall()
+            return [column[0] for column in cursor.description]
+        finally:
+            cursor.close()
+
+    def bounds(self, table: str, key: str) -> tuple:
+        return tuple(self.query(f"SELECT MIN({key}), MAX({key}) FROM {table}")[0])
+
+    def rows(self, table: str, key: str, lo: int, hi: int) -> list:
+        # the key first, to tell the rows apart
+        return self.query(
+            f"SELECT {key}, {table}.* FROM {table} "
+            f"WHERE {key} >= {lo} AND {key} < {hi} ORDER BY {key}"
+        )
+
+    def checksum(self, table: str, key: str, columns: list, lo: int, hi: int):
+        query = CHECKSUM_QUERIES.get(self.dialect)
+        if query is not None:
+            return tuple(
+                self.query(
+                    query.format(
+                        table=table,
+                        key=key,
+                        lo=lo,
+                        hi=hi,
+                        columns=", ".join(columns),
+                        nullable_columns=", ".join(
+                            f"{column}, ISNULL({column})" for column in columns
+                        ),
+                    )
+                )[0]
+            )
+
+        digest = hashlib.sha256()
+        rows = self.rows(table, key, lo, hi)
+        for row in rows:
+            digest.update(repr(tuple(row)).encode())
+        return len(rows), digest.hexdigest()
+
+    def close(self):
+        for connection in self._connections:
+            connection.close()
+
+
+def split_range(lo: int, hi: int, parts: int) -> list:
+    step = max(-(-(hi - lo) // parts), 1)
+    return [(start, min(start + step, hi)) for start in range(lo, hi, step)]
+
+
+def diff_rows(blue_rows: list, green_rows: list) -> list:
+    blue = {row[0]: tuple(row) for row in blue_rows}
+    green = {row[0]: tuple(row) for row in green_rows}
+    return sorted(
+        key for key in blue.keys() | green.keys() if blue.get(key) != green.get(key)
+    )
+
+
+def verify_tables(
+    blue: Side,
+    green: Side,
+    tables: list,
+    chunk_size: int = 100000,
+    leaf_size: int = 1000,
+    fanout: int = 16,
+    concurrency: int = 8,
+) -> dict:
+    """
+    Compare the tables of both clusters by checksums of primary key ranges
+
+    The key range of every table is split in chunks checksummed concurrently
+    on both clusters, only the chunks whose checksums differ are split again,
+    down to `leaf_size` keys where the rows themselves are compared.
+    :param blue: the source cluster
+    :param green: the green cluster
+    :param tables: the tables with their integer primary key
+    :param chunk_size: the keys of the first chunks
+    :param leaf_size: the keys of the chunks compared row by row
+    :param fanout: the chunks a mismatching chunk is split into
+    :param concurrency: the chunks checksummed at the same time
+    :return: the chunks checked and the divergent keys per table
+    """
+    report = {}
+
+    def check(table, key, columns, lo, hi):
+        if hi - lo <= leaf_size:
+            return diff_rows(
+                blue.rows(table, key, lo, hi), green.rows(table, key, lo, hi)
+            )
+
+        matches = blue.checksum(table, key, columns, lo, hi) == green.checksum(
+            table, key, columns, lo, hi
+        )
+        return [] if matches else None
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {}
+
+            def submit_chunks(table, key, columns, lo, hi, size):
+                for chunk_lo, chunk_hi in split_range(lo, hi, -(-(hi - lo) // size)):
+                    future = executor.submit(
+                        check, table, key, columns, chunk_lo, chunk_hi
+                    )
+                    futures[future] = (table, key, columns, chunk_lo, chunk_hi)
+
+            for entry in tables:
+                table, key = entry["table"], entry["key"]
+                bounds = [
+                    value
+                    for value in blue.bounds(table, key) + green.bounds(table, key)
+                    if value is not None
+                ]
+                report[table] = {"chunks": 0, "divergent_keys": []}
+                if not bounds:
+                    continue
+
+                columns = entry.get("columns") or blue.columns(table)
+                submit_chunks(
+                    table,
+                    key,
+                    columns,
+                    int(min(bounds)),
+                    int(max(bounds)) + 1,
+                    chunk_size,
+                )
+
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    table, key, columns, lo, hi = futures.pop(future)
+                    report[table]["chunks"] += 1
+
+                    keys = future.result()
+                    if keys is None:
+                        _logger.debug(f"{table} [{lo}, {hi}) differs, splitting")
+                        submit_chunks(
+                            table,
+                            key,
+                            columns,
+                            lo,
+                            hi,
+                            max(-(-(hi - lo) // fanout), leaf_size),
+                        )
+                    else:
+                        report[table]["divergent_keys"] += keys
+    finally:
+        blue.close()
+        green.close()
+
+    for table, result in report.items():
+        result["divergent_keys"].sort()
+        if result["divergent_keys"]:
+            _logger.warning(
+                f'{table}: {len(result["divergent_keys"])} divergent rows, keys '
+                f'{result["divergent_keys"][:10]}'
+            )
+        else:
+            _logger.info(f'{table}: {result["chunks"]} chunks match')
+
+    return report
@@ -0,0 +1,69 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_logger = logging.getLogger(__name__)
+
+
+def load_queries(path: str) -> list:
+    """
+    Load the warm-up query set, statements are separated by ";"
+    :param path: the path of the SQL file
+    :return: the list of statements
+    """
+    with open(path) as f:
+        return [query.strip() for query in f.read().split(";") if query.strip()]
+
+
+def run_warmup(connect, queries: list, concurrency: int = 4, duration: int = 300):
+    """
+    Run the query set concurrently until the duration elapses, every worker
+    cycles through the queries over its own DB-API connection
+    :param connect: callable returning a new DB-API connection
+    :param queries: the statements to run
+    :param concurrency: the number of concurrent workers
+    :param duration: how long to run the workload in seconds
+    :return: the number of executed queries and errors
+    """
+    if not queries:
+        return {"queries": 0, "errors": 0}
+
+    deadline = time.time() + duration
+
+    def worker(offset):
+        executed = errors = 0
+        connection = connect()
+        try:
+            cursor = connection.cursor()
+            i = offset
+            while time.time() < deadline:
+                try:
+                    cursor.execute(queries[i % len(queries)])
+                    cursor.fetchall()
+                    executed += 1
+                except Exception as e:
+                    _logger.debug(f"warm-up query failed: {e}")
+                    errors += 1
+                i += 1
+        finally:
+            connection.close()
+        return executed, errors
+
+    _logger.info(
+        f"running {len(queries)} warm-up queries with {concurrency} workers for "
+        f"{duration}s"
+    )
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # spread the workers over the query set so the pages are loaded in
+        # parallel instead of every worker hitting the same tables
+        results = list(executor.map(worker, range(concurrency)))
+
+    stats = {
+        "queries": sum(executed for executed, _ in results),
+        "errors": sum(errors for _, errors in results),
+    }
+    _logger.info(
+        f'warm-up executed {stats["queries"]} queries with {stats["errors"]} errors'
+    )
+    return stats
@@ -1,10 +1,709 @@
 """
-    Dummy conftest.py for algae.
+Shared fixtures of the algae tests.
 
-    If you don't know what this is for, just leave it empty.
-    Read more about conftest.py under:
-    - https://docs.pytest.org/en/stable/fixture.html
-    - https://docs.pytest.org/en/stable/writing_plugins.html
+`StubRDS` is an in memory RDS client that moves clusters, instances and
+snapshots through their statuses on each describe, so the rollouts can run
+end to end under the virtual clock without AWS.
 """
 
-# import pytest
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+
+import algae.rds
+from algae.deadlines import Deadlines, use_deadlines
+from algae.trace import VirtualClock, use_clock
+
+OK = {"ResponseMetadata": {"HTTPStatusCode": 200}}
+ARN_PREFIX = "arn:aws:rds:us-east-1:111111111111"
+
+
+class StubRDS:
+    """
+    In memory RDS client, a resource reports each of its pending statuses
+    once per describe call before it settles
+
+    A rename keeps the current identifier in "renaming" for `rename_polls`
+    describe calls before the cluster moves to the new identifier, the blue/green
+    deployments provision and switch over in `blue_green_polls`. The errors
+    queued per operation in `errors` are raised by its next calls.
+
+    The parameter group family of an engine version is the engine followed by
+    its major version, e.g. "aurora-mysql8.0", a group is only attached to the
+    clusters and instances of its family.
+    """
+
+    exceptions = boto3.client("rds", region_name="us-east-1").exceptions
+
+    def __init__(self, rename_polls: int = 2, blue_green_polls: int = 2):
+        self.rename_polls = rename_polls
+        self.blue_green_polls = blue_green_polls
+        self.clusters = {}
+        self.instances = {}
+        self.snapshots = {}
+        self.deployments = {}
+        self.parameter_groups = {}
+        self.engine_defaults = {}
+        self.calls = []
+        self.errors = {}
+
+    def add_cluster(self, identifier: str, engine_version: str = "5.7", **fields):
+        self.clusters[identifier] = dict(
+            {
+                "DBClusterIdentifier": identifier,
+                "DBClusterArn": f"{ARN_PREFIX}:cluster:{identifier}",
+                "Status": "available",
+                "Engine": "aurora-mysql",
+                "EngineVersion": engine_version,
+                "Endpoint": f"{identifier}.cluster-x.rds.amazonaws.com",
+                "DBClusterMembers": [],
+                "TagList": [],
+                "pending": [],
+            },
+            **fields,
+        )
+        return self.clusters[identifier]
+
+    def add_instance(self, identifier: str, cluster_identifier: str, **fields):
+        self.clusters[cluster_identifier]["DBClusterMembers"].append(
+            {"DBInstanceIdentifier": identifier, "IsClusterWriter": True}
+        )
+        self.instances[identifier] = dict(
+            {
+                "DBInstanceIdentifier": identifier,
+                "DBClusterIdentifier": cluster_identifier,
+                "DBInstanceStatus": "available",
+                "DBInstanceClass": "db.r5.large",
+                "pending": [],
+            },
+            **fields,
+        )
+        return self.instances[identifier]
+
+    def add_parameter_group(
+        self, name: str, family: str, kind: str = "cluster", **parameters
+    ):
+        self.parameter_groups[name] = {
+            "kind": kind,
+            "family": family,
+            "parameters": {
+                parameter_name: {
+                    "ParameterName": parameter_name,
+                    "ParameterValue": value,
+                    "Source": "user",
+                }
+                for parameter_name, value in parameters.items()
+            },
+        }
+        return self.parameter_groups[name]
+
+    def add_engine_default(
+        self, family: str, name: str, value: str, kind: str = "cluster", **fields
+    ):
+        self.engine_defaults.setdefault((kind, family), []).append(
+            dict(
+                {
+                    "ParameterName": name,
+                    "ParameterValue": value,
+                    "ApplyType": "dynamic",
+                    "IsModifiable": True,
+                    "Source": "engine-default",
+                },
+                **fields,
+            )
+        )
+
+    @staticmethod
+    def family(engine: str, engine_version: str) -> str:
+        return engine + ".".join(engine_version.split(".")[:2])
+
+    def error(self, operation: str, code: str, message: str = "stubbed error"):
+        exception = getattr(self.exceptions, code, None)
+        if exception is None:
+            return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+        return exception({"Error": {"Code": code, "Message": message}}, operation)
+
+    def call(self, operation: str, params: dict):
+        self.calls.append((operation, params))
+        errors = self.errors.get(operation)
+        if errors:
+            # None lets the call through
+            error = errors.pop(0)
+            if error is not None:
+                raise error
+
+    def operations(self) -> list:
+        return [operation for operation, _ in self.calls]
+
+    def _cluster(self, identifier: str) -> dict:
+        cluster = self.clusters.get(identifier)
+        if cluster is None:
+            raise self.error("DescribeDBClusters", "DBClusterNotFoundFault")
+
+        if cluster["pending"]:
+            cluster["Status"] = cluster["pending"].pop(0)
+        elif "rename_to" in cluster:
+            # the identifier is released, the cluster shows up under the new one
+            new_identifier = cluster.pop("rename_to")
+            del self.clusters[identifier]
+            self.clusters[new_identifier] = dict(
+                cluster,
+                DBClusterIdentifier=new_identifier,
+                pending=[],
+            )
+            raise self.error("DescribeDBClusters", "DBClusterNotFoundFault")
+        else:
+            cluster["Status"] = "available"
+        return {k: v for k, v in cluster.items() if k not in ("pending", "rename_to")}
+
+    def _instance(self, identifier: str) -> dict:
+        instance = self.instances.get(identifier)
+        if instance is None:
+            raise self.error("DescribeDBInstances", "DBInstanceNotFoundFault")
+
+        if instance["pending"]:
+            instance["DBInstanceStatus"] = instance["pending"].pop(0)
+        else:
+            instance["DBInstanceStatus"] = "available"
+        return {k: v for k, v in instance.items() if k != "pending"}
+
+    @staticmethod
+    def _filtered(filters: list, resources: dict) -> list:
+        identifiers = list(resources)
+        for f in filters or []:
+            if f["Name"] == "db-cluster-id":
+                identifiers = [
+                    identifier
+                    for identifier in identifiers
+                    if resources[identifier].get("DBClusterIdentifier") in f["Values"]
+                ]
+        return identifiers
+
+    def describe_db_clusters(self, DBClusterIdentifier=None, Filters=None):
+        self.call(
+            "DescribeDBClusters",
+            dict(DBClusterIdentifier=DBClusterIdentifier, Filters=Filters),
+        )
+        if DBClusterIdentifier is not None:
+            return dict(OK, DBClusters=[self._cluster(DBClusterIdentifier)])
+
+        clusters = []
+        for identifier in self._filtered(Filters, self.clusters):
+            try:
+                clusters.append(self._cluster(identifier))
+            except self.exceptions.DBClusterNotFoundFault:
+                pass
+        return dict(OK, DBClusters=clusters)
+
+    def describe_db_instances(self, DBInstanceIdentifier=None, Filters=None):
+        self.call(
+            "DescribeDBInstances",
+            dict(DBInstanceIdentifier=DBInstanceIdentifier, Filters=Filters),
+        )
+        if DBInstanceIdentifier is not None:
+            return dict(OK, DBInstances=[self._instance(DBInstanceIdentifier)])
+
+        return dict(
+            OK,
+            DBInstances=[
+                self._instance(identifier)
+                for identifier in self._filtered(Filters, self.instances)
+            ],
+        )
+
+    def get_paginator(self, operation: str):
+        stub = self
+
+        class Paginator:
+            def paginate(self, **params):
+                return [getattr(stub, operation)(**params)]
+
+        return Paginator()
+
+    def modify_db_cluster(self, DBClusterIdentifier, **params):
+        self.call(
+            "ModifyDBCluster", dict(params, DBClusterIdentifier=DBClusterIdentifier)
+        )
+        cluster = self.clusters.get(DBClusterIdentifier)
+        if cluster is None:
+            raise self.error("ModifyDBCluster", "DBClusterNotFoundFault")
+        if cluster["Status"] != "available" or cluster["pending"]:
+            raise self.error("ModifyDBCluster", "InvalidDBClusterStateFault")
+
+        new_identifier = params.get("NewDBClusterIdentifier")
+        if new_identifier is not None:
+            if new_identifier in self.clusters:
+                raise self.error(
+                    "ModifyDBCluster",
+                    "DBClusterAlreadyExistsFault",
+                    f"{new_identifier} already exists",
+                )
+            cluster.update(
+                Status="renaming",
+                pending=["renaming"] * self.rename_polls,
+                rename_to=new_identifier,
+            )
+        if "EngineVersion" in params:
+            family = self.family(cluster["Engine"], params["EngineVersion"])
+            major = family != self.family(cluster["Engine"], cluster["EngineVersion"])
+            if major and not params.get("AllowMajorVersionUpgrade"):
+                raise self.error("ModifyDBCluster", "InvalidParameterCombination")
+            cluster.update(
+                EngineVersion=params["EngineVersion"],
+                pending=["upgrading", "upgrading"],
+            )
+        if "DBInstanceParameterGroupName" in params:
+            # only attached with a major version upgrade
+            if not params.get("AllowMajorVersionUpgrade"):
+                raise self.error("ModifyDBCluster", "InvalidParameterCombination")
+            self._check_family(
+                "ModifyDBCluster", params["DBInstanceParameterGroupName"], family
+            )
+            for instance in self.instances.values():
+                if instance["DBClusterIdentifier"] == DBClusterIdentifier:
+                    instance["DBParameterGroups"] = [
+                        {"DBParameterGroupName": params["DBInstanceParameterGroupName"]}
+                    ]
+        if "DBClusterParameterGroupName" in params:
+            self._check_family(
+                "ModifyDBCluster",
+                params["DBClusterParameterGroupName"],
+                self.family(cluster["Engine"], cluster["EngineVersion"]),
+            )
+            cluster["DBClusterParameterGroup"] = params["DBClusterParameterGroupName"]
+        if "ServerlessV2ScalingConfiguration" in params:
+            cluster.update(
+                ServerlessV2ScalingConfiguration=dict(
+                    params["ServerlessV2ScalingConfiguration"]
+                ),
+                pending=["modifying"],
+            )
+        return dict(OK, DBCluster={"DBClusterIdentifier": DBClusterIdentifier})
+
+    def restore_db_cluster_to_point_in_time(self, DBClusterIdentifier, **params):
+        self.call(
+            "RestoreDBClusterToPointInTime",
+            dict(params, DBClusterIdentifier=DBClusterIdentifier),
+        )
+        if DBClusterIdentifier in self.clusters:
+            raise self.error(
+                "RestoreDBClusterToPointInTime", "DBClusterAlreadyExistsFault"
+            )
+        source = self.clusters[params["SourceDBClusterIdentifier"]]
+        self.add_cluster(
+            DBClusterIdentifier,
+            engine_version=source["EngineVersion"],
+            Status="creating",
+            TagList=params.get("Tags", []),
+            DBClusterParameterGroup=source.get("DBClusterParameterGroup"),
+            pending=["creating"],
+        )
+        return OK
+
+    def create_db_cluster_snapshot(
+        self, DBClusterIdentifier, DBClusterSnapshotIdentifier
+    ):
+        self.call(
+            "CreateDBClusterSnapshot",
+            dict(
+                DBClusterIdentifier=DBClusterIdentifier,
+                DBClusterSnapshotIdentifier=DBClusterSnapshotIdentifier,
+            ),
+        )
+        self.snapshots[DBClusterSnapshotIdentifier] = DBClusterIdentifier
+        return OK
+
+    def describe_db_cluster_snapshots(self, DBClusterSnapshotIdentifier, **params):
+        self.call(
+            "DescribeDBClusterSnapshots",
+            dict(params, DBClusterSnapshotIdentifier=DBClusterSnapshotIdentifier),
+        )
+        return dict(OK, DBClusterSnapshots=[{"Status": "available"}])
+
+    def delete_db_cluster_snapshot(self, DBClusterSnapshotIdentifier):
+        self.call(
+            "DeleteDBClusterSnapshot",
+            dict(DBClusterSnapshotIdentifier=DBClusterSnapshotIdentifier),
+        )
+        del self.snapshots[DBClusterSnapshotIdentifier]
+        return OK
+
+    def restore_db_cluster_from_snapshot(self, DBClusterIdentifier, **params):
+        self.call(
+            "RestoreDBClusterFromSnapshot",
+            dict(params, DBClusterIdentifier=DBClusterIdentifier),
+        )
+        source = self.clusters[self.snapshots[params["SnapshotIdentifier"]]]
+        engine_version = params.get("EngineVersion", source["EngineVersion"])
+        group_name = params.get(
+            "DBClusterParameterGroupName",
+            f'default.{self.family(source["Engine"], engine_version)}',
+        )
+        self._check_family(
+            "RestoreDBClusterFromSnapshot",
+            group_name,
+            self.family(source["Engine"], engine_version),
+        )
+        self.add_cluster(
+            DBClusterIdentifier,
+            engine_version=engine_version,
+            Status="creating",
+            DBClusterParameterGroup=group_name,
+            pending=["creating"],
+        )
+        return OK
+
+    def create_db_instance(self, DBInstanceIdentifier, DBClusterIdentifier, **params):
+        self.call(
+            "CreateDBInstance",
+            dict(
+                params,
+                DBInstanceIdentifier=DBInstanceIdentifier,
+                DBClusterIdentifier=DBClusterIdentifier,
+            ),
+        )
+        cluster = self.clusters[DBClusterIdentifier]
+        family = self.family(cluster["Engine"], cluster["EngineVersion"])
+        group_name = params.get("DBParameterGroupName", f"default.{family}")
+        self._check_family("CreateDBInstance", group_name, family)
+        self.add_instance(
+            DBInstanceIdentifier,
+            DBClusterIdentifier,
+            DBInstanceClass=params["DBInstanceClass"],
+            DBInstanceStatus="creating",
+            DBParameterGroups=[{"DBParameterGroupName": group_name}],
+            pending=["creating"],
+        )
+        return OK
+
+    def modify_db_instance(self, DBInstanceIdentifier, **params):
+        self.call(
+            "ModifyDBInstance", dict(params, DBInstanceIdentifier=DBInstanceIdentifier)
+        )
+        instance = self.instances.get(DBInstanceIdentifier)
+        if instance is None:
+            raise self.error("ModifyDBInstance", "DBInstanceNotFoundFault")
+        instance.update(
+            DBInstanceClass=params["DBInstanceClass"], pending=["modifying"]
+        )
+        return OK
+
+    def delete_db_instance(self, DBInstanceIdentifier, **params):
+        self.call(
+            "DeleteDBInstance", dict(params, DBInstanceIdentifier=DBInstanceIdentifier)
+        )
+        instance = self.instances.pop(DBInstanceIdentifier)
+        self.clusters[instance["DBClusterIdentifier"]]["DBClusterMembers"] = [
+            member
+            for member in self.clusters[instance["DBClusterIdentifier"]][
+                "DBClusterMembers"
+            ]
+            if member["DBInstanceIdentifier"] != DBInstanceIdentifier
+        ]
+        return OK
+
+    def delete_db_cluster(self, DBClusterIdentifier, **params):
+        self.call(
+            "DeleteDBCluster", dict(params, DBClusterIdentifier=DBClusterIdentifier)
+        )
+        del self.clusters[DBClusterIdentifier]
+        return OK
+
+    def _check_family(self, operation: str, group_name: str, family: str):
+        group = self.parameter_groups.get(group_name)
+        if group is not None and group["family"] != family:
+            raise self.error(
+                operation,
+                "InvalidParameterCombination",
+                f'{group_name} is of family {group["family"]}, not {family}',
+            )
+
+    def _groups_in_use(self, kind: str) -> set:
+        if kind == "cluster":
+            return {
+                cluster.get("DBClusterParameterGroup")
+                for cluster in self.clusters.values()
+            }
+        return {
+            group["DBParameterGroupName"]
+            for instance in self.instances.values()
+            for group in instance.get("DBParameterGroups", [])
+        }
+
+    def describe_db_engine_versions(self, Engine, EngineVersion):
+        self.call(
+            "DescribeDBEngineVersions",
+            dict(Engine=Engine, EngineVersion=EngineVersion),
+        )
+        return dict(
+            OK,
+            DBEngineVersions=[
+                {
+                    "Engine": Engine,
+                    "EngineVersion": EngineVersion,
+                    "DBParameterGroupFamily": self.family(Engine, EngineVersion),
+                }
+            ],
+        )
+
+    def _parameters(self, operation: str, group_name: str, Source=None) -> dict:
+        self.call(operation, dict(GroupName=group_name, Source=Source))
+        group = self.parameter_groups.get(group_name)
+        if group is None:
+            raise self.error(operation, "DBParameterGroupNotFoundFault")
+        return dict(
+            OK,
+            Parameters=[
+                parameter
+                for parameter in group["parameters"].values()
+                if Source is None or parameter["Source"] == Source
+            ],
+        )
+
+    def describe_db_cluster_parameters(self, DBClusterParameterGroupName, **params):
+        return self._parameters(
+            "DescribeDBClusterParameters", DBClusterParameterGroupName, **params
+        )
+
+    def describe_db_parameters(self, DBParameterGroupName, **params):
+        return self._parameters("DescribeDBParameters", DBParameterGroupName, **params)
+
+    def describe_engine_default_cluster_parameters(self, DBParameterGroupFamily):
+        self.call(
+            "DescribeEngineDefaultClusterParameters",
+            dict(DBParameterGroupFamily=DBParameterGroupFamily),
+        )
+        return dict(
+            OK,
+            EngineDefaults={
+                "DBParameterGroupFamily": DBParameterGroupFamily,
+                "Parameters": self.engine_defaults.get(
+                    ("cluster", DBParameterGroupFamily), []
+                ),
+            },
+        )
+
+    def describe_engine_default_parameters(self, DBParameterGroupFamily):
+        self.call(
+            "DescribeEngineDefaultParameters",
+            dict(DBParameterGroupFamily=DBParameterGroupFamily),
+        )
+        return dict(
+            OK,
+            EngineDefaults={
+                "DBParameterGroupFamily": DBParameterGroupFamily,
+                "Parameters": self.engine_defaults.get(
+                    ("db", DBParameterGroupFamily), []
+                ),
+            },
+        )
+
+    def _create_parameter_group(
+        self, operation: str, kind: str, group_name: str, family: str, **params
+    ):
+        self.call(
+            operation,
+            dict(params, GroupName=group_name, DBParameterGroupFamily=family),
+        )
+        if group_name in self.parameter_groups:
+            raise self.error(operation, "DBParameterGroupAlreadyExistsFault")
+        self.add_parameter_group(group_name, family, kind=kind)
+        return OK
+
+    def create_db_cluster_parameter_group(
+        self, DBClusterParameterGroupName, DBParameterGroupFamily, **params
+    ):
+        return self._create_parameter_group(
+            "CreateDBClusterParameterGroup",
+            "cluster",
+            DBClusterParameterGroupName,
+            DBParameterGroupFamily,
+            **params,
+        )
+
+    def create_db_parameter_group(
+        self, DBParameterGroupName, DBParameterGroupFamily, **params
+    ):
+        return self._create_parameter_group(
+            "CreateDBParameterGroup",
+            "db",
+            DBParameterGroupName,
+            DBParameterGroupFamily,
+            **params,
+        )
+
+    def _modify_parameter_group(self, operation: str, group_name: str, Parameters):
+        self.call(operation, dict(GroupName=group_name, Parameters=Parameters))
+        group = self.parameter_groups.get(group_name)
+        if group is None:
+            raise self.error(operation, "DBParameterGroupNotFoundFault")
+        for parameter in Parameters:
+            group["parameters"][parameter["ParameterName"]] = dict(
+                parameter, Source="user"
+            )
+        return OK
+
+    def modify_db_cluster_parameter_group(self, DBClusterParameterGroupName, **params):
+        return self._modify_parameter_group(
+            "ModifyDBClusterParameterGroup", DBClusterParameterGroupName, **params
+        )
+
+    def modify_db_parameter_group(self, DBParameterGroupName, **params):
+        return self._modify_parameter_group(
+            "ModifyDBParameterGroup", DBParameterGroupName, **params
+        )
+
+    def _delete_parameter_group(self, operation: str, kind: str, group_name: str):
+        self.call(operation, dict(GroupName=group_name))
+        if group_name not in self.parameter_groups:
+            raise self.error(operation, "DBParameterGroupNotFoundFault")
+        if group_name in self._groups_in_use(kind):
+            raise self.error(operation, "InvalidDBParameterGroupStateFault")
+        del self.parameter_groups[group_name]
+        return OK
+
+    def delete_db_cluster_parameter_group(self, DBClusterParameterGroupName):
+        return self._delete_parameter_group(
+            "DeleteDBClusterParameterGroup", "cluster", DBClusterParameterGroupName
+        )
+
+    def delete_db_parameter_group(self, DBParameterGroupName):
+        return self._delete_parameter_group(
+            "DeleteDBParameterGroup", "db", DBParameterGroupName
+        )
+
+    def _move(self, identifier: str, new_identifier: str):
+        cluster = self.clusters.pop(identifier)
+        self.clusters[new_identifier] = dict(
+            cluster,
+            DBClusterIdentifier=new_identifier,
+            DBClusterArn=f"{ARN_PREFIX}:cluster:{new_identifier}",
+        )
+        for instance in self.instances.values():
+            if instance["DBClusterIdentifier"] == identifier:
+                instance["DBClusterIdentifier"] = new_identifier
+
+    def _deployment(self, identifier: str) -> dict:
+        deployment = self.deployments.get(identifier)
+        if deployment is None:
+            raise self.error(
+                "DescribeBlueGreenDeployments", "BlueGreenDeploymentNotFoundFault"
+            )
+
+        if deployment["pending"]:
+            deployment["Status"] = deployment["pending"].pop(0)
+        return {k: v for k, v in deployment.items() if k != "pending"}
+
+    def create_blue_green_deployment(
+        self, BlueGreenDeploymentName, Source, TargetEngineVersion, **params
+    ):
+        self.call(
+            "CreateBlueGreenDeployment",
+            dict(
+                params,
+                BlueGreenDeploymentName=BlueGreenDeploymentName,
+                Source=Source,
+                TargetEngineVersion=TargetEngineVersion,
+            ),
+        )
+        identifier = f"bgd-{BlueGreenDeploymentName}"
+        if identifier in self.deployments:
+            raise self.error(
+                "CreateBlueGreenDeployment", "BlueGreenDeploymentAlreadyExistsFault"
+            )
+
+        source = Source.split(":")[-1]
+        target = f"{source}-green-x8k2vd"
+        self.add_cluster(
+            target,
+            engine_version=TargetEngineVersion,
+            Status="creating",
+            pending=["creating"],
+        )
+        self.deployments[identifier] = {
+            "BlueGreenDeploymentIdentifier": identifier,
+            "BlueGreenDeploymentName": BlueGreenDeploymentName,
+            "Source": Source,
+            "Target": self.clusters[target]["DBClusterArn"],
+            "Status": "PROVISIONING",
+            "pending": ["PROVISIONING"] * self.blue_green_polls + ["AVAILABLE"],
+        }
+        return dict(
+            OK,
+            BlueGreenDeployment={
+                k: v for k, v in self.deployments[identifier].items() if k != "pending"
+            },
+        )
+
+    def describe_blue_green_deployments(self, BlueGreenDeploymentIdentifier):
+        self.call(
+            "DescribeBlueGreenDeployments",
+            dict(BlueGreenDeploymentIdentifier=BlueGreenDeploymentIdentifier),
+        )
+        return dict(
+            OK,
+            BlueGreenDeployments=[self._deployment(BlueGreenDeploymentIdentifier)],
+        )
+
+    def switchover_blue_green_deployment(self, BlueGreenDeploymentIdentifier, **params):
+        self.call(
+            "SwitchoverBlueGreenDeployment",
+            dict(params, BlueGreenDeploymentIdentifier=BlueGreenDeploymentIdentifier),
+        )
+        deployment = self.deployments[BlueGreenDeploymentIdentifier]
+        if deployment["Status"] != "AVAILABLE" or deployment["pending"]:
+            raise self.error(
+                "SwitchoverBlueGreenDeployment",
+                "InvalidBlueGreenDeploymentStateFault",
+            )
+
+        # the blue cluster is renamed with the "-old1" suffix, the green cluster
+        # takes its identifier
+        source = deployment["Source"].split(":")[-1]
+        target = deployment["Target"].split(":")[-1]
+        self._move(source, f"{source}-old1")
+        self._move(target, source)
+        deployment.update(
+            Source=f"{ARN_PREFIX}:cluster:{source}-old1",
+            Target=f"{ARN_PREFIX}:cluster:{source}",
+            Status="SWITCHOVER_IN_PROGRESS",
+            pending=["SWITCHOVER_IN_PROGRESS"] * self.blue_green_polls
+            + ["SWITCHOVER_COMPLETED"],
+        )
+        return dict(
+            OK,
+            BlueGreenDeployment={k: v for k, v in deployment.items() if k != "pending"},
+        )
+
+    def delete_blue_green_deployment(
+        self, BlueGreenDeploymentIdentifier, DeleteTarget=False
+    ):
+        self.call(
+            "DeleteBlueGreenDeployment",
+            dict(
+                BlueGreenDeploymentIdentifier=BlueGreenDeploymentIdentifier,
+                DeleteTarget=DeleteTarget,
+            ),
+        )
+        deployment = self.deployments.pop(BlueGreenDeploymentIdentifier)
+        if DeleteTarget:
+            target = deployment["Target"].split(":")[-1]
+            del self.clusters[target]
+            self.instances = {
+                identifier: instance
+                for identifier, instance in self.instances.items()
+                if instance["DBClusterIdentifier"] != target
+            }
+        return OK
+
+
+@pytest.fixture
+def rds(monkeypatch):
+    """
+    Stubbed RDS client of the rollouts, run under a virtual clock so the
+    polling doesn't sleep
+    """
+    stub = StubRDS()
+    monkeypatch.setattr(algae.rds, "client", stub)
+    with use_clock(VirtualClock()), use_deadlines(Deadlines()):
+        yield stub
@@ -0,0 +1,267 @@
+import argparse
+
+import pytest
+from botocore.exceptions import ClientError
+
+from algae.backends import (
+    BlueGreenBackend,
+    ClassicBackend,
+    get_target_cluster_identifier,
+    provision_cluster,
+    select_backend,
+)
+from algae.capacity import settle_cluster
+from algae.deadlines import DeadlineExceeded, Deadlines, use_deadlines
+from algae.state import load_rollout
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+
+def backend_args(**kwargs):
+    return argparse.Namespace(
+        **dict(
+            dict(
+                backend="auto",
+                source_cluster_identifier="orders",
+                cluster_identifier="orders-green",
+                engine_version="8.0",
+                provision="auto",
+                subnet_group_name="private",
+            ),
+            **kwargs,
+        )
+    )
+
+
+def test_select_backend(rds):
+    rds.add_cluster("orders")
+    rds.add_cluster("legacy", Engine="aurora")
+
+    assert select_backend(backend_args()).name == BlueGreenBackend.name
+    assert select_backend(backend_args(backend="classic")).name == ClassicBackend.name
+    assert (
+        select_backend(backend_args(backend="blue-green")).name == BlueGreenBackend.name
+    )
+    # without a target version there is nothing to upgrade
+    assert select_backend(backend_args(engine_version=None)).name == ClassicBackend.name
+    assert (
+        select_backend(backend_args(source_cluster_identifier="legacy")).name
+        == ClassicBackend.name
+    )
+
+
+def test_get_target_cluster_identifier():
+    deployment = {
+        "Source": "arn:aws:rds:us-east-1:111111111111:cluster:orders",
+        "Target": "arn:aws:rds:us-east-1:111111111111:cluster:orders-green-x8k2vd",
+    }
+    assert get_target_cluster_identifier(deployment) == "orders-green-x8k2vd"
+
+
+def test_settle_cluster_resolves_instances(rds):
+    # the switchover renamed the pre-scaled green instance
+    rds.add_cluster("orders")
+    rds.add_instance("orders-instance", "orders", DBInstanceClass="db.r5.2xlarge")
+    rds.add_instance("orders-reader", "orders", DBInstanceClass="db.r5.large")
+
+    settle_cluster("orders", {"instance_class": "db.r5.large", "scaling": None})
+
+    assert rds.instances["orders-instance"]["DBInstanceClass"] == "db.r5.large"
+    assert [
+        params["DBInstanceIdentifier"]
+        for operation, params in rds.calls
+        if operation == "ModifyDBInstance"
+    ] == ["orders-instance"]
+
+
+@pytest.fixture
+def source(rds):
+    rds.add_cluster("orders", engine_version="5.7")
+    return rds
+
+
+def test_provision_cluster_restore(source):
+    assert provision_cluster(backend_args(provision="auto")) == "restore"
+
+    assert source.clusters["orders-green"]["EngineVersion"] == "8.0"
+    assert "RestoreDBClusterToPointInTime" not in source.operations()
+    assert source.snapshots == {}
+
+
+def test_provision_cluster_same_version(source):
+    assert provision_cluster(backend_args(engine_version="5.7")) == "clone"
+    assert (
+        provision_cluster(
+            backend_args(engine_version=None, cluster_identifier="orders-copy")
+        )
+        == "clone"
+    )
+
+    assert "CreateDBClusterSnapshot" not in source.operations()
+
+
+def test_provision_cluster_falls_back_to_clone(source):
+    source.errors["RestoreDBClusterFromSnapshot"] = [
+        source.error("RestoreDBClusterFromSnapshot", "InvalidParameterCombination")
+    ]
+
+    assert provision_cluster(backend_args(provision="auto")) == "clone-upgrade"
+
+    # the clone is upgraded in place afterwards
+    assert source.clusters["orders-green"]["EngineVersion"] == "5.7"
+    assert source.snapshots == {}
+
+
+def test_provision_cluster_restore_only(source):
+    source.errors["RestoreDBClusterFromSnapshot"] = [
+        source.error("RestoreDBClusterFromSnapshot", "InvalidParameterCombination")
+    ]
+
+    with pytest.raises(ClientError):
+        provision_cluster(backend_args(provision="restore"))
+
+    assert "RestoreDBClusterToPointInTime" not in source.operations()
+    assert source.snapshots == {}
+
+
+def test_provision_cluster_other_error(source):
+    source.errors["RestoreDBClusterFromSnapshot"] = [
+        source.error("RestoreDBClusterFromSnapshot", "StorageQuotaExceeded")
+    ]
+
+    with pytest.raises(ClientError):
+        provision_cluster(backend_args(provision="auto"))
+
+    assert "RestoreDBClusterToPointInTime" not in source.operations()
+    assert source.snapshots == {}
+
+
+def test_provision_cluster_clone_upgrade(source):
+    assert provision_cluster(backend_args(provision="clone")) == "clone-upgrade"
+    assert "CreateDBClusterSnapshot" not in source.operations()
+
+
+@pytest.fixture
+def blue_green_args(rds, tmp_path):
+    rds.add_cluster("orders", engine_version="5.7")
+    rds.add_instance("orders-instance", "orders")
+    return backend_args(
+        backend="blue-green",
+        command="upgrade-cluster-version",
+        migrate_parameter_groups=False,
+        keep_on_overrun=False,
+        prescale=False,
+        warmup_queries=None,
+        gate=False,
+        verify_tables=None,
+        switchover_timeout=300,
+        state_dir=str(tmp_path),
+    )
+
+
+def test_blue_green_rollout(rds, blue_green_args):
+    backend = BlueGreenBackend()
+
+    prepared = backend.prepare(blue_green_args)
+    assert prepared["deployment_identifier"] == "bgd-orders-green"
+    assert prepared["green_cluster_identifier"] == "orders-green-x8k2vd"
+    assert rds.deployments["bgd-orders-green"]["Status"] == "AVAILABLE"
+    assert backend.is_fresh(blue_green_args, prepared)
+
+    backend.cutover(blue_green_args, prepared)
+
+    assert [
+        operation
+        for operation in rds.operations()
+        if "BlueGreen" in operation and not operation.startswith("Describe")
+    ] == [
+        "CreateBlueGreenDeployment",
+        "SwitchoverBlueGreenDeployment",
+        "DeleteBlueGreenDeployment",
+    ]
+    # the deployment is deleted, the blue cluster is kept
+    assert rds.deployments == {}
+    assert rds.calls[-1][1]["DeleteTarget"] is False
+    assert rds.clusters["orders"]["EngineVersion"] == "8.0"
+    assert rds.clusters["orders-old1"]["EngineVersion"] == "5.7"
+
+    rollout = load_rollout("orders", state_dir=blue_green_args.state_dir)
+    assert rollout["backup_cluster_identifier"] == "orders-old1"
+    assert rollout["green_cluster_identifier"] == "orders-green-x8k2vd"
+    assert rollout["backend"] == BlueGreenBackend.name
+
+
+def test_blue_green_is_fresh(rds, blue_green_args):
+    backend = BlueGreenBackend()
+    prepared = backend.prepare(blue_green_args)
+
+    rds.deployments["bgd-orders-green"]["Status"] = "PROVISIONING"
+    assert not backend.is_fresh(blue_green_args, prepared)
+    with pytest.raises(Exception, match="delete it and prepare the cluster again"):
+        backend.discard(blue_green_args, prepared)
+
+
+def test_blue_green_prepare_overrun(rds, blue_green_args):
+    rds.blue_green_polls = 10
+
+    with use_deadlines(Deadlines({"blue-green": 120})):
+        with pytest.raises(DeadlineExceeded):
+            BlueGreenBackend().prepare(blue_green_args)
+
+    # the deployment and its green cluster are deleted
+    assert rds.calls[-1] == (
+        "DeleteBlueGreenDeployment",
+        {"BlueGreenDeploymentIdentifier": "bgd-orders-green", "DeleteTarget": True},
+    )
+    assert rds.deployments == {}
+    assert list(rds.clusters) == ["orders"]
+
+
+def test_blue_green_prepare_overrun_keep(rds, blue_green_args):
+    rds.blue_green_polls = 10
+    blue_green_args.keep_on_overrun = True
+
+    with use_deadlines(Deadlines({"blue-green": 120})):
+        with pytest.raises(DeadlineExceeded):
+            BlueGreenBackend().prepare(blue_green_args)
+
+    assert "DeleteBlueGreenDeployment" not in rds.operations()
+    assert "orders-green-x8k2vd" in rds.clusters
+
+
+def test_prepare_restore_overrun(source):
+    restore = source.restore_db_cluster_from_snapshot
+
+    def slow_restore(**params):
+        response = restore(**params)
+        source.clusters[params["DBClusterIdentifier"]]["pending"] = ["creating"] * 10
+        return response
+
+    source.restore_db_cluster_from_snapshot = slow_restore
+    source.errors["DeleteDBClusterSnapshot"] = [
+        source.error("DeleteDBClusterSnapshot", "InvalidDBClusterSnapshotStateFault")
+    ]
+    args = backend_args(migrate_parameter_groups=False, keep_on_overrun=False)
+
+    with use_deadlines(Deadlines({"restore": 120})):
+        with pytest.raises(DeadlineExceeded):
+            ClassicBackend().prepare(args)
+
+    # the failed snapshot delete doesn't prevent the green cleanup
+    assert "orders-green" not in source.clusters
+    assert "DeleteDBCluster" in source.operations()
+
+
+def test_provision_cluster_snapshot_overrun(source):
+    source.describe_db_cluster_snapshots = lambda **params: {
+        "DBClusterSnapshots": [{"Status": "creating"}]
+    }
+
+    with use_deadlines(Deadlines({"snapshot": 120})):
+        with pytest.raises(DeadlineExceeded):
+            provision_cluster(backend_args(provision="auto"))
+
+    assert source.snapshots == {}
+    assert "RestoreDBClusterFromSnapshot" not in source.operations()
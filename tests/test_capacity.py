@@ -0,0 +1,126 @@
+import argparse
+import time
+
+import pytest
+
+from algae.backends import complete_cutover
+from algae.capacity import prescale_cluster, settle_cluster
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+
+@pytest.fixture
+def clusters(rds):
+    rds.add_cluster("orders")
+    rds.add_instance("orders-instance", "orders", DBInstanceClass="db.r5.2xlarge")
+    rds.add_cluster("orders-green")
+    rds.add_instance("orders-green-instance", "orders-green")
+    rds.add_instance("orders-green-reader", "orders-green")
+    return rds
+
+
+def modified(rds, operation: str) -> list:
+    return [params for name, params in rds.calls if name == operation]
+
+
+def test_prescale_cluster_instance_class(clusters):
+    settle = prescale_cluster("orders-green", "orders")
+
+    # the green instances match the blue writer, nothing to settle afterwards
+    assert settle == {"instance_class": None, "scaling": None}
+    assert {
+        instance["DBInstanceClass"]
+        for identifier, instance in clusters.instances.items()
+        if instance["DBClusterIdentifier"] == "orders-green"
+    } == {"db.r5.2xlarge"}
+    assert "ModifyDBCluster" not in clusters.operations()
+
+
+def test_prescale_cluster_larger_instance_class(clusters):
+    clusters.instances["orders-green-reader"]["DBInstanceClass"] = "db.r5.4xlarge"
+
+    settle = prescale_cluster(
+        "orders-green", "orders", db_instance_class="db.r5.4xlarge"
+    )
+
+    assert settle == {"instance_class": "db.r5.2xlarge", "scaling": None}
+    # the instances already at the class are left alone
+    assert [
+        params["DBInstanceIdentifier"]
+        for params in modified(clusters, "ModifyDBInstance")
+    ] == ["orders-green-instance"]
+
+    settle_cluster("orders-green", settle)
+    assert {
+        instance["DBInstanceClass"] for instance in clusters.instances.values()
+    } == {"db.r5.2xlarge"}
+
+
+def test_prescale_cluster_capacity(clusters):
+    clusters.clusters["orders"]["ServerlessV2ScalingConfiguration"] = {
+        "MinCapacity": 2.0,
+        "MaxCapacity": 16.0,
+    }
+
+    settle = prescale_cluster("orders-green", "orders", min_capacity=8.0)
+
+    assert clusters.clusters["orders-green"]["ServerlessV2ScalingConfiguration"] == {
+        "MinCapacity": 8.0,
+        "MaxCapacity": 16.0,
+    }
+    assert settle["scaling"] == {"MinCapacity": 2.0, "MaxCapacity": 16.0}
+
+    settle_cluster("orders-green", settle)
+    assert clusters.clusters["orders-green"]["ServerlessV2ScalingConfiguration"] == {
+        "MinCapacity": 2.0,
+        "MaxCapacity": 16.0,
+    }
+
+
+def test_prescale_cluster_copies_capacity(clusters):
+    # the clone does not inherit the capacity range of the blue cluster
+    clusters.clusters["orders"]["ServerlessV2ScalingConfiguration"] = {
+        "MinCapacity": 4.0,
+        "MaxCapacity": 32.0,
+    }
+
+    settle = prescale_cluster("orders-green", "orders")
+
+    assert clusters.clusters["orders-green"]["ServerlessV2ScalingConfiguration"] == {
+        "MinCapacity": 4.0,
+        "MaxCapacity": 32.0,
+    }
+    assert settle == {"instance_class": None, "scaling": None}
+
+
+def test_prescale_cluster_floor_above_max(clusters):
+    clusters.clusters["orders"]["ServerlessV2ScalingConfiguration"] = {
+        "MinCapacity": 2.0,
+        "MaxCapacity": 16.0,
+    }
+
+    prescale_cluster("orders-green", "orders", min_capacity=64.0)
+
+    assert clusters.clusters["orders-green"]["ServerlessV2ScalingConfiguration"] == {
+        "MinCapacity": 64.0,
+        "MaxCapacity": 64.0,
+    }
+
+
+def test_complete_cutover(clusters):
+    args = argparse.Namespace(source_cluster_identifier="orders", soak_period=600)
+    started = time.time()
+
+    complete_cutover(
+        args,
+        {"instance_class": None, "scaling": {"MinCapacity": 0.5, "MaxCapacity": 16.0}},
+    )
+
+    # the raised capacity is kept through the soak period
+    assert time.time() - started >= args.soak_period
+    assert clusters.clusters["orders"]["ServerlessV2ScalingConfiguration"] == {
+        "MinCapacity": 0.5,
+        "MaxCapacity": 16.0,
+    }
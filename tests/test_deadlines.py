@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from algae.deadlines import (
+    DEFAULT_DEADLINES,
+    DeadlineExceeded,
+    Deadlines,
+    load_deadlines,
+    phase,
+    use_deadlines,
+    wait,
+)
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+
+def test_load_deadlines(tmp_path):
+    history_path = tmp_path / "history.json"
+    history_path.write_text(
+        json.dumps({"clone": [100, 200, 300, 400, 500], "rename": [60]})
+    )
+    config_path = tmp_path / "deadlines.json"
+    config_path.write_text(json.dumps({"upgrade": 600}))
+
+    deadlines = load_deadlines(
+        str(config_path), history_path=str(history_path), p=95, margin=2
+    )
+    assert deadlines.deadline("clone") == 1000
+    # not enough history, the default applies
+    assert deadlines.deadline("rename") == DEFAULT_DEADLINES["rename"]
+    assert deadlines.deadline("upgrade") == 600
+
+
+def test_phase_records_history(tmp_path):
+    history_path = tmp_path / "history.json"
+    with use_deadlines(Deadlines(history_path=str(history_path))):
+        with phase("rename", "cluster") as p:
+            wait(p, lambda: True, step=0)
+
+    assert len(json.loads(history_path.read_text())["rename"]) == 1
+
+
+def test_phase_records_history_in_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with use_deadlines(Deadlines(history_path="history.json")):
+        with phase("rename", "cluster") as p:
+            wait(p, lambda: True, step=0)
+
+    assert len(json.loads((tmp_path / "history.json").read_text())["rename"]) == 1
+
+
+def test_phase_history_failure(tmp_path):
+    # the history path is a directory, the phase completes regardless
+    with use_deadlines(Deadlines(history_path=str(tmp_path))):
+        with phase("rename", "cluster") as p:
+            wait(p, lambda: True, step=0)
+
+
+def test_wait_overrun():
+    events = []
+    deadlines = Deadlines({"rename": 0}, hooks=[events.append])
+
+    with use_deadlines(deadlines):
+        with pytest.raises(DeadlineExceeded):
+            with phase("rename", "cluster") as p:
+                wait(p, lambda: False, step=0.1)
+
+    assert [event["level"] for event in events] == ["warning", "overrun"]
+    assert events[-1]["identifier"] == "cluster"
@@ -0,0 +1,49 @@
+import argparse
+
+import pytest
+
+from algae.main import delete_cluster_command
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+
+@pytest.fixture
+def cluster(rds):
+    rds.add_cluster("orders")
+    rds.add_instance("orders-instance", "orders")
+    return rds
+
+
+def delete_args(**kwargs):
+    return argparse.Namespace(
+        **dict(
+            dict(cluster_identifier="orders", yes=False, skip_final_snapshot=False),
+            **kwargs,
+        )
+    )
+
+
+def test_delete_cluster_requires_confirmation(cluster):
+    with pytest.raises(Exception, match="--yes"):
+        delete_cluster_command(delete_args())
+    assert "orders" in cluster.clusters
+    assert cluster.operations() == []
+
+
+def test_delete_cluster_final_snapshot(cluster):
+    delete_cluster_command(delete_args(yes=True))
+
+    assert cluster.clusters == {}
+    (params,) = [p for op, p in cluster.calls if op == "DeleteDBCluster"]
+    assert params["SkipFinalSnapshot"] is False
+    assert params["FinalDBSnapshotIdentifier"].startswith("orders-final-")
+
+
+def test_delete_cluster_skip_final_snapshot(cluster):
+    delete_cluster_command(delete_args(yes=True, skip_final_snapshot=True))
+
+    (params,) = [p for op, p in cluster.calls if op == "DeleteDBCluster"]
+    assert params["SkipFinalSnapshot"] is True
+    assert "FinalDBSnapshotIdentifier" not in params
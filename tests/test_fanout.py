@@ -0,0 +1,172 @@
+import argparse
+import time
+
+import pytest
+
+from algae.deadlines import DeadlineExceeded, Deadlines, use_deadlines
+from algae.fanout import (
+    EXPIRES_TAG,
+    fan_out_clones,
+    format_clones,
+    get_tag,
+    is_failed_status,
+)
+from algae.metrics import METRICS
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+
+def test_get_tag():
+    cluster = {"TagList": [{"Key": EXPIRES_TAG, "Value": "1700000000"}]}
+    assert get_tag(cluster, EXPIRES_TAG) == "1700000000"
+    assert get_tag({}, EXPIRES_TAG) is None
+
+
+def test_is_failed_status():
+    assert is_failed_status("incompatible-parameters")
+    assert is_failed_status("failed")
+    assert not is_failed_status("creating")
+
+
+def test_format_clones():
+    clones = [
+        {
+            "cluster_identifier": "orders-clone-1",
+            "status": "ready",
+            "time_to_ready": 612.4,
+            "endpoint": "orders-clone-1.cluster-x.rds.amazonaws.com",
+        },
+        {
+            "cluster_identifier": "orders-clone-2",
+            "status": "failed",
+            "time_to_ready": None,
+            "endpoint": None,
+        },
+    ]
+    assert format_clones(clones).splitlines() == [
+        "orders-clone-1\tready\t612\torders-clone-1.cluster-x.rds.amazonaws.com",
+        "orders-clone-2\tfailed\t-\t-",
+    ]
+
+
+@pytest.fixture
+def args(rds):
+    rds.add_cluster("orders")
+    return argparse.Namespace(
+        cluster_identifier="orders",
+        subnet_group_name="private",
+        clone_prefix=None,
+        count=5,
+        clone_concurrency=2,
+        ttl=3600,
+        poll_interval=30,
+        db_instance_class="db.t3.small",
+        keep_on_overrun=False,
+        detach=True,
+    )
+
+
+def in_flight(rds):
+    return [
+        identifier
+        for identifier in rds.clusters
+        if identifier != "orders"
+        and rds.instances.get(f"{identifier}-instance", {}).get("DBInstanceStatus")
+        != "available"
+    ]
+
+
+def test_fan_out_clones(rds, args):
+    restore = rds.restore_db_cluster_to_point_in_time
+    concurrent = []
+
+    def restore_clone(**params):
+        concurrent.append(len(in_flight(rds)) + 1)
+        return restore(**params)
+
+    rds.restore_db_cluster_to_point_in_time = restore_clone
+    polls = METRICS.polls.get("fan-out", 0)
+
+    report = fan_out_clones(args)
+    ticks = METRICS.polls["fan-out"] - polls
+
+    assert [clone["status"] for clone in report] == ["ready"] * 5
+    assert all(
+        clone["cluster_identifier"].startswith("orders-clone-") for clone in report
+    )
+    assert max(concurrent) == args.clone_concurrency
+
+    # the clones are polled with one call per tick, not one per clone
+    polled = [
+        params
+        for operation, params in rds.calls
+        if operation in ("DescribeDBClusters", "DescribeDBInstances")
+        and params["Filters"]
+    ]
+    assert len(polled) <= 2 * ticks
+    assert len(polled[0]["Filters"][0]["Values"]) == args.clone_concurrency
+    assert not [
+        params
+        for operation, params in rds.calls
+        if operation == "DescribeDBClusters"
+        and params["DBClusterIdentifier"] not in (None, "orders")
+    ]
+
+
+def test_fan_out_clones_unique_names(rds, args):
+    args.count = 2
+    first = fan_out_clones(args)
+    second = fan_out_clones(args)
+
+    assert [clone["status"] for clone in first + second] == ["ready"] * 4
+    assert len({clone["cluster_identifier"] for clone in first + second}) == 4
+
+
+def test_fan_out_clones_failure(rds, args):
+    args.count = 3
+    rds.errors["RestoreDBClusterToPointInTime"] = [
+        None,
+        rds.error(
+            "RestoreDBClusterToPointInTime", "InsufficientDBClusterCapacityFault"
+        ),
+    ]
+
+    report = fan_out_clones(args)
+
+    assert [clone["status"] for clone in report] == ["ready", "failed", "ready"]
+    assert report[1]["time_to_ready"] is None
+
+
+def test_fan_out_clones_hold_failure(rds, args):
+    args.count, args.detach = 2, False
+    rds.errors["RestoreDBClusterToPointInTime"] = [
+        rds.error("RestoreDBClusterToPointInTime", "InsufficientDBClusterCapacityFault")
+    ]
+
+    report = fan_out_clones(args)
+
+    # only the clone created is deleted
+    assert [clone["status"] for clone in report] == ["failed", "expired"]
+    assert rds.operations().count("DeleteDBCluster") == 1
+
+
+def test_fan_out_clones_overrun(rds, args):
+    with use_deadlines(Deadlines({"fan-out": 45})):
+        with pytest.raises(DeadlineExceeded):
+            fan_out_clones(args)
+
+    # the clones created before the overrun are deleted
+    assert list(rds.clusters) == ["orders"]
+
+
+def test_fan_out_clones_hold(rds, args):
+    args.count, args.detach = 2, False
+    started = time.time()
+
+    report = fan_out_clones(args)
+
+    assert time.time() - started >= args.ttl
+    assert [clone["status"] for clone in report] == ["expired"] * 2
+    assert list(rds.clusters) == ["orders"]
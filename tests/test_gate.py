@@ -0,0 +1,167 @@
+from datetime import timedelta
+
+import boto3
+import pytest
+from botocore.stub import ANY, Stubber
+
+from algae import gate
+from algae.gate import (
+    METRICS,
+    CloudWatchMetrics,
+    cutover_gate,
+    evaluate,
+    load_thresholds,
+)
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+
+class StubMetrics:
+    def __init__(self, ticks):
+        self.ticks = iter(ticks)
+        self.calls = 0
+
+    def fetch(self, cluster_identifiers):
+        self.calls += 1
+        blue, green = next(self.ticks)
+        return {cluster_identifiers[0]: blue, cluster_identifiers[1]: green}
+
+
+BLUE = {"cpu": 40.0, "commit_latency": 4.0, "connections": 300.0}
+HEALTHY = {"cpu": 10.0, "replica_lag": 20.0, "commit_latency": 5.0}
+UNHEALTHY = {"cpu": 95.0, "replica_lag": 20.0, "commit_latency": 12.0}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(gate.time, "sleep", lambda seconds: None)
+
+
+def test_evaluate():
+    thresholds = load_thresholds()
+    assert evaluate(BLUE, HEALTHY, thresholds) == []
+    assert evaluate(BLUE, UNHEALTHY, thresholds) == [
+        "cpu 95.00 > 80.00",
+        "commit_latency ratio 3.00 > 2.00",
+    ]
+    # a green cluster without datapoints is not healthy
+    assert evaluate({}, {}, thresholds) == [
+        "cpu: no datapoints",
+        "commit_latency: no datapoints",
+    ]
+    # the ratios need the blue datapoints
+    assert evaluate({}, HEALTHY, thresholds) == []
+
+
+def test_load_thresholds(tmp_path):
+    path = tmp_path / "thresholds.json"
+    path.write_text('{"max": {"cpu": 50}}')
+    thresholds = load_thresholds(str(path))
+    assert thresholds["max"]["cpu"] == 50
+    assert thresholds["max"]["commit_latency"] == 50.0
+
+
+def test_cutover_gate_proceeds():
+    metrics = StubMetrics([(BLUE, HEALTHY), (BLUE, UNHEALTHY)] + [(BLUE, HEALTHY)] * 3)
+    cutover_gate("blue", "green", metrics=metrics, required_passes=3)
+    assert metrics.calls == 5
+
+
+def test_cutover_gate_aborts():
+    metrics = StubMetrics([(BLUE, UNHEALTHY)] * 4)
+    with pytest.raises(Exception, match="aborting cutover"):
+        cutover_gate("blue", "green", metrics=metrics, max_ticks=4)
+    assert metrics.calls == 4
+
+
+def test_cutover_gate_aborts_without_datapoints():
+    metrics = StubMetrics([(BLUE, {})] * 4)
+    with pytest.raises(Exception, match="aborting cutover"):
+        cutover_gate("blue", "green", metrics=metrics, max_ticks=4)
+
+
+def metric_query(query_id: str, cluster_identifier: str, metric_name: str, stat: str):
+    return {
+        "Id": query_id,
+        "MetricStat": {
+            "Metric": {
+                "Namespace": "AWS/RDS",
+                "MetricName": metric_name,
+                "Dimensions": [
+                    {"Name": "DBClusterIdentifier", "Value": cluster_identifier}
+                ],
+            },
+            "Period": 60,
+            "Stat": stat,
+        },
+    }
+
+
+def test_cloudwatch_metrics_fetch():
+    client = boto3.client(
+        "cloudwatch",
+        region_name="us-east-1",
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+    )
+    params = {}
+    # the request parameters, before the stubber checks them
+    client.meta.events.register(
+        "provide-client-params.cloudwatch.GetMetricData",
+        lambda **kwargs: params.update(kwargs["params"]),
+    )
+
+    queries = [
+        metric_query(
+            f"m{i}_{name}",
+            cluster_identifier,
+            metric_name,
+            "Maximum" if name == "replica_lag" else "Average",
+        )
+        for i, cluster_identifier in enumerate(["orders", "orders-green"])
+        for name, metric_name in METRICS.items()
+    ]
+    results = {
+        "m0_cpu": [40.0, 35.0],
+        "m0_replica_lag": [],
+        "m0_connections": [300.0],
+        "m0_commit_latency": [4.0],
+        "m1_cpu": [10.0],
+        "m1_replica_lag": [20.0],
+        "m1_connections": [],
+        "m1_commit_latency": [5.0],
+    }
+
+    with Stubber(client) as stubber:
+        stubber.add_response(
+            "get_metric_data",
+            {
+                "MetricDataResults": [
+                    {"Id": query_id, "Values": values, "StatusCode": "Complete"}
+                    for query_id, values in results.items()
+                ]
+            },
+            {
+                "MetricDataQueries": queries,
+                "StartTime": ANY,
+                "EndTime": ANY,
+                "ScanBy": "TimestampDescending",
+            },
+        )
+
+        values = CloudWatchMetrics(client=client).fetch(["orders", "orders-green"])
+
+        stubber.assert_no_pending_responses()
+
+    # one call for both clusters, the latest datapoint of each query, the
+    # metrics without datapoints are left out
+    assert len(params["MetricDataQueries"]) == 8
+    assert values == {
+        "orders": {"cpu": 40.0, "connections": 300.0, "commit_latency": 4.0},
+        "orders-green": {"cpu": 10.0, "replica_lag": 20.0, "commit_latency": 5.0},
+    }
+    # the window ends now in UTC
+    assert params["EndTime"].utcoffset() == timedelta(0)
+    assert params["EndTime"] - params["StartTime"] == timedelta(minutes=5)
@@ -0,0 +1,57 @@
+import urllib.request
+
+from algae.deadlines import Deadlines, phase, use_deadlines, wait
+from algae.metrics import METRICS, Metrics, serve_metrics
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+
+def test_render():
+    metrics = Metrics()
+    metrics.api_call("rds", "DescribeDBClusters")
+    metrics.api_call("rds", "DescribeDBClusters", "Throttling")
+    metrics.api_call("rds", "CreateDBInstance", "InvalidParameterCombination")
+
+    try:
+        with metrics.rollout("upgrade-cluster-version"):
+            raise Exception("failed")
+    except Exception:
+        pass
+
+    text = metrics.render()
+
+    assert (
+        'algae_api_calls_total{service="rds",operation="DescribeDBClusters"} 2' in text
+    )
+    assert (
+        'algae_api_throttles_total{service="rds",operation="DescribeDBClusters"} 1'
+        in text
+    )
+    assert (
+        'algae_api_errors_total{service="rds",operation="CreateDBInstance",'
+        'code="InvalidParameterCombination"} 1' in text
+    )
+    assert 'algae_rollouts_in_flight{command="upgrade-cluster-version"} 0' in text
+    assert (
+        'algae_rollouts_total{command="upgrade-cluster-version",status="failed"} 1'
+        in text
+    )
+
+
+def test_serve_metrics():
+    server = serve_metrics(0)
+    url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+
+    try:
+        with use_deadlines(Deadlines()):
+            with phase("clone", "cluster-a") as p:
+                wait(p, lambda: True, step=0)
+                text = urllib.request.urlopen(url).read().decode()
+
+        assert 'algae_phase{cluster="cluster-a",phase="clone"} 1' in text
+        assert 'algae_phase_seconds{cluster="cluster-a",phase="clone"}' in text
+        assert "cluster-a" not in METRICS.render()
+    finally:
+        server.shutdown()
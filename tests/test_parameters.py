@@ -0,0 +1,261 @@
+import argparse
+
+import pytest
+
+from algae.backends import BlueGreenBackend, ClassicBackend
+from algae.deadlines import DeadlineExceeded, Deadlines, use_deadlines
+from algae.parameters import (
+    delete_parameter_groups,
+    diff_parameters,
+    migrate_parameter_groups,
+    parameter_group_name,
+)
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+
+def test_diff_parameters():
+    parameters = [
+        {"ParameterName": "max_connections", "ParameterValue": "2000"},
+        {"ParameterName": "innodb_file_format", "ParameterValue": "Barracuda"},
+        {"ParameterName": "binlog_format", "ParameterValue": "OFF"},
+        {"ParameterName": "aurora_lab_mode", "ParameterValue": "1"},
+    ]
+    target_defaults = [
+        {
+            "ParameterName": "max_connections",
+            "ParameterValue": "1000",
+            "ApplyType": "dynamic",
+            "IsModifiable": True,
+        },
+        {
+            "ParameterName": "binlog_format",
+            "ParameterValue": "OFF",
+            "ApplyType": "static",
+            "IsModifiable": True,
+        },
+        {
+            "ParameterName": "aurora_lab_mode",
+            "ParameterValue": "0",
+            "ApplyType": "static",
+            "IsModifiable": False,
+        },
+    ]
+
+    supported, unsupported = diff_parameters(parameters, target_defaults)
+
+    assert supported == [
+        {
+            "ParameterName": "max_connections",
+            "ParameterValue": "2000",
+            "ApplyMethod": "immediate",
+        }
+    ]
+    assert unsupported == ["innodb_file_format", "aurora_lab_mode"]
+
+
+def test_parameter_group_name():
+    assert parameter_group_name("orders", "aurora-mysql5.7") == "orders-aurora-mysql5-7"
+
+
+CLUSTER_GROUP = "orders-green-aurora-mysql8-0"
+DB_GROUP = "orders-green-instance-aurora-mysql8-0"
+
+
+@pytest.fixture
+def source(rds):
+    rds.add_cluster(
+        "orders", engine_version="5.7", DBClusterParameterGroup="orders-cluster"
+    )
+    rds.add_instance(
+        "orders-instance",
+        "orders",
+        DBParameterGroups=[{"DBParameterGroupName": "orders-db"}],
+    )
+    rds.add_parameter_group(
+        "orders-cluster",
+        "aurora-mysql5.7",
+        max_connections="2000",
+        innodb_file_format="Barracuda",
+    )
+    rds.add_parameter_group(
+        "orders-db", "aurora-mysql5.7", kind="db", long_query_time="2"
+    )
+    rds.add_engine_default("aurora-mysql8.0", "max_connections", "1000")
+    rds.add_engine_default("aurora-mysql8.0", "long_query_time", "10", kind="db")
+    return rds
+
+
+def prepare_args(**kwargs):
+    return argparse.Namespace(
+        **dict(
+            dict(
+                source_cluster_identifier="orders",
+                cluster_identifier="orders-green",
+                engine_version="8.0",
+                provision="auto",
+                subnet_group_name="private",
+                migrate_parameter_groups=True,
+                keep_on_overrun=False,
+            ),
+            **kwargs,
+        )
+    )
+
+
+def attached(rds, cluster_identifier: str = "orders-green") -> tuple:
+    instance = rds.instances[f"{cluster_identifier}-instance"]
+    return (
+        rds.clusters[cluster_identifier]["DBClusterParameterGroup"],
+        instance["DBParameterGroups"][0]["DBParameterGroupName"],
+    )
+
+
+def test_migrate_parameter_groups(source):
+    groups = migrate_parameter_groups("orders", "8.0", "orders-green")
+
+    assert groups == {
+        "cluster": CLUSTER_GROUP,
+        "db": DB_GROUP,
+        "unsupported": ["innodb_file_format"],
+        "major": True,
+    }
+    assert source.parameter_groups[CLUSTER_GROUP]["family"] == "aurora-mysql8.0"
+    assert source.parameter_groups[CLUSTER_GROUP]["parameters"] == {
+        "max_connections": {
+            "ParameterName": "max_connections",
+            "ParameterValue": "2000",
+            "ApplyMethod": "immediate",
+            "Source": "user",
+        }
+    }
+    assert list(source.parameter_groups[DB_GROUP]["parameters"]) == ["long_query_time"]
+
+
+def test_prepare_restore_parameter_groups(source):
+    prepared = ClassicBackend().prepare(prepare_args())
+
+    # the cluster group is attached by the restore, the DB group by the
+    # creation of the instance
+    assert prepared["provision_path"] == "restore"
+    assert attached(source) == (CLUSTER_GROUP, DB_GROUP)
+    restore = dict(source.calls)["RestoreDBClusterFromSnapshot"]
+    assert restore["DBClusterParameterGroupName"] == CLUSTER_GROUP
+    assert "ModifyDBCluster" not in source.operations()
+
+
+def test_prepare_clone_upgrade_major_parameter_groups(source):
+    prepared = ClassicBackend().prepare(prepare_args(provision="clone"))
+
+    # the instance comes up with the group of the source family, the 8.0
+    # groups are attached by the major version upgrade
+    assert prepared["provision_path"] == "clone-upgrade"
+    assert "DBParameterGroupName" not in dict(source.calls)["CreateDBInstance"]
+    assert dict(source.calls)["ModifyDBCluster"] == {
+        "DBClusterIdentifier": "orders-green",
+        "ApplyImmediately": True,
+        "EngineVersion": "8.0",
+        "DBClusterParameterGroupName": CLUSTER_GROUP,
+        "DBInstanceParameterGroupName": DB_GROUP,
+        "AllowMajorVersionUpgrade": True,
+    }
+    assert attached(source) == (CLUSTER_GROUP, DB_GROUP)
+
+
+def test_prepare_clone_upgrade_minor_parameter_groups(rds):
+    rds.add_cluster(
+        "orders",
+        engine_version="8.0.mysql_aurora.3.02.0",
+        DBClusterParameterGroup="orders-cluster",
+    )
+    rds.add_instance(
+        "orders-instance",
+        "orders",
+        DBParameterGroups=[{"DBParameterGroupName": "orders-db"}],
+    )
+    rds.add_parameter_group("orders-cluster", "aurora-mysql8.0", max_connections="2000")
+    rds.add_parameter_group("orders-db", "aurora-mysql8.0", kind="db")
+    rds.add_engine_default("aurora-mysql8.0", "max_connections", "1000")
+
+    ClassicBackend().prepare(
+        prepare_args(provision="clone", engine_version="8.0.mysql_aurora.3.04.0")
+    )
+
+    # the groups of the same family are attached without a major upgrade
+    assert dict(rds.calls)["CreateDBInstance"]["DBParameterGroupName"] == DB_GROUP
+    upgrade = dict(rds.calls)["ModifyDBCluster"]
+    assert upgrade["DBClusterParameterGroupName"] == CLUSTER_GROUP
+    assert "AllowMajorVersionUpgrade" not in upgrade
+    assert attached(rds) == (CLUSTER_GROUP, DB_GROUP)
+
+
+def test_prepare_clone_same_version(source):
+    prepared = ClassicBackend().prepare(prepare_args(engine_version="5.7"))
+
+    assert prepared["provision_path"] == "clone"
+    assert prepared["parameter_groups"] == {}
+    assert "DescribeDBEngineVersions" not in source.operations()
+    assert source.clusters["orders-green"]["DBClusterParameterGroup"] == (
+        "orders-cluster"
+    )
+
+
+def test_discard_deletes_parameter_groups(source):
+    backend, args = ClassicBackend(), prepare_args()
+    prepared = backend.prepare(args)
+
+    backend.discard(args, prepared)
+
+    assert "orders-green" not in source.clusters
+    assert list(source.parameter_groups) == ["orders-cluster", "orders-db"]
+
+
+def test_prepare_overrun_deletes_parameter_groups(source):
+    create = source.create_db_instance
+
+    def slow_create(**params):
+        response = create(**params)
+        source.instances[params["DBInstanceIdentifier"]]["pending"] = ["creating"] * 10
+        return response
+
+    source.create_db_instance = slow_create
+
+    with use_deadlines(Deadlines({"create-instance": 120})):
+        with pytest.raises(DeadlineExceeded):
+            ClassicBackend().prepare(prepare_args())
+
+    # the groups are deleted after the cluster using them
+    assert "orders-green" not in source.clusters
+    assert list(source.parameter_groups) == ["orders-cluster", "orders-db"]
+    assert source.operations()[-2:] == [
+        "DeleteDBClusterParameterGroup",
+        "DeleteDBParameterGroup",
+    ]
+
+
+def test_blue_green_prepare_overrun_deletes_parameter_groups(source):
+    source.blue_green_polls = 10
+
+    with use_deadlines(Deadlines({"blue-green": 120})):
+        with pytest.raises(DeadlineExceeded):
+            BlueGreenBackend().prepare(prepare_args())
+
+    assert list(source.clusters) == ["orders"]
+    assert list(source.parameter_groups) == ["orders-cluster", "orders-db"]
+
+
+def test_delete_parameter_groups_in_use(source):
+    groups = migrate_parameter_groups("orders", "8.0", "orders-green")
+    ClassicBackend().prepare(prepare_args())
+
+    # a failure is logged, the other group is still deleted
+    source.instances["orders-green-instance"]["DBParameterGroups"] = []
+    delete_parameter_groups(groups)
+
+    assert list(source.parameter_groups) == [
+        "orders-cluster",
+        "orders-db",
+        CLUSTER_GROUP,
+    ]
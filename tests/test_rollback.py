@@ -0,0 +1,66 @@
+import argparse
+
+import pytest
+
+from algae.rollback import rollback_cluster
+from algae.state import load_rollout, record_rollout
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+
+@pytest.fixture
+def args(rds, tmp_path):
+    # the cluster after a cutover, the blue cluster retained as a backup
+    rds.add_cluster("prod", engine_version="8.0")
+    rds.add_cluster("prod-backup", engine_version="5.7")
+    record_rollout(
+        "prod",
+        green_cluster_identifier="prod-green",
+        command="upgrade-cluster-version",
+        state_dir=str(tmp_path),
+    )
+    return argparse.Namespace(
+        cluster_identifier="prod", state_dir=str(tmp_path), poll_interval=60
+    )
+
+
+def test_rollback_cluster(rds, args):
+    rollback_cluster(args)
+
+    assert rds.clusters["prod"]["EngineVersion"] == "5.7"
+    assert rds.clusters["prod-green"]["EngineVersion"] == "8.0"
+    assert "prod-backup" not in rds.clusters
+
+    renames = [
+        (params["DBClusterIdentifier"], params["NewDBClusterIdentifier"])
+        for operation, params in rds.calls
+        if operation == "ModifyDBCluster"
+    ]
+    assert renames == [("prod", "prod-green"), ("prod-backup", "prod")]
+
+    rollout = load_rollout("prod", state_dir=args.state_dir)
+    assert rollout["status"] == "rolled-back"
+
+
+def test_rollback_cluster_restores_green(rds, args):
+    rds.errors["ModifyDBCluster"] = [
+        None,
+        rds.error("ModifyDBCluster", "InvalidDBClusterStateFault"),
+    ]
+
+    with pytest.raises(rds.exceptions.InvalidDBClusterStateFault):
+        rollback_cluster(args)
+
+    # production keeps a cluster under the canonical identifier
+    assert rds.clusters["prod"]["EngineVersion"] == "8.0"
+    assert rds.clusters["prod-backup"]["EngineVersion"] == "5.7"
+    assert load_rollout("prod", state_dir=args.state_dir)["status"] == "completed"
+
+
+def test_rollback_cluster_requires_completed_rollout(rds, args):
+    rollback_cluster(args)
+
+    with pytest.raises(Exception, match="rolled-back"):
+        rollback_cluster(args)
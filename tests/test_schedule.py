@@ -0,0 +1,226 @@
+import argparse
+import time
+
+import pytest
+
+import algae.schedule
+from algae.backends import BlueGreenBackend, ClassicBackend
+from algae.schedule import (
+    POLL_INTERVAL,
+    TYPICAL_DURATIONS,
+    RolloutProgress,
+    plan_rollouts,
+    predict_duration,
+    schedule_rollouts,
+)
+from algae.trace import VirtualClock, use_clock
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+
+def rollout(cluster_identifier, duration, **settings):
+    return dict(
+        {
+            "cluster_identifier": cluster_identifier,
+            "duration": duration,
+            "api_rate": 0.1,
+            "priority": 0,
+            "not_before": 0,
+            "not_after": None,
+        },
+        **settings,
+    )
+
+
+def planned(plan):
+    return {r["cluster_identifier"]: (r["start"], r["end"]) for r in plan}
+
+
+def test_plan_shortest_first():
+    plan = plan_rollouts(
+        [rollout("a", 60), rollout("b", 30), rollout("c", 50)],
+        window=100,
+        api_budget=1,
+        max_rollouts=1,
+    )
+    assert planned(plan) == {"b": (0, 30), "c": (30, 80), "a": (None, None)}
+
+
+def test_plan_priority_and_windows():
+    plan = plan_rollouts(
+        [
+            rollout("a", 60, priority=1),
+            rollout("b", 30),
+            rollout("c", 20, not_before=70),
+            rollout("d", 10, not_after=50),
+        ],
+        window=100,
+        api_budget=1,
+        max_rollouts=1,
+    )
+    assert planned(plan) == {
+        "a": (0, 60),
+        "b": (60, 90),
+        "c": (None, None),
+        "d": (None, None),
+    }
+
+
+def test_plan_api_budget():
+    plan = plan_rollouts(
+        [rollout("a", 30, api_rate=0.5), rollout("b", 30, api_rate=0.5)],
+        window=100,
+        api_budget=0.6,
+        max_rollouts=4,
+    )
+    assert planned(plan) == {"a": (0, 30), "b": (30, 60)}
+
+
+def test_plan_running():
+    plan = plan_rollouts(
+        [rollout("a", 30)],
+        window=100,
+        api_budget=1,
+        max_rollouts=1,
+        now=10,
+        running=[{"end": 40, "api_rate": 0.1}],
+    )
+    assert planned(plan) == {"a": (40, 70)}
+
+
+def test_predict_duration():
+    args = argparse.Namespace(
+        provision="auto", warmup_queries=None, gate=False, prescale=False
+    )
+    rename = 2 * TYPICAL_DURATIONS["rename"]
+
+    # the classic backend restores at the target version unless only cloning
+    assert predict_duration(args, ClassicBackend(), {"restore": 1200}) == (
+        TYPICAL_DURATIONS["snapshot"]
+        + 1200
+        + TYPICAL_DURATIONS["create-instance"]
+        + rename
+    )
+    args.provision = "clone"
+    assert predict_duration(args, ClassicBackend()) == (
+        TYPICAL_DURATIONS["clone"]
+        + TYPICAL_DURATIONS["create-instance"]
+        + TYPICAL_DURATIONS["upgrade"]
+        + rename
+    )
+    assert predict_duration(args, BlueGreenBackend()) == (
+        TYPICAL_DURATIONS["blue-green"] + TYPICAL_DURATIONS["switchover"]
+    )
+
+
+def test_rollout_progress():
+    with use_clock(VirtualClock()):
+        progress = RolloutProgress(
+            {
+                "phases": [
+                    ("snapshot", 600),
+                    ("restore", 1800),
+                    ("rename", 120),
+                    ("rename", 120),
+                ],
+                "duration": 2940,
+            },
+            started=0,
+        )
+        assert progress.end(now=0) == 2940
+
+        # early
+        time.sleep(100)
+        progress.phase_finished("snapshot", 100)
+        assert progress.updated()
+        assert not progress.updated()
+        assert progress.end(now=100) == 100 + 1800 + 240 + 300
+
+        # the waits nested in the predicted phases are not counted
+        progress.phase_finished("instances", 50)
+        assert not progress.updated()
+
+        # late
+        time.sleep(2900)
+        progress.phase_finished("restore", 2900)
+        assert progress.end(now=3000) == 3000 + 240 + 300
+        assert progress.end(now=3500) == 3500 + POLL_INTERVAL
+
+
+@pytest.fixture
+def fleet(rds, tmp_path):
+    rds.add_cluster("orders", engine_version="5.7")
+    rds.add_instance("orders-instance", "orders")
+    rds.add_cluster("reports", engine_version="5.7")
+    rds.add_instance("reports-instance", "reports")
+    return argparse.Namespace(
+        command="schedule",
+        schedule=None,
+        window=14400,
+        api_budget=1.0,
+        max_rollouts=1,
+        green_suffix="green",
+        dry_run=False,
+        backend="classic",
+        engine_version="8.0",
+        provision="auto",
+        subnet_group_name="private",
+        migrate_parameter_groups=False,
+        keep_on_overrun=False,
+        prescale=False,
+        warmup_queries=None,
+        gate=False,
+        verify_tables=None,
+        state_dir=str(tmp_path),
+    )
+
+
+def test_schedule_rollouts(rds, fleet, monkeypatch):
+    plans = []
+
+    def plan(rollouts, *args, running=None, **kwargs):
+        plans.append(running)
+        return plan_rollouts(rollouts, *args, running=running, **kwargs)
+
+    monkeypatch.setattr(algae.schedule, "plan_rollouts", plan)
+
+    results = {r["cluster_identifier"]: r for r in schedule_rollouts(fleet)}
+
+    assert {r["status"] for r in results.values()} == {"completed"}
+    assert rds.clusters["orders"]["EngineVersion"] == "8.0"
+    assert rds.clusters["reports"]["EngineVersion"] == "8.0"
+    # one rollout at a time
+    first, second = sorted(results.values(), key=lambda r: r["start"])
+    assert second["start"] >= first["end"]
+
+    # the stubbed phases finish early, the predicted end of the running
+    # rollout moves ahead with every completed phase
+    ends = [
+        running[0]["end"]
+        for running in plans
+        if running and running[0]["cluster_identifier"] == first["cluster_identifier"]
+    ]
+    assert len(ends) > 2
+    assert ends[0] < first["start"] + first["duration"]
+    assert ends[1] < ends[0]
+    assert ends[-1] <= first["end"] + POLL_INTERVAL
+
+
+def test_schedule_rollouts_window(rds, fleet):
+    fleet.window = 4000
+
+    results = schedule_rollouts(fleet)
+
+    # the second rollout only fits once the first one completed early
+    assert [r["status"] for r in results] == ["completed", "completed"]
+
+
+def test_schedule_rollouts_deferred(rds, fleet):
+    fleet.window = 3000
+
+    results = schedule_rollouts(fleet)
+
+    assert [r["status"] for r in results] == ["deferred", "deferred"]
+    assert rds.operations() == ["DescribeDBClusters"]
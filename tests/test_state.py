@@ -0,0 +1,46 @@
+import pytest
+
+from algae.state import (
+    load_prepared,
+    load_rollout,
+    record_rollout,
+    remove_prepared,
+    save_prepared,
+)
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+
+def test_record_rollout(tmp_path):
+    record_rollout(
+        "orders",
+        green_cluster_identifier="orders-green",
+        command="upgrade-cluster-version",
+        state_dir=str(tmp_path),
+        suffix="old1",
+        backend="blue-green",
+    )
+    rollout = load_rollout("orders", state_dir=str(tmp_path))
+    assert rollout["backup_cluster_identifier"] == "orders-old1"
+    assert rollout["green_cluster_identifier"] == "orders-green"
+    assert rollout["status"] == "completed"
+    assert rollout["backend"] == "blue-green"
+    assert "updated_at" in rollout
+
+
+def test_load_rollout_missing(tmp_path):
+    with pytest.raises(Exception, match="no rollout metadata"):
+        load_rollout("orders", state_dir=str(tmp_path))
+
+
+def test_prepared(tmp_path):
+    save_prepared("orders", {"green_cluster_identifier": "orders-green"}, str(tmp_path))
+    assert load_prepared("orders", str(tmp_path)) == {
+        "green_cluster_identifier": "orders-green"
+    }
+
+    remove_prepared("orders", str(tmp_path))
+    with pytest.raises(Exception, match="no prepared cluster"):
+        load_prepared("orders", str(tmp_path))
@@ -0,0 +1,88 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from botocore.credentials import AssumeRoleCredentialFetcher
+
+from algae.targets import (
+    Target,
+    current_target,
+    parse_targets,
+    run_targets,
+    submit,
+    use_target,
+)
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+ROLE_ARN = "arn:aws:iam::111111111111:role/admin"
+
+
+def test_parse_targets():
+    targets = parse_targets(
+        ["us-east-1", "eu-west-1"], profiles=["staging"], roles=[ROLE_ARN]
+    )
+    assert [target.name for target in targets] == [
+        "staging/us-east-1",
+        "staging/eu-west-1",
+        "111111111111:admin/us-east-1",
+        "111111111111:admin/eu-west-1",
+    ]
+    assert [target.name for target in parse_targets(["us-east-1"])] == [
+        "default/us-east-1"
+    ]
+
+
+def test_run_targets(tmp_path):
+    targets = parse_targets(["us-east-1", "eu-west-1"])
+
+    def command(args):
+        if current_target().region == "eu-west-1":
+            raise Exception("throttled")
+        return args.state_dir
+
+    results = run_targets(targets, command, argparse.Namespace(state_dir=str(tmp_path)))
+    assert results["default/us-east-1"]["status"] == "ok"
+    assert results["default/us-east-1"]["result"] == str(
+        tmp_path / "default" / "us-east-1"
+    )
+    assert results["default/eu-west-1"]["status"] == "failed"
+    assert results["default/eu-west-1"]["error"] == "throttled"
+
+
+def test_submit_keeps_target():
+    target = Target("eu-west-1")
+
+    with use_target(target), ThreadPoolExecutor(max_workers=1) as executor:
+        assert submit(executor, current_target).result() is target
+        assert executor.submit(current_target).result() is None
+
+
+def test_target_refreshes_role_credentials(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "source")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "source")
+    assumed = []
+
+    def assume_role(fetcher):
+        assumed.append(fetcher._role_arn)
+        # credentials about to expire, within the refresh window
+        expiration = datetime.now(timezone.utc) + timedelta(minutes=5)
+        return {
+            "Credentials": {
+                "AccessKeyId": f"assumed-{len(assumed)}",
+                "SecretAccessKey": "secret",
+                "SessionToken": "token",
+                "Expiration": expiration.isoformat(),
+            }
+        }
+
+    monkeypatch.setattr(AssumeRoleCredentialFetcher, "_get_credentials", assume_role)
+
+    credentials = Target("us-east-1", role_arn=ROLE_ARN).session().get_credentials()
+    # the role is only assumed when the credentials are first used
+    assert assumed == []
+    assert credentials.get_frozen_credentials().access_key == "assumed-1"
+    assert credentials.get_frozen_credentials().access_key == "assumed-2"
+    assert assumed == [ROLE_ARN, ROLE_ARN]
@@ -0,0 +1,195 @@
+import datetime
+import gzip
+import json
+import threading
+import time
+
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse
+
+from algae.deadlines import Deadlines, phase, use_deadlines, wait
+from algae.trace import (
+    TRACE_VERSION,
+    VirtualClock,
+    attach,
+    record_trace,
+    replay_trace,
+    use_clock,
+)
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+
+def describe(t, status):
+    return {
+        "t": t,
+        "d": 0.5,
+        "op": "DescribeDBClusters",
+        "params": {"DBClusterIdentifier": "orders"},
+        "status": 200,
+        "response": {"DBClusters": [{"Status": status}]},
+    }
+
+
+@pytest.fixture
+def trace_path(tmp_path):
+    path = tmp_path / "trace.jsonl.gz"
+    calls = [
+        describe(0, "renaming"),
+        {
+            "t": 100,
+            "d": 0.5,
+            "op": "DescribeDBClusters",
+            "params": {"DBClusterIdentifier": "orders"},
+            "status": 404,
+            "response": {
+                "Error": {"Code": "DBClusterNotFoundFault", "Message": "not found"}
+            },
+        },
+        describe(300, "available"),
+    ]
+    with gzip.open(path, "wt") as f:
+        f.write(json.dumps({"version": TRACE_VERSION, "started": 1000}) + "\n")
+        for call in calls:
+            f.write(json.dumps(call) + "\n")
+    return str(path)
+
+
+def test_replay_trace(trace_path):
+    client = attach(boto3.client("rds", region_name="us-east-1"))
+    statuses = []
+
+    def is_available():
+        try:
+            status = client.describe_db_clusters(DBClusterIdentifier="orders")[
+                "DBClusters"
+            ][0]["Status"]
+        except client.exceptions.DBClusterNotFoundFault:
+            status = "not-found"
+        statuses.append(status)
+        return status == "available"
+
+    with replay_trace(trace_path) as replayer:
+        assert time.time() == 1000
+        with use_deadlines(Deadlines()):
+            with phase("rename", "orders") as p:
+                wait(p, is_available, step=60)
+
+    assert statuses[0] == "renaming"
+    assert "not-found" in statuses
+    assert statuses[-1] == "available"
+
+    report = replayer.report()
+    assert report["api_calls"] == len(statuses) == 6
+    assert 300 <= report["duration"] < 360
+
+
+def test_virtual_clock_concurrent_sleeps():
+    clock = VirtualClock()
+
+    with use_clock(clock):
+        threads = [
+            threading.Thread(target=time.sleep, args=(seconds,)) for seconds in (60, 90)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert clock.time() == 90
+
+
+CLUSTER_XML = (
+    '<DescribeDBClustersResponse xmlns="http://rds.amazonaws.com/doc/2014-10-31/">'
+    "<DescribeDBClustersResult><DBClusters><DBCluster>"
+    "<DBClusterIdentifier>orders</DBClusterIdentifier>"
+    "<Status>{status}</Status>"
+    "<ClusterCreateTime>2021-06-01T10:30:00.000Z</ClusterCreateTime>"
+    "</DBCluster></DBClusters></DescribeDBClustersResult>"
+    "<ResponseMetadata><RequestId>1</RequestId></ResponseMetadata>"
+    "</DescribeDBClustersResponse>"
+)
+
+NOT_FOUND_XML = (
+    '<ErrorResponse xmlns="http://rds.amazonaws.com/doc/2014-10-31/">'
+    "<Error><Type>Sender</Type><Code>DBClusterNotFoundFault</Code>"
+    "<Message>DBCluster orders not found.</Message></Error>"
+    "<RequestId>1</RequestId>"
+    "</ErrorResponse>"
+)
+
+
+class RawResponse:
+    def __init__(self, body: str):
+        self.body = body.encode()
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+def wait_available(client) -> list:
+    responses = []
+
+    def is_available():
+        try:
+            cluster = client.describe_db_clusters(DBClusterIdentifier="orders")[
+                "DBClusters"
+            ][0]
+        except client.exceptions.DBClusterNotFoundFault:
+            cluster = {"Status": "not-found"}
+        responses.append(cluster)
+        return cluster["Status"] == "available"
+
+    with use_deadlines(Deadlines()):
+        with phase("rename", "orders") as p:
+            wait(p, is_available, step=60)
+    return responses
+
+
+def test_record_replay_trace(tmp_path):
+    path = str(tmp_path / "trace.jsonl.gz")
+    client = attach(
+        boto3.client(
+            "rds",
+            region_name="us-east-1",
+            aws_access_key_id="testing",
+            aws_secret_access_key="testing",
+        )
+    )
+
+    # the HTTP responses of RDS while the cluster is renamed
+    bodies = iter(
+        [
+            (200, CLUSTER_XML.format(status="renaming")),
+            (404, NOT_FOUND_XML),
+            (200, CLUSTER_XML.format(status="available")),
+        ]
+    )
+
+    def send(request, **kwargs):
+        status, body = next(bodies)
+        return AWSResponse(request.url, status, {}, RawResponse(body))
+
+    client.meta.events.register("before-send.rds", send)
+
+    with use_clock(VirtualClock(start=1000)):
+        with record_trace(path):
+            recorded = wait_available(client)
+
+    assert [cluster["Status"] for cluster in recorded] == [
+        "renaming",
+        "not-found",
+        "available",
+    ]
+
+    client.meta.events.unregister("before-send.rds", send)
+    with replay_trace(path) as replayer:
+        replayed = wait_available(client)
+
+    # the timestamps are restored from the output shape
+    assert replayed == recorded
+    assert isinstance(replayed[-1]["ClusterCreateTime"], datetime.datetime)
+    assert replayer.report()["api_calls"] == 3
@@ -0,0 +1,85 @@
+import argparse
+import time
+
+import pytest
+
+from algae.backends import ClassicBackend
+from algae.state import load_prepared
+from algae.upgrade import cutover_cluster, prepare_cluster
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+
+@pytest.fixture
+def args(rds, tmp_path):
+    rds.add_cluster("orders", engine_version="5.7")
+    rds.add_instance("orders-instance", "orders")
+    return argparse.Namespace(
+        command="prepare",
+        backend="classic",
+        cluster_identifier="orders-green",
+        source_cluster_identifier="orders",
+        engine_version="8.0",
+        subnet_group_name="private",
+        provision="auto",
+        migrate_parameter_groups=False,
+        keep_on_overrun=False,
+        max_staleness=3600,
+        prescale=False,
+        warmup_queries=None,
+        gate=False,
+        verify_tables=None,
+        state_dir=str(tmp_path),
+    )
+
+
+def test_prepare_cluster_staleness(rds, args):
+    started = time.time()
+    prepare_cluster(args)
+
+    # the clone is as old as the start of the prepare, not its end
+    prepared = load_prepared("orders", state_dir=args.state_dir)
+    assert time.time() > started
+    assert prepared["prepared_at"] == started
+    assert rds.clusters["orders-green"]["EngineVersion"] == "8.0"
+
+
+def test_is_fresh(args):
+    backend = ClassicBackend()
+    now = time.time()
+
+    assert backend.is_fresh(args, {"prepared_at": now - 600})
+    assert not backend.is_fresh(args, {"prepared_at": now - 7200})
+    args.max_staleness = None
+    assert backend.is_fresh(args, {"prepared_at": now - 7200})
+
+
+def test_discard(rds, args):
+    rds.add_cluster("orders-green")
+    rds.add_instance("orders-green-instance", "orders-green")
+
+    ClassicBackend().discard(args, {"green_cluster_identifier": "orders-green"})
+    assert "orders-green" not in rds.clusters
+    assert "orders-green-instance" not in rds.instances
+
+
+def test_cutover_cluster_prepares_stale_cluster(rds, args):
+    prepare_cluster(args)
+    time.sleep(7200)
+
+    args.command = "cutover"
+    cutover_cluster(args)
+
+    # the stale clone was deleted and the cluster prepared again
+    operations = rds.operations()
+    assert operations.count("DeleteDBCluster") == 1
+    assert operations.count("RestoreDBClusterFromSnapshot") == 2
+    deleted = operations.index("DeleteDBCluster")
+    assert "RestoreDBClusterFromSnapshot" in operations[deleted:]
+
+    assert rds.clusters["orders"]["EngineVersion"] == "8.0"
+    assert rds.clusters["orders-backup"]["EngineVersion"] == "5.7"
+    with pytest.raises(Exception, match="no prepared cluster"):
+        load_prepared("orders", state_dir=args.state_dir)
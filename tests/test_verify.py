@@ -0,0 +1,68 @@
+import sqlite3
+
+from algae.verify import Side, split_range, verify_tables
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+
+def create_database(path, changes=()):
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE users (name TEXT, id INTEGER PRIMARY KEY)")
+    connection.executemany(
+        "INSERT INTO users (id, name) VALUES (?, ?)",
+        [(i, f"user-{i}") for i in range(1, 5001)],
+    )
+    for change in changes:
+        connection.execute(change)
+    connection.commit()
+    connection.close()
+
+
+def side(name, path):
+    return Side(name, lambda: sqlite3.connect(path, check_same_thread=False))
+
+
+def test_split_range():
+    assert split_range(0, 10, 3) == [(0, 4), (4, 8), (8, 10)]
+
+
+def test_verify_tables(tmp_path):
+    blue, green = str(tmp_path / "blue.db"), str(tmp_path / "green.db")
+    create_database(blue)
+    create_database(
+        green,
+        [
+            "UPDATE users SET name = 'changed' WHERE id = 1234",
+            "DELETE FROM users WHERE id = 4321",
+            "INSERT INTO users (id, name) VALUES (6000, 'extra')",
+        ],
+    )
+
+    report = verify_tables(
+        side("blue", blue),
+        side("green", green),
+        [{"table": "users", "key": "id"}],
+        chunk_size=1000,
+        leaf_size=100,
+        fanout=4,
+        concurrency=4,
+    )
+
+    assert report["users"]["divergent_keys"] == [1234, 4321, 6000]
+
+
+def test_verify_matching_tables(tmp_path):
+    blue, green = str(tmp_path / "blue.db"), str(tmp_path / "green.db")
+    create_database(blue)
+    create_database(green)
+
+    report = verify_tables(
+        side("blue", blue),
+        side("green", green),
+        [{"table": "users", "key": "id"}],
+        chunk_size=1000,
+    )
+
+    assert report["users"] == {"chunks": 5, "divergent_keys": []}
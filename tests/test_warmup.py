@@ -0,0 +1,40 @@
+import sqlite3
+
+from algae.warmup import load_queries, run_warmup
+
+__author__ = "Cesar Alvernaz"
+__copyright__ = "Cesar Alvernaz"
+__license__ = "MIT"
+
+
+def test_load_queries(tmp_path):
+    path = tmp_path / "warmup.sql"
+    path.write_text("SELECT * FROM users;\n\nSELECT count(*) FROM orders;\n")
+    assert load_queries(str(path)) == [
+        "SELECT * FROM users",
+        "SELECT count(*) FROM orders",
+    ]
+
+
+def test_run_warmup(tmp_path):
+    database = str(tmp_path / "green.db")
+    connection = sqlite3.connect(database)
+    connection.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+    connection.executemany(
+        "INSERT INTO users (name) VALUES (?)", [("a",), ("b",), ("c",)]
+    )
+    connection.commit()
+    connection.close()
+
+    stats = run_warmup(
+        lambda: sqlite3.connect(database),
+        ["SELECT * FROM users", "SELECT * FROM missing"],
+        concurrency=3,
+        duration=0.2,
+    )
+    assert stats["queries"] > 0
+    assert stats["errors"] > 0
+
+
+def test_run_warmup_without_queries():
+    assert run_warmup(None, []) == {"queries": 0, "errors": 0}